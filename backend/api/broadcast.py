@@ -0,0 +1,261 @@
+"""
+WebSocket广播后端
+决定一条广播如何到达各个进程中的 ConnectionManager
+
+- local: 进程内直接投递（默认，单 worker）
+- unix:  基于 Unix 域数据报套接字的本机总线，`uvicorn --workers N` 时
+         每个 worker 绑定一个套接字，发布时发送给所有其他 worker，
+         每个 worker 的订阅者都恰好收到一次
+"""
+from typing import Any, Callable, Dict, List, Optional
+from pathlib import Path
+import asyncio
+import json
+import os
+import socket
+import time
+
+from utils.logger import logger
+
+try:  # 可选的高性能 JSON 编解码
+    import orjson
+except ImportError:  # pragma: no cover - 未安装时回退到标准库
+    orjson = None
+
+
+# 投递函数：把消息交给本进程的连接管理器
+Deliver = Callable[[Dict[str, Any]], None]
+
+# 单条总线消息的最大字节数（Linux 数据报默认发送缓冲约 208KB）
+MAX_DATAGRAM_SIZE = 192 * 1024
+
+
+def _dumps(message: Dict[str, Any]) -> bytes:
+    """将消息编码为总线传输的字节串"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message)
+        except TypeError:
+            pass
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Dict[str, Any]:
+    """解码总线消息"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class BroadcastBackend:
+    """广播后端基类"""
+
+    name = "base"
+
+    def start(self, deliver: Deliver):
+        """
+        启动后端
+
+        Args:
+            deliver: 本进程的消息投递函数
+        """
+        raise NotImplementedError
+
+    def stop(self):
+        """停止后端"""
+        raise NotImplementedError
+
+    def publish(self, message: Dict[str, Any]):
+        """
+        发布消息，所有进程的投递函数各被调用一次
+
+        Args:
+            message: 消息内容（字典格式）
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """后端指标"""
+        return {"backend": self.name}
+
+
+class LocalBroadcastBackend(BroadcastBackend):
+    """进程内广播：直接投递给本进程的连接"""
+
+    name = "local"
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    def stop(self):
+        pass
+
+    def publish(self, message: Dict[str, Any]):
+        if self._deliver is not None:
+            self._deliver(message)
+
+
+class UnixSocketBroadcastBackend(BroadcastBackend):
+    """
+    基于 Unix 域数据报套接字的多进程广播
+
+    每个进程在共享目录下绑定 "<pid>.sock"。发布时先投递给本进程，
+    再把编码后的消息发给目录中的其他套接字；对端进程不存在时清理其套接字文件。
+    """
+
+    name = "unix"
+
+    # 对端列表的刷新间隔（秒）
+    PEER_REFRESH_INTERVAL = 1.0
+
+    def __init__(self, socket_dir: Path):
+        self.socket_dir = Path(socket_dir)
+        self.socket_path = self.socket_dir / f"{os.getpid()}.sock"
+        self._sock: Optional[socket.socket] = None
+        self._deliver: Optional[Deliver] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._peers: List[str] = []
+        self._peers_at = 0.0
+        # 指标
+        self.published = 0
+        self.received = 0
+        self.send_errors = 0
+
+    def start(self, deliver: Deliver):
+        if self._sock is not None:
+            return
+        self._deliver = deliver
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(str(self.socket_path))
+        self._sock = sock
+
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        logger.info(f"WebSocket广播总线已启动: {self.socket_path}")
+
+    def stop(self):
+        if self._sock is None:
+            return
+        if self._loop is not None:
+            self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info("WebSocket广播总线已停止")
+
+    def _refresh_peers(self, force: bool = False) -> List[str]:
+        """获取其他进程的套接字路径（带缓存）"""
+        now = time.monotonic()
+        if force or now - self._peers_at >= self.PEER_REFRESH_INTERVAL:
+            own = self.socket_path.name
+            try:
+                self._peers = [
+                    str(self.socket_dir / name)
+                    for name in os.listdir(self.socket_dir)
+                    if name.endswith(".sock") and name != own
+                ]
+            except FileNotFoundError:
+                self._peers = []
+            self._peers_at = now
+        return self._peers
+
+    def publish(self, message: Dict[str, Any]):
+        # 本进程直接投递，不经过套接字
+        if self._deliver is not None:
+            self._deliver(message)
+        if self._sock is None:
+            return
+
+        peers = self._refresh_peers()
+        if not peers:
+            return
+
+        data = _dumps(message)
+        if len(data) > MAX_DATAGRAM_SIZE:
+            logger.error(f"广播消息过大({len(data)} bytes)，未发送到其他进程: {message.get('type')}")
+            self.send_errors += 1
+            return
+
+        self.published += 1
+        stale = []
+        for peer in peers:
+            try:
+                self._sock.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 对端进程已退出
+                stale.append(peer)
+            except BlockingIOError:
+                # 对端接收缓冲已满，丢弃本条消息
+                self.send_errors += 1
+                logger.warning(f"广播总线对端繁忙，丢弃消息: {peer}")
+            except OSError as e:
+                self.send_errors += 1
+                logger.warning(f"广播总线发送失败 {peer}: {e}")
+
+        for peer in stale:
+            logger.info(f"清理失效的广播总线套接字: {peer}")
+            try:
+                os.unlink(peer)
+            except FileNotFoundError:
+                pass
+        if stale:
+            self._refresh_peers(force=True)
+
+    def _on_readable(self):
+        """读取所有待处理的总线消息并投递"""
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(MAX_DATAGRAM_SIZE)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logger.warning(f"广播总线读取失败: {e}")
+                return
+            try:
+                message = _loads(data)
+            except ValueError as e:
+                logger.warning(f"广播总线消息解码失败: {e}")
+                continue
+            self.received += 1
+            if self._deliver is not None:
+                self._deliver(message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "socket": str(self.socket_path),
+            "peers": len(self._refresh_peers()),
+            "published": self.published,
+            "received": self.received,
+            "send_errors": self.send_errors,
+        }
+
+
+def create_broadcast_backend(name: str, socket_dir: Path) -> BroadcastBackend:
+    """
+    根据配置创建广播后端
+
+    Args:
+        name: 后端名称（local / unix）
+        socket_dir: unix 后端的套接字目录
+
+    Returns:
+        广播后端实例
+    """
+    if name == "unix":
+        if not hasattr(socket, "AF_UNIX"):
+            logger.warning("当前平台不支持 Unix 域套接字，使用进程内广播")
+            return LocalBroadcastBackend()
+        return UnixSocketBroadcastBackend(socket_dir)
+    return LocalBroadcastBackend()
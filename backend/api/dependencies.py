@@ -9,7 +9,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from models.database import get_db
+from models.database import get_read_db
 from models.user import User
 from utils.jwt import decode_access_token
 
@@ -19,14 +19,14 @@ security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> User:
     """
     从 JWT token 获取当前用户
 
     Args:
         credentials: HTTP Bearer 认证凭据
-        db: 数据库会话
+        db: 只读数据库会话
 
     Returns:
         当前用户对象
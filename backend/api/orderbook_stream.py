@@ -0,0 +1,75 @@
+"""
+盘口增量流
+订阅时发送完整快照，之后只推送发生变化的价位（带递增序列号）
+"""
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class OrderbookStream:
+    """
+    单个交易对的盘口增量流
+
+    增量格式: {"symbol", "seq", "bids": [[price, qty], ...], "asks": [...]}
+    qty 为 0 表示该价位已移除。客户端收到 seq 不连续的增量时应发送 resync 请求。
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        # 最近一次增量的序列号，快照携带当前序列号
+        self.seq = 0
+        # 当前盘口：价格 → 数量
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+
+    @staticmethod
+    def _diff(current: Dict[float, float], levels: List[List[float]]) -> Tuple[Dict[float, float], List[List[float]]]:
+        """
+        计算一侧盘口的变化
+
+        Args:
+            current: 当前价位表
+            levels: 新的价位列表 [[price, qty], ...]
+
+        Returns:
+            (新的价位表, 变化的价位列表)
+        """
+        updated = {float(price): float(qty) for price, qty in levels}
+        changes = [
+            [price, qty] for price, qty in updated.items()
+            if current.get(price) != qty
+        ]
+        changes.extend([price, 0.0] for price in current if price not in updated)
+        return updated, changes
+
+    def apply(self, bids: List[List[float]], asks: List[List[float]]) -> Optional[Dict[str, Any]]:
+        """
+        应用一次完整盘口，返回增量数据
+
+        Args:
+            bids: 买盘 [[price, qty], ...]
+            asks: 卖盘 [[price, qty], ...]
+
+        Returns:
+            增量数据；盘口无变化时返回 None
+        """
+        self.bids, bid_changes = self._diff(self.bids, bids)
+        self.asks, ask_changes = self._diff(self.asks, asks)
+        if not bid_changes and not ask_changes:
+            return None
+
+        self.seq += 1
+        return {
+            "symbol": self.symbol,
+            "seq": self.seq,
+            "bids": bid_changes,
+            "asks": ask_changes,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取当前完整盘口快照（买盘降序、卖盘升序）"""
+        return {
+            "symbol": self.symbol,
+            "seq": self.seq,
+            "bids": [[price, qty] for price, qty in sorted(self.bids.items(), reverse=True)],
+            "asks": [[price, qty] for price, qty in sorted(self.asks.items())],
+        }
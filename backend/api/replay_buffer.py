@@ -0,0 +1,100 @@
+"""
+WebSocket事件回放缓冲
+按主题保存最近的事件（带序列号），用于客户端断线重连后补发缺失事件
+"""
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+from collections import deque
+import heapq
+
+
+class TopicReplayBuffer:
+    """
+    单个主题的有界事件环形缓冲
+
+    保存 (seq, item)，超出容量时淘汰最旧的事件，并记录已淘汰的最大序列号，
+    用于判断客户端请求的起点是否已经不在缓冲内（存在缺口）。
+    """
+
+    def __init__(self, capacity: int):
+        self.events: Deque[Tuple[int, Any]] = deque(maxlen=capacity)
+        # 已被淘汰的最大序列号，0 表示尚未淘汰任何事件
+        self.evicted_upto = 0
+
+    def append(self, seq: int, item: Any):
+        """追加事件"""
+        if len(self.events) == self.events.maxlen:
+            self.evicted_upto = self.events[0][0]
+        self.events.append((seq, item))
+
+    def has_gap(self, from_seq: int) -> bool:
+        """from_seq 之后的事件是否有被淘汰的"""
+        return self.evicted_upto > from_seq
+
+    def since(self, from_seq: int) -> List[Tuple[int, Any]]:
+        """获取序列号大于 from_seq 的事件"""
+        if not self.events or self.events[-1][0] <= from_seq:
+            return []
+        return [event for event in self.events if event[0] > from_seq]
+
+    def latest(self) -> Optional[Tuple[int, Any]]:
+        """最新的事件"""
+        return self.events[-1] if self.events else None
+
+
+class ReplayLog:
+    """
+    按主题组织的回放缓冲集合，事件序列号在所有主题间全局递增
+
+    序列号只在本进程内有效，epoch 标识当前进程的序列号空间；
+    客户端带着其他 epoch 的序列号恢复时视为存在缺口。
+    """
+
+    def __init__(self, capacity: int, epoch: str):
+        self.capacity = capacity
+        self.epoch = epoch
+        self.last_seq = 0
+        self.buffers: Dict[str, TopicReplayBuffer] = {}
+
+    def next_seq(self) -> int:
+        """分配下一个序列号"""
+        self.last_seq += 1
+        return self.last_seq
+
+    def append(self, topic: str, seq: int, item: Any):
+        """记录主题事件"""
+        buffer = self.buffers.get(topic)
+        if buffer is None:
+            buffer = self.buffers[topic] = TopicReplayBuffer(self.capacity)
+        buffer.append(seq, item)
+
+    def collect(self, topics: Iterable[str], from_seq: int) -> Tuple[List[Any], bool]:
+        """
+        收集指定主题中 from_seq 之后的事件（按序列号排序）
+
+        Args:
+            topics: 主题列表
+            from_seq: 客户端已收到的最大序列号
+
+        Returns:
+            (事件列表, 是否存在缺口)
+        """
+        gap = False
+        streams = []
+        for topic in topics:
+            buffer = self.buffers.get(topic)
+            if buffer is None:
+                continue
+            if buffer.has_gap(from_seq):
+                gap = True
+            streams.append(buffer.since(from_seq))
+        merged = heapq.merge(*streams, key=lambda event: event[0])
+        return [item for _, item in merged], gap
+
+    def latest(self, topics: Iterable[str]) -> List[Any]:
+        """每个主题的最新事件（按序列号排序），作为缺口时的状态快照"""
+        events = [
+            self.buffers[topic].latest()
+            for topic in topics
+            if topic in self.buffers and self.buffers[topic].latest() is not None
+        ]
+        return [item for _, item in sorted(events, key=lambda event: event[0])]
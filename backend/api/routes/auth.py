@@ -10,7 +10,8 @@ from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 
-from models.database import get_db
+from models.database import get_read_db
+from models.writer import db_writer
 from models.user import User
 from utils.security import verify_password
 from utils.jwt import create_access_token, get_token_expire_time
@@ -51,14 +52,14 @@ class UserInfoResponse(BaseModel):
 @router.post("/login", response_model=Dict[str, Any])
 async def login(
     request: LoginRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Dict[str, Any]:
     """
     用户登录
 
     Args:
         request: 登录请求（用户名和密码）
-        db: 数据库会话
+        db: 只读数据库会话
 
     Returns:
         包含 access_token 的响应
@@ -88,16 +89,21 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    user_id = user.id
+
     # 生成 JWT token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data={"sub": user_id})
+
+    # 先结束读事务再等待写入者：非 WAL 模式下未结束的读事务持有 SHARED 锁，
+    # 会让写入者的 BEGIN IMMEDIATE / 提交一直等到 busy_timeout
+    await db.close()
 
-    # 更新最后登录时间
-    await db.execute(
+    # 更新最后登录时间（经单写入者队列写入）
+    await db_writer.execute(
         update(User)
-        .where(User.id == user.id)
+        .where(User.id == user_id)
         .values(last_login=datetime.now(timezone.utc))
     )
-    await db.commit()
 
     # 返回响应
     return {
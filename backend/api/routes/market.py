@@ -0,0 +1,137 @@
+"""
+行情 API 路由
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from models.user import User
+from api.dependencies import get_current_user
+from modules.candles import INTERVALS
+from modules.downsample import METHODS, downsample
+from modules.indicators import OHLCV, load_ohlcv
+from utils.logger import logger
+
+router = APIRouter(prefix="/api/market", tags=["market"])
+
+# 自动选择周期
+AUTO_INTERVAL = "auto"
+
+
+def _to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """转换为不带时区的 UTC 时间（与数据库中的 timestamp 一致）"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def candidate_intervals(start: datetime, end: datetime, max_points: int) -> List[str]:
+    """
+    自动选择周期时的候选列表
+
+    从 K 线数不超过 max_points 的最细周期开始，依次到最粗周期；
+    都超过时只剩最粗周期（之后再降采样）。
+    """
+    seconds = (end - start).total_seconds()
+    names = list(INTERVALS)
+    for index, name in enumerate(names):
+        if seconds / INTERVALS[name] <= max_points:
+            return names[index:]
+    return names[-1:]
+
+
+def _covers(data: OHLCV, start: datetime, interval: str) -> bool:
+    """数据是否从范围起点开始就存在（细周期可能已被保留策略清理）"""
+    if len(data) == 0:
+        return False
+    first = data.timestamp[0].astype(datetime)
+    return first <= start + timedelta(seconds=INTERVALS[interval])
+
+
+def _column(values: np.ndarray, digits: int = 8) -> List[Optional[float]]:
+    """浮点列转为 JSON 列表（NaN → None）"""
+    rounded = np.round(values, digits)
+    if not np.isnan(rounded).any():
+        return rounded.tolist()
+    return [None if np.isnan(value) else value for value in rounded.tolist()]
+
+
+@router.get("/klines", response_model=Dict[str, Any])
+async def get_klines(
+    symbol: str = Query(..., description="交易对符号"),
+    interval: str = Query(AUTO_INTERVAL, description="时间周期: auto, 1m, 5m, 15m, 1h, 4h, 1d"),
+    start: Optional[datetime] = Query(None, description="开始时间（ISO 8601，默认结束时间前 24 小时）"),
+    end: Optional[datetime] = Query(None, description="结束时间（ISO 8601，默认当前时间）"),
+    max_points: int = Query(1000, ge=10, le=5000, description="最多返回的点数"),
+    method: str = Query("ohlc", description="降采样方法: ohlc（K 线合并）, lttb（折线选点）"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询 K 线（列式返回，超过 max_points 时服务端降采样）
+
+    interval=auto 时选择 K 线数不超过 max_points 的最细周期；该周期数据不完整
+    （已被清理）时改用更粗的周期。
+
+    需要登录认证
+    """
+    if interval != AUTO_INTERVAL and interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Invalid interval: {interval}")
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"Invalid method: {method}")
+
+    end = _to_utc_naive(end) or datetime.utcnow()
+    start = _to_utc_naive(start) or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be earlier than end")
+
+    try:
+        logger.debug(f"User {current_user.username} querying klines {symbol} {interval} {start} ~ {end}")
+
+        if interval == AUTO_INTERVAL:
+            data, selected = None, None
+            for candidate in candidate_intervals(start, end, max_points):
+                loaded = await load_ohlcv(symbol, candidate, start, end)
+                # 数据最多的周期作为兜底
+                if data is None or len(loaded) > len(data):
+                    data, selected = loaded, candidate
+                if _covers(loaded, start, candidate):
+                    data, selected = loaded, candidate
+                    break
+        else:
+            selected = interval
+            data = await load_ohlcv(symbol, interval, start, end)
+
+        total = len(data)
+        data = downsample(data, max_points, method)
+
+        return {
+            "code": 200,
+            "message": "Klines retrieved successfully",
+            "data": {
+                "symbol": symbol,
+                "interval": selected,
+                "method": method,
+                "count": len(data),
+                "total": total,
+                "downsampled": len(data) < total,
+                "columns": {
+                    # Unix 毫秒
+                    "timestamp": data.timestamp.astype("datetime64[ms]").astype(np.int64).tolist(),
+                    "open": _column(data.open),
+                    "high": _column(data.high),
+                    "low": _column(data.low),
+                    "close": _column(data.close),
+                    "volume": _column(data.volume),
+                    "atr": _column(data.atr),
+                },
+            }
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to get klines: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get klines: {str(e)}"
+        )
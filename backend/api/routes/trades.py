@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 
 from models.user import User
 from api.dependencies import get_current_user
+from modules.market_state import market_state
 from utils.logger import logger
 
 router = APIRouter(prefix="/api/trades", tags=["trades"])
@@ -158,23 +159,15 @@ async def get_market_data(
     需要登录认证
     """
     try:
-        logger.info(f"User {current_user.username} querying market data for {symbol}")
+        logger.debug(f"User {current_user.username} querying market data for {symbol}")
 
-        # TODO: 从Binance API获取真实市场数据
-        # 目前返回模拟数据
-        mock_market = {
-            "symbol": symbol,
-            "bid_price": 0.05234,
-            "ask_price": 0.05236,
-            "spread": 0.00002,
-            "atr": 0.00015,
-            "timestamp": datetime.now().isoformat()
-        }
+        # 从实时行情缓存读取，缓存过期时回退到最近的持久化数据
+        market = await market_state.snapshot(symbol)
 
         return {
             "code": 200,
             "message": "Market data retrieved successfully",
-            "data": mock_market
+            "data": market
         }
 
     except Exception as e:
@@ -1,149 +1,1080 @@
 """
 WebSocket连接管理器
 用于实时推送交易数据、市场信息、系统状态等
+
+每个连接拥有独立的有界发送队列和写协程，广播只做非阻塞入队，
+单个卡顿的客户端不会拖慢其他客户端和调用方。
+每条广播只编码一次（Frame），编码结果被所有连接共享。
+
+订阅协议（客户端发送JSON文本）:
+    {"action": "subscribe", "topics": ["orderbook_update:KOGE/USDT", "system_status"]}
+    {"action": "unsubscribe", "topics": ["system_status"]}
+
+主题格式为 "<消息类型>" 或 "<消息类型>:<交易对>"。从未订阅过的连接接收全部消息
+（兼容旧客户端）；一旦订阅，只接收所订阅主题的消息。
+
+盘口增量模式: 订阅 "orderbook_delta:<交易对>" 后先收到 orderbook_snapshot，
+之后只收到带序列号的 orderbook_delta；序列号不连续时发送
+    {"action": "resync", "topics": ["orderbook_delta:KOGE/USDT"]}
+获取新的快照。
+
+合并推送: price_update / orderbook_update 等只关心最新值的消息按
+"客户端 × 主题" 限速，超出频率的中间值被覆盖，下一个刷新周期只发送最新值。
+订阅时可附带 "max_rate"（次/秒）进一步降低该客户端的发送频率。
+
+编码协商: 默认 JSON 文本帧；连接时带 "?encoding=msgpack" 或发送
+    {"action": "set_encoding", "encoding": "msgpack"}
+改为 MessagePack 二进制帧。每条广播对每种编码最多编码一次。
+客户端发往服务端的控制消息始终为 JSON 文本。
+
+批量推送: 连接时带 "?batch=<毫秒>" 或发送
+    {"action": "set_batching", "window_ms": 30}
+后，同一时间窗内的多条消息合并为一个数组帧发送（window_ms 为 0 时关闭）。
+
+断线恢复: trade_executed / system_status 等事件带有序列号 "seq"（欢迎消息中
+给出 epoch 和 last_seq），重连后发送
+    resume from=<seq>    或    {"action": "resume", "from": <seq>, "epoch": "<epoch>"}
+补发缺失事件；缺口超出缓冲时改为发送各主题的最新状态，并在 resume_complete 中标记 gap。
+
+多进程: broadcast 经由广播后端（api.broadcast）发布，unix 后端把消息转发给
+同机其他 worker，每个 worker 的连接都恰好收到一次。
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
 from datetime import datetime
+from pathlib import Path
 import json
+import time
+import uuid
 import asyncio
 from fastapi import WebSocket, WebSocketDisconnect
 from utils.logger import logger
+from utils.app_config import get_config
+from api.orderbook_stream import OrderbookStream
+from api.broadcast import BroadcastBackend, create_broadcast_backend
+from api.replay_buffer import ReplayLog
+
+try:  # 可选的高性能 JSON 编码器
+    import orjson
+except ImportError:  # pragma: no cover - 未安装时回退到标准库
+    orjson = None
+
+try:  # 可选的 MessagePack 编码器
+    import msgpack
+except ImportError:  # pragma: no cover - 未安装时只支持 JSON
+    msgpack = None
+
+
+# 发送队列溢出策略
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # 丢弃最旧的一条消息
+OVERFLOW_DISCONNECT = "disconnect"    # 断开慢客户端
+
+# 消息编码
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# 订阅限制
+MAX_TOPICS_PER_CLIENT = 100
+MAX_TOPIC_LENGTH = 64
+
+# 只发给显式订阅者的消息类型（未订阅的连接不接收）
+ORDERBOOK_DELTA = "orderbook_delta"
+ORDERBOOK_SNAPSHOT = "orderbook_snapshot"
+EXPLICIT_TOPIC_TYPES = {ORDERBOOK_DELTA}
+
+
+def topic_for(message: Dict[str, Any]) -> Optional[str]:
+    """
+    获取消息的主题
+
+    带交易对的消息主题为 "<type>:<symbol>"，否则为 "<type>"
+
+    Args:
+        message: 消息内容（字典格式）
+
+    Returns:
+        主题字符串
+    """
+    msg_type = message.get("type")
+    if msg_type is None:
+        return None
+    data = message.get("data")
+    symbol = data.get("symbol") if isinstance(data, dict) else None
+    return f"{msg_type}:{symbol}" if symbol else msg_type
+
+
+def encode_json(message: Dict[str, Any]) -> str:
+    """
+    将消息编码为 JSON 文本，优先使用 orjson
+
+    Args:
+        message: 消息内容（字典格式）
+
+    Returns:
+        JSON 文本
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(message).decode("utf-8")
+        except TypeError:
+            # orjson 不支持的类型（如超过64位的整数）回退到标准库
+            pass
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_msgpack(message: Dict[str, Any]) -> bytes:
+    """
+    将消息编码为 MessagePack 二进制，价格和数量保持原生数值类型
+
+    Args:
+        message: 消息内容（字典格式）
+
+    Returns:
+        MessagePack 字节串
+    """
+    return msgpack.packb(message, use_bin_type=True, default=str)
+
+
+def _msgpack_array_header(length: int) -> bytes:
+    """MessagePack 数组头"""
+    if length < 16:
+        return bytes((0x90 | length,))
+    if length < 0x10000:
+        return b"\xdc" + length.to_bytes(2, "big")
+    return b"\xdd" + length.to_bytes(4, "big")
+
+
+def encode_batch(frames: List["Frame"], encoding: str):
+    """
+    将多个已编码帧拼接为一个数组帧，复用各帧已有的编码结果
+
+    Args:
+        frames: 消息帧列表
+        encoding: 消息编码
+
+    Returns:
+        JSON 文本或 MessagePack 字节串
+    """
+    if encoding == ENCODING_MSGPACK:
+        return _msgpack_array_header(len(frames)) + b"".join(frame.packed for frame in frames)
+    return "[" + ",".join(frame.text for frame in frames) + "]"
+
+
+def supported_encodings() -> List[str]:
+    """当前环境支持的消息编码"""
+    if msgpack is None:
+        return [ENCODING_JSON]
+    return [ENCODING_JSON, ENCODING_MSGPACK]
+
+
+class Frame:
+    """
+    已编码的WebSocket消息帧
+
+    一次广播只构造一个 Frame，所有连接的发送队列共享同一份编码结果。
+    每种编码在第一次被需要时编码并缓存，不使用的编码不产生开销。
+    """
+
+    __slots__ = ("message", "topic", "_text", "_text_size", "_packed")
+
+    def __init__(self, message: Dict[str, Any]):
+        self.message = message
+        self.topic = topic_for(message)
+        self._text: Optional[str] = None
+        self._text_size: Optional[int] = None
+        self._packed: Optional[bytes] = None
+
+    @property
+    def type(self) -> Optional[str]:
+        """消息类型"""
+        return self.message.get("type")
+
+    @property
+    def text(self) -> str:
+        """JSON 文本编码"""
+        if self._text is None:
+            self._text = encode_json(self.message)
+        return self._text
+
+    @property
+    def packed(self) -> bytes:
+        """MessagePack 二进制编码"""
+        if self._packed is None:
+            self._packed = encode_msgpack(self.message)
+        return self._packed
+
+    def size(self, encoding: str) -> int:
+        """指定编码下的帧字节数"""
+        if encoding == ENCODING_MSGPACK:
+            return len(self.packed)
+        if self._text_size is None:
+            text = self.text
+            self._text_size = len(text) if text.isascii() else len(text.encode("utf-8"))
+        return self._text_size
+
+
+class ClientConnection:
+    """单个WebSocket连接的状态：发送队列、订阅、统计"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        client_id: Optional[str],
+        queue_size: int,
+        encoding: str = ENCODING_JSON,
+    ):
+        self.websocket = websocket
+        # 唯一连接ID（注册表主键），client_id 只是便于识别的标签
+        self.conn_id = uuid.uuid4().hex[:12]
+        self.client_id = client_id or "anonymous"
+        self.connected_at = datetime.utcnow()
+        # 消息编码（json / msgpack）
+        self.encoding = encoding
+        # 批量推送时间窗（秒），0 表示逐条发送
+        self.batch_window = 0.0
+        # 有界发送队列，由写协程独占消费
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer_task: Optional[asyncio.Task] = None
+        # 发送锁：写协程与心跳ping不会同时写同一个连接
+        self.send_lock = asyncio.Lock()
+        # 正在发送的心跳ping（上一个未发完时不再发送新的）
+        self.ping_task: Optional[asyncio.Task] = None
+        # 订阅的主题；None 表示从未订阅，接收全部消息
+        self.topics: Optional[Set[str]] = None
+        # 合并推送：主题 → 待发送的最新帧 / 下次允许发送的时间
+        self.pending: Dict[str, Frame] = {}
+        self.next_send_at: Dict[str, float] = {}
+        # 客户端指定的发送频率（消息类型 → 次/秒）
+        self.rate_overrides: Dict[str, float] = {}
+        self.conflated_messages = 0
+        # 最近一次收到客户端消息（pong或其他任意消息）的时间（单调时间），连接时视为已响应
+        self.last_pong = time.monotonic()
+        # 队列指标
+        self.max_queue_depth = 0
+        self.dropped_messages = 0
+        self.sent_messages = 0
+        self.sent_frames = 0
+        self.bytes_sent = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """当前待发送消息数"""
+        return self.queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """连接的元数据与统计"""
+        return {
+            "conn_id": self.conn_id,
+            "client_id": self.client_id,
+            "connected_at": self.connected_at.isoformat() + "Z",
+            "encoding": self.encoding,
+            "batch_window_ms": int(self.batch_window * 1000),
+            "topics": sorted(self.topics) if self.topics is not None else None,
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.queue.maxsize,
+            "max_queue_depth": self.max_queue_depth,
+            "dropped_messages": self.dropped_messages,
+            "conflated_messages": self.conflated_messages,
+            "sent_messages": self.sent_messages,
+            "sent_frames": self.sent_frames,
+            "bytes_sent": self.bytes_sent,
+            "last_pong_age": round(time.monotonic() - self.last_pong, 3),
+        }
 
 
 class ConnectionManager:
     """WebSocket连接管理器"""
 
-    def __init__(self):
-        # 存储所有活跃连接
-        self.active_connections: List[WebSocket] = []
-        # 存储连接ID映射（可选，用于区分不同客户端）
-        self.connection_ids: Dict[WebSocket, str] = {}
-        # 心跳任务列表
-        self.heartbeat_tasks: Dict[WebSocket, asyncio.Task] = {}
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        overflow_policy: Optional[str] = None,
+        conflate_rates: Optional[Dict[str, float]] = None,
+        backend: Optional[BroadcastBackend] = None,
+    ):
+        ws_config = get_config().websocket
+        # 广播后端（进程内 / 多进程总线）
+        if backend is None:
+            socket_dir = Path(ws_config.broadcast_socket_dir)
+            if not socket_dir.is_absolute():
+                socket_dir = Path(__file__).parent.parent.parent / socket_dir
+            backend = create_broadcast_backend(ws_config.broadcast_backend, socket_dir)
+        self.backend = backend
+        # 每个连接的发送队列上限
+        self.queue_size = queue_size or ws_config.queue_size
+        # 队列溢出策略
+        self.overflow_policy = overflow_policy or ws_config.overflow_policy
+        # 合并推送的消息类型及最大发送频率（次/秒）
+        self.conflate_rates: Dict[str, float] = dict(
+            ws_config.conflate_rates if conflate_rates is None else conflate_rates
+        )
+        self.conflation_tick = ws_config.conflation_tick_ms / 1000
+        # 有待发送合并帧的连接
+        self._conflated_clients: Set[ClientConnection] = set()
+        self._conflation_task: Optional[asyncio.Task] = None
+        # 连接注册表：唯一连接ID → 连接状态
+        self.connections: Dict[str, ClientConnection] = {}
+        # WebSocket → 连接状态索引（O(1) 查找和移除）
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        # 主题 → 订阅者索引
+        self.subscribers: Dict[str, Set[ClientConnection]] = {}
+        # 未订阅任何主题的连接（接收全部消息）
+        self.unfiltered: Set[ClientConnection] = set()
+        # 交易对 → 盘口增量流
+        self.orderbook_streams: Dict[str, OrderbookStream] = {}
+        # 心跳：所有连接共享一个调度任务
+        self.heartbeat_interval = ws_config.heartbeat_interval
+        self.heartbeat_timeout = ws_config.heartbeat_timeout
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # 批量推送限制
+        self.max_batch_window_ms = ws_config.max_batch_window_ms
+        self.max_batch_size = ws_config.max_batch_size
+        # 断线恢复：需要回放的消息类型及按主题的事件缓冲
+        self.replay_types: Set[str] = set(ws_config.replay_types)
+        self.replay_log = ReplayLog(ws_config.replay_buffer_size, epoch=uuid.uuid4().hex[:12])
+
+    def start(self):
+        """启动后台任务（可重复调用）"""
+        self.backend.start(self._deliver)
+        if self._conflation_task is None or self._conflation_task.done():
+            self._conflation_task = asyncio.create_task(self._conflation_loop())
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
 
-    async def connect(self, websocket: WebSocket, client_id: str = None):
+    async def stop(self):
+        """停止后台任务"""
+        self.backend.stop()
+        for task in (self._conflation_task, self._heartbeat_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._conflation_task = None
+        self._heartbeat_task = None
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        client_id: str = None,
+        encoding: Optional[str] = None,
+        batch_window_ms: Optional[int] = None,
+    ):
         """
         接受新的WebSocket连接
 
         Args:
             websocket: WebSocket连接对象
             client_id: 客户端ID（可选）
+            encoding: 消息编码（json / msgpack，可选，默认 json）
+            batch_window_ms: 批量推送时间窗（毫秒，可选，默认逐条发送）
+
+        Returns:
+            唯一连接ID
         """
         await websocket.accept()
-        self.active_connections.append(websocket)
-
-        if client_id:
-            self.connection_ids[websocket] = client_id
+        self.start()
 
-        logger.info(f"WebSocket连接建立: {client_id or 'anonymous'}, 当前连接数: {len(self.active_connections)}")
+        # 创建连接状态并启动写协程
+        if encoding and encoding not in supported_encodings():
+            logger.warning(f"不支持的消息编码 {encoding}，使用 json")
+            encoding = None
+        client = ClientConnection(websocket, client_id, self.queue_size, encoding or ENCODING_JSON)
+        if batch_window_ms:
+            client.batch_window = self._clamp_batch_window(batch_window_ms)
+        self.connections[client.conn_id] = client
+        self.clients[websocket] = client
+        self.unfiltered.add(client)
+        client.writer_task = asyncio.create_task(self._writer(client))
 
-        # 启动心跳检测
-        self.heartbeat_tasks[websocket] = asyncio.create_task(
-            self._heartbeat(websocket)
+        logger.info(
+            f"WebSocket连接建立: {client.client_id} ({client.conn_id}), "
+            f"当前连接数: {len(self.connections)}"
         )
 
         # 发送欢迎消息
         await self.send_personal_message({
             "type": "connection_established",
             "data": {
-                "client_id": client_id or "anonymous",
-                "server_time": datetime.utcnow().isoformat() + "Z"
+                "client_id": client.client_id,
+                "conn_id": client.conn_id,
+                "server_time": datetime.utcnow().isoformat() + "Z",
+                "epoch": self.replay_log.epoch,
+                "last_seq": self.replay_log.last_seq
             },
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }, websocket)
+        return client.conn_id
 
     def disconnect(self, websocket: WebSocket):
         """
-        断开WebSocket连接
+        断开WebSocket连接（可重复调用）
 
         Args:
             websocket: WebSocket连接对象
         """
-        client_id = self.connection_ids.get(websocket, "unknown")
-
-        # 取消心跳任务
-        if websocket in self.heartbeat_tasks:
-            self.heartbeat_tasks[websocket].cancel()
-            del self.heartbeat_tasks[websocket]
-
-        # 移除连接
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self.connections.pop(client.conn_id, None)
 
-        if websocket in self.connection_ids:
-            del self.connection_ids[websocket]
+        # 停止写协程和未发完的心跳
+        for task in (client.writer_task, client.ping_task):
+            if task and task is not asyncio.current_task():
+                task.cancel()
+        self._remove_subscriptions(client)
+        self._conflated_clients.discard(client)
 
-        logger.info(f"WebSocket连接断开: {client_id}, 剩余连接数: {len(self.active_connections)}")
+        logger.info(
+            f"WebSocket连接断开: {client.client_id} ({client.conn_id}), "
+            f"剩余连接数: {len(self.connections)}"
+        )
 
     async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket):
         """
-        发送消息给指定客户端
+        发送消息给指定客户端（入队，由写协程发送）
 
         Args:
             message: 消息内容（字典格式）
             websocket: 目标WebSocket连接
         """
-        try:
-            await websocket.send_text(json.dumps(message, ensure_ascii=False))
-        except Exception as e:
-            logger.error(f"发送消息失败: {e}")
-            self.disconnect(websocket)
+        client = self.clients.get(websocket)
+        if client is None:
+            logger.debug("目标连接不存在，跳过发送")
+            return
+        self._enqueue(client, Frame(message))
 
     async def broadcast(self, message: Dict[str, Any]):
         """
-        广播消息给所有连接的客户端
+        广播消息给所有连接的客户端（包括其他 worker 进程的连接）
+
+        只做非阻塞入队，不等待任何客户端实际发送完成。
+
+        Args:
+            message: 消息内容（字典格式）
+        """
+        if self._heartbeat_task is None:
+            # 未经应用启动事件直接广播时，确保后端已就绪
+            self.start()
+        self.backend.publish(message)
+
+    def _deliver(self, message: Dict[str, Any]):
+        """
+        将广播消息投递给本进程的连接（由广播后端调用）
 
         Args:
             message: 消息内容（字典格式）
         """
-        if not self.active_connections:
+        msg_type = message.get("type")
+        if msg_type == "orderbook_update":
+            self._publish_orderbook_delta(message)
+
+        frame = None
+        if msg_type in self.replay_types:
+            # 加序列号并记录到回放缓冲（即使当前没有连接）
+            message = dict(message, seq=self.replay_log.next_seq())
+            frame = Frame(message)
+            self.replay_log.append(frame.topic, message["seq"], frame)
+
+        if not self.clients:
             logger.debug("没有活跃连接，跳过广播")
             return
 
-        logger.debug(f"广播消息给 {len(self.active_connections)} 个客户端: {message.get('type')}")
+        targets = self._targets_for(message)
+        if not targets:
+            logger.debug(f"没有订阅者，跳过广播: {msg_type}")
+            return
 
-        # 记录断开的连接
-        disconnected = []
+        logger.debug(f"广播消息给 {len(targets)} 个客户端: {msg_type}")
 
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message, ensure_ascii=False))
-            except Exception as e:
-                logger.warning(f"广播失败，标记断开连接: {e}")
-                disconnected.append(connection)
+        # 只编码一次，所有连接共享
+        if frame is None:
+            frame = Frame(message)
+        rate = self.conflate_rates.get(message.get("type"))
+        if rate:
+            now = time.monotonic()
+            for client in targets:
+                self._conflate(client, frame, now)
+        else:
+            for client in targets:
+                self._enqueue(client, frame)
 
-        # 清理断开的连接
-        for connection in disconnected:
-            self.disconnect(connection)
+    def _targets_for(self, message: Dict[str, Any]) -> Set[ClientConnection]:
+        """
+        查找消息的接收者：订阅了消息类型或"类型:交易对"的连接，以及未过滤的连接
 
-    async def _heartbeat(self, websocket: WebSocket):
+        Args:
+            message: 消息内容（字典格式）
+
+        Returns:
+            接收该消息的连接集合
+        """
+        msg_type = message.get("type")
+        topic = topic_for(message)
+        targets = set() if msg_type in EXPLICIT_TOPIC_TYPES else set(self.unfiltered)
+        if msg_type in self.subscribers:
+            targets |= self.subscribers[msg_type]
+        if topic != msg_type and topic in self.subscribers:
+            targets |= self.subscribers[topic]
+        return targets
+
+    def _publish_orderbook_delta(self, message: Dict[str, Any]):
+        """
+        由完整盘口更新计算增量，推送给 orderbook_delta 订阅者
+
+        Args:
+            message: orderbook_update 消息
+        """
+        data = message.get("data") or {}
+        symbol = data.get("symbol")
+        if not symbol:
+            return
+
+        stream = self.orderbook_streams.get(symbol)
+        if stream is None:
+            stream = self.orderbook_streams[symbol] = OrderbookStream(symbol)
+
+        delta = stream.apply(data.get("bids") or [], data.get("asks") or [])
+        if delta is None:
+            return
+
+        delta_message = create_message(ORDERBOOK_DELTA, delta)
+        targets = self._targets_for(delta_message)
+        if not targets:
+            return
+        frame = Frame(delta_message)
+        for client in targets:
+            self._enqueue(client, frame)
+
+    async def _send_orderbook_snapshots(self, websocket: WebSocket, topics: List[str]):
         """
-        心跳检测任务
+        为 orderbook_delta 主题发送完整快照（订阅或重新同步时调用）
 
         Args:
             websocket: WebSocket连接对象
+            topics: 主题列表
         """
+        for topic in topics:
+            msg_type, _, symbol = topic.partition(":")
+            if msg_type != ORDERBOOK_DELTA:
+                continue
+            if symbol:
+                stream = self.orderbook_streams.get(symbol) or OrderbookStream(symbol)
+                streams = [stream]
+            else:
+                streams = list(self.orderbook_streams.values())
+            for stream in streams:
+                await self.send_personal_message(
+                    create_message(ORDERBOOK_SNAPSHOT, stream.snapshot()), websocket
+                )
+
+    # ============ 订阅管理 ============
+
+    def subscribe(self, websocket: WebSocket, topics: List[str]) -> Set[str]:
+        """
+        订阅主题
+
+        Args:
+            websocket: WebSocket连接对象
+            topics: 主题列表，如 "orderbook_update:KOGE/USDT" 或 "system_status"
+
+        Returns:
+            连接当前订阅的全部主题
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return set()
+
+        if client.topics is None:
+            # 第一次订阅后只接收已订阅主题
+            client.topics = set()
+            self.unfiltered.discard(client)
+
+        for topic in topics:
+            if len(client.topics) >= MAX_TOPICS_PER_CLIENT:
+                logger.warning(f"客户端 {client.client_id} 订阅数达到上限 {MAX_TOPICS_PER_CLIENT}")
+                break
+            client.topics.add(topic)
+            self.subscribers.setdefault(topic, set()).add(client)
+        return client.topics
+
+    def unsubscribe(self, websocket: WebSocket, topics: List[str]) -> Set[str]:
+        """
+        取消订阅主题
+
+        Args:
+            websocket: WebSocket连接对象
+            topics: 主题列表
+
+        Returns:
+            连接当前订阅的全部主题
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return set()
+
+        if client.topics is None:
+            client.topics = set()
+            self.unfiltered.discard(client)
+
+        for topic in topics:
+            client.topics.discard(topic)
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.subscribers[topic]
+        return client.topics
+
+    @staticmethod
+    def _parse_resume_text(raw: str) -> Optional[Dict[str, Any]]:
+        """解析文本格式的恢复请求: "resume from=<seq> [epoch=<epoch>]" """
+        payload: Dict[str, Any] = {"action": "resume"}
+        for part in raw.split()[1:]:
+            key, _, value = part.partition("=")
+            if key in ("from", "epoch") and value:
+                payload[key] = value
+        return payload if "from" in payload else None
+
+    def _replay_topics(self, client: ClientConnection) -> List[str]:
+        """连接有权接收的回放主题"""
+        topics = []
+        for topic in self.replay_log.buffers:
+            if client.topics is None or topic in client.topics or topic.partition(":")[0] in client.topics:
+                topics.append(topic)
+        return topics
+
+    async def _resume(self, websocket: WebSocket, from_seq: Any, epoch: Any):
+        """
+        补发客户端断线期间错过的事件
+
+        缺口超出回放缓冲（或 epoch 不一致）时，发送每个主题的最新事件作为状态快照，
+        并在 resume_complete 中标记 gap，客户端据此决定是否需要通过 REST 重新加载。
+
+        Args:
+            websocket: WebSocket连接对象
+            from_seq: 客户端已收到的最大序列号
+            epoch: 客户端记录的 epoch（可选）
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        try:
+            from_seq = int(from_seq)
+        except (TypeError, ValueError):
+            await self.send_personal_message(
+                create_message("error", {"message": "resume 需要整数参数 from"}), websocket
+            )
+            return
+
+        log = self.replay_log
+        topics = self._replay_topics(client)
+        frames, gap = log.collect(topics, from_seq)
+        if epoch is not None and epoch != log.epoch:
+            gap = True
+        # 回放量超过发送队列容量时同样视为缺口，避免溢出丢弃
+        if gap or len(frames) > client.queue.maxsize // 2:
+            gap = True
+            frames = log.latest(topics)
+
+        for frame in frames:
+            self._enqueue(client, frame)
+
+        logger.info(f"客户端 {client.client_id} 从 seq={from_seq} 恢复，补发 {len(frames)} 条，gap={gap}")
+        await self.send_personal_message(
+            create_message("resume_complete", {
+                "from": from_seq,
+                "replayed": len(frames),
+                "gap": gap,
+                "epoch": log.epoch,
+                "last_seq": log.last_seq,
+            }), websocket
+        )
+
+    async def _set_encoding(self, websocket: WebSocket, encoding: Any):
+        """
+        切换连接的消息编码，之后的消息（包括本次确认）使用新编码
+
+        Args:
+            websocket: WebSocket连接对象
+            encoding: 新的消息编码
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        if encoding not in supported_encodings():
+            await self.send_personal_message(
+                create_message("error", {
+                    "message": f"不支持的消息编码: {encoding}",
+                    "supported": supported_encodings(),
+                }), websocket
+            )
+            return
+        client.encoding = encoding
+        await self.send_personal_message(
+            create_message("encoding", {"encoding": encoding}), websocket
+        )
+
+    def _clamp_batch_window(self, window_ms: Any) -> float:
+        """将客户端请求的批量时间窗限制在 [0, max_batch_window_ms]，返回秒"""
+        try:
+            window_ms = float(window_ms)
+        except (TypeError, ValueError):
+            return 0.0
+        return max(0.0, min(window_ms, self.max_batch_window_ms)) / 1000
+
+    async def _set_batching(self, websocket: WebSocket, window_ms: Any):
+        """
+        设置连接的批量推送时间窗
+
+        Args:
+            websocket: WebSocket连接对象
+            window_ms: 时间窗（毫秒），0 表示关闭
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        client.batch_window = self._clamp_batch_window(window_ms)
+        await self.send_personal_message(
+            create_message("batching", {"window_ms": int(client.batch_window * 1000)}), websocket
+        )
+
+    def _set_rate_override(self, websocket: WebSocket, topics: List[str], max_rate: Any):
+        """
+        设置客户端对合并类消息的发送频率（只能低于服务端上限）
+
+        Args:
+            websocket: WebSocket连接对象
+            topics: 主题列表
+            max_rate: 最大发送频率（次/秒）
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        try:
+            max_rate = float(max_rate)
+        except (TypeError, ValueError):
+            return
+        if max_rate <= 0:
+            return
+        for topic in topics:
+            msg_type = topic.partition(":")[0]
+            if msg_type in self.conflate_rates:
+                client.rate_overrides[msg_type] = max_rate
+
+    def _remove_subscriptions(self, client: ClientConnection):
+        """从主题索引中移除连接"""
+        self.unfiltered.discard(client)
+        for topic in client.topics or ():
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.subscribers[topic]
+
+    async def handle_client_message(self, websocket: WebSocket, raw: str) -> bool:
+        """
+        处理客户端控制消息（订阅/取消订阅/盘口重新同步/切换编码/批量推送/断线恢复）
+
+        Args:
+            websocket: WebSocket连接对象
+            raw: 客户端发送的原始文本
+
+        Returns:
+            是否为已处理的控制消息
+        """
+        if raw.startswith("resume "):
+            payload = self._parse_resume_text(raw)
+            if payload is None:
+                return False
+        else:
+            try:
+                payload = json.loads(raw)
+            except (json.JSONDecodeError, TypeError):
+                return False
+            if not isinstance(payload, dict) or "action" not in payload:
+                return False
+
+        action = payload.get("action")
+        if action == "resume":
+            await self._resume(websocket, payload.get("from"), payload.get("epoch"))
+            return True
+
+        if action == "set_encoding":
+            await self._set_encoding(websocket, payload.get("encoding"))
+            return True
+
+        if action == "set_batching":
+            await self._set_batching(websocket, payload.get("window_ms"))
+            return True
+
+        if action not in ("subscribe", "unsubscribe", "resync"):
+            await self.send_personal_message(
+                create_message("error", {"message": f"未知的操作: {action}"}), websocket
+            )
+            return True
+
+        topics = payload.get("topics")
+        if isinstance(topics, str):
+            topics = [topics]
+        if not isinstance(topics, list) or not all(
+            isinstance(t, str) and 0 < len(t) <= MAX_TOPIC_LENGTH for t in topics
+        ):
+            await self.send_personal_message(
+                create_message("error", {"message": "topics 必须为非空字符串列表"}), websocket
+            )
+            return True
+
+        if action == "resync":
+            await self._send_orderbook_snapshots(websocket, topics)
+            return True
+
+        if action == "subscribe":
+            current = self.subscribe(websocket, topics)
+            max_rate = payload.get("max_rate")
+            if max_rate is not None:
+                self._set_rate_override(websocket, topics, max_rate)
+        else:
+            current = self.unsubscribe(websocket, topics)
+
+        await self.send_personal_message(
+            create_message("subscribed", {"topics": sorted(current)}), websocket
+        )
+        if action == "subscribe":
+            await self._send_orderbook_snapshots(websocket, topics)
+        return True
+
+    def _enqueue(self, client: ClientConnection, frame: Frame) -> bool:
+        """
+        将消息放入客户端发送队列，队列满时按溢出策略处理
+
+        Args:
+            client: 目标连接
+            frame: 已编码的消息帧
+
+        Returns:
+            是否成功入队
+        """
+        queue = client.queue
+        if queue.full():
+            if self.overflow_policy == OVERFLOW_DISCONNECT:
+                logger.warning(f"客户端 {client.client_id} 发送队列已满({queue.maxsize})，断开慢客户端")
+                self._drop_slow_client(client)
+                return False
+
+            # drop_oldest: 丢弃最旧的一条，为新消息腾出位置
+            try:
+                queue.get_nowait()
+                queue.task_done()
+            except asyncio.QueueEmpty:
+                pass
+            client.dropped_messages += 1
+            if client.dropped_messages % 100 == 1:
+                logger.warning(f"客户端 {client.client_id} 发送队列已满，累计丢弃 {client.dropped_messages} 条消息")
+
+        queue.put_nowait(frame)
+        if queue.qsize() > client.max_queue_depth:
+            client.max_queue_depth = queue.qsize()
+        return True
+
+    def _send_interval(self, client: ClientConnection, msg_type: str) -> float:
+        """客户端某类合并消息的最小发送间隔（秒）"""
+        rate = self.conflate_rates.get(msg_type) or 1.0
+        override = client.rate_overrides.get(msg_type)
+        if override:
+            rate = min(rate, override)
+        return 1.0 / rate
+
+    def _conflate(self, client: ClientConnection, frame: Frame, now: float):
+        """
+        按频率限制发送只关心最新值的消息，超出频率时覆盖待发送的旧值
+
+        Args:
+            client: 目标连接
+            frame: 已编码的消息帧
+            now: 当前单调时间
+        """
+        topic = frame.topic
+        if topic not in client.pending and now >= client.next_send_at.get(topic, 0.0):
+            client.next_send_at[topic] = now + self._send_interval(client, frame.type)
+            self._enqueue(client, frame)
+            return
+
+        if topic in client.pending:
+            client.conflated_messages += 1
+        client.pending[topic] = frame
+        self._conflated_clients.add(client)
+
+    def _flush_conflated(self, now: float):
+        """发送到期的合并帧"""
+        for client in list(self._conflated_clients):
+            for topic, frame in list(client.pending.items()):
+                if now < client.next_send_at.get(topic, 0.0):
+                    continue
+                del client.pending[topic]
+                client.next_send_at[topic] = now + self._send_interval(client, frame.type)
+                self._enqueue(client, frame)
+            if not client.pending:
+                self._conflated_clients.discard(client)
+
+    async def _conflation_loop(self):
+        """合并推送刷新循环，所有连接共享一个任务"""
         try:
             while True:
-                await asyncio.sleep(30)  # 每30秒发送一次心跳
+                await asyncio.sleep(self.conflation_tick)
+                if self._conflated_clients:
+                    self._flush_conflated(time.monotonic())
+        except asyncio.CancelledError:
+            logger.debug("合并推送任务已取消")
+
+    def _drop_slow_client(self, client: ClientConnection):
+        """断开无法跟上推送速度的客户端"""
+        websocket = client.websocket
+        self.disconnect(websocket)
+        # 1013: Try Again Later
+        asyncio.create_task(self._close_quietly(websocket, code=1013))
 
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int = 1000):
+        """关闭连接，忽略已关闭等异常"""
+        try:
+            await websocket.close(code=code)
+        except Exception as e:
+            logger.debug(f"关闭WebSocket连接失败: {e}")
+
+    async def _writer(self, client: ClientConnection):
+        """
+        连接写协程：按顺序发送队列中的消息，开启批量推送时合并时间窗内的消息
+
+        Args:
+            client: 连接发送状态
+        """
+        queue = client.queue
+        websocket = client.websocket
+        try:
+            while True:
+                frames = [await queue.get()]
+                if client.batch_window > 0:
+                    # 等待时间窗结束，收集期间到达的消息
+                    await asyncio.sleep(client.batch_window)
+                    while len(frames) < self.max_batch_size and not queue.empty():
+                        frames.append(queue.get_nowait())
                 try:
-                    ping_message = {
-                        "type": "ping",
-                        "timestamp": datetime.utcnow().isoformat() + "Z"
-                    }
-                    await websocket.send_text(json.dumps(ping_message, ensure_ascii=False))
-                    logger.debug("心跳ping发送成功")
+                    async with client.send_lock:
+                        if len(frames) == 1:
+                            frame = frames[0]
+                            if client.encoding == ENCODING_MSGPACK:
+                                await websocket.send_bytes(frame.packed)
+                            else:
+                                await websocket.send_text(frame.text)
+                            client.bytes_sent += frame.size(client.encoding)
+                        else:
+                            payload = encode_batch(frames, client.encoding)
+                            if client.encoding == ENCODING_MSGPACK:
+                                await websocket.send_bytes(payload)
+                                client.bytes_sent += len(payload)
+                            else:
+                                await websocket.send_text(payload)
+                                # 各帧字节数 + 方括号和逗号
+                                client.bytes_sent += sum(frame.size(client.encoding) for frame in frames) + len(frames) + 1
+                    client.sent_messages += len(frames)
+                    client.sent_frames += 1
                 except Exception as e:
-                    logger.warning(f"心跳ping发送失败: {e}")
+                    logger.warning(f"发送失败，标记断开连接 {client.client_id}: {e}")
                     self.disconnect(websocket)
                     break
+                finally:
+                    for _ in frames:
+                        queue.task_done()
+        except asyncio.CancelledError:
+            logger.debug(f"写协程已取消: {client.client_id}")
+
+    def record_pong(self, websocket: WebSocket):
+        """
+        记录客户端活动（pong或其他任意消息都说明连接仍然存活）
+
+        Args:
+            websocket: WebSocket连接对象
+        """
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.last_pong = time.monotonic()
+
+    async def _send_ping(self, client: ClientConnection, text: str):
+        """
+        发送心跳ping
+
+        ping 不进入发送队列：始终是单独的 JSON 文本帧（不参与批量推送和
+        MessagePack 编码，客户端只识别顶层 type 为 ping 的文本消息），
+        也不会在队列满时被 drop_oldest 丢弃。
+
+        Args:
+            client: 目标连接
+            text: 预编码的ping文本
+        """
+        try:
+            async with client.send_lock:
+                await client.websocket.send_text(text)
+            client.bytes_sent += len(text)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"心跳发送失败，标记断开连接 {client.client_id}: {e}")
+            self.disconnect(client.websocket)
+
+    def _sweep_heartbeats(self, now: float) -> int:
+        """
+        检查所有连接：断开超时未响应的连接，其余连接发送同一个心跳帧
+
+        Args:
+            now: 当前单调时间
+
+        Returns:
+            断开的连接数
+        """
+        ping_text = encode_json({
+            "type": "ping",
+            "timestamp": datetime.utcnow().isoformat() + "Z"
+        })
+        expired = 0
+        for client in list(self.connections.values()):
+            if now - client.last_pong > self.heartbeat_timeout:
+                logger.warning(f"客户端 {client.client_id} 超过 {self.heartbeat_timeout}s 未响应心跳，断开连接")
+                self.disconnect(client.websocket)
+                # 1001: Going Away
+                asyncio.create_task(self._close_quietly(client.websocket, code=1001))
+                expired += 1
+                continue
+            # 上一个ping还在等待发送（连接写阻塞）时不重复发送
+            if client.ping_task is None or client.ping_task.done():
+                client.ping_task = asyncio.create_task(self._send_ping(client, ping_text))
+        return expired
+
+    async def _heartbeat_loop(self):
+        """心跳调度循环，所有连接共享一个任务和一个预编码的ping帧"""
+        try:
+            while True:
+                await asyncio.sleep(self.heartbeat_interval)
+                if self.clients:
+                    self._sweep_heartbeats(time.monotonic())
+                    logger.debug(f"心跳ping已发送给 {len(self.clients)} 个客户端")
         except asyncio.CancelledError:
             logger.debug("心跳任务已取消")
 
     def get_connection_count(self) -> int:
         """获取当前活跃连接数"""
-        return len(self.active_connections)
+        return len(self.connections)
+
+    def get_connection(self, conn_id: str) -> Optional[ClientConnection]:
+        """按唯一连接ID获取连接"""
+        return self.connections.get(conn_id)
+
+    def get_connection_stats(self) -> List[Dict[str, Any]]:
+        """获取每个连接的元数据与统计，按已发送字节数降序"""
+        stats = [client.stats() for client in self.connections.values()]
+        stats.sort(key=lambda item: item["bytes_sent"], reverse=True)
+        return stats
 
 
 # 全局连接管理器实例
@@ -179,12 +1110,19 @@ def create_price_update(symbol: str, price: float, change_24h: float) -> Dict[st
     })
 
 
-def create_orderbook_update(bids: List[List[float]], asks: List[List[float]]) -> Dict[str, Any]:
+def create_orderbook_update(
+    bids: List[List[float]],
+    asks: List[List[float]],
+    symbol: Optional[str] = None
+) -> Dict[str, Any]:
     """创建盘口更新消息"""
-    return create_message("orderbook_update", {
+    data = {
         "bids": bids,
         "asks": asks
-    })
+    }
+    if symbol:
+        data["symbol"] = symbol
+    return create_message("orderbook_update", data)
 
 
 def create_trade_executed(side: str, price: float, quantity: float, cost: float) -> Dict[str, Any]:
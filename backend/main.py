@@ -18,6 +18,7 @@ from api.routes import auth_router
 from api.routes.config import router as config_router
 from api.routes.logs import router as logs_router
 from api.routes.trades import router as trades_router
+from api.routes.market import router as market_router
 
 # 导入WebSocket管理器
 from api.websocket import (
@@ -28,6 +29,14 @@ from api.websocket import (
     create_system_status
 )
 
+# 行情数据批量写入器
+from modules.batch_writer import market_writer
+from modules.candles import candle_aggregator
+from modules.market_state import market_state
+from modules.retention import retention_service
+from models.partition import partition_router
+from models.writer import db_writer
+
 # 配置日志 - 使用新的日志模块
 from utils.logger import logger, setup_logger
 
@@ -130,6 +139,7 @@ app.include_router(auth_router)
 app.include_router(config_router)
 app.include_router(logs_router)
 app.include_router(trades_router)
+app.include_router(market_router)
 
 
 # ============ 工具函数 ============
@@ -179,7 +189,8 @@ async def root() -> Dict[str, Any]:
                 "auth": "/api/auth/*",
                 "config": "/api/config/*",
                 "logs": "/api/logs/*",
-                "trades": "/api/trades/*"
+                "trades": "/api/trades/*",
+                "market": "/api/market/*"
             }
         }
     )
@@ -199,6 +210,12 @@ async def health_check() -> Dict[str, Any]:
         data={
             "status": "healthy",
             "service": "alpha-score-backend",
+            "db_writer": db_writer.stats(),
+            "market_writer": market_writer.stats(),
+            "candles": candle_aggregator.stats(),
+            "market_state": market_state.stats(),
+            "retention": retention_service.last_report,
+            "partitions": partition_router.stats(),
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
     )
@@ -236,6 +253,11 @@ async def api_info() -> Dict[str, Any]:
                     "prefix": "/api/trades",
                     "description": "交易相关接口",
                     "routes": ["GET /stats", "GET /history", "GET /status", "GET /market", "GET /funds", "GET /points"]
+                },
+                "market": {
+                    "prefix": "/api/market",
+                    "description": "行情数据相关接口",
+                    "routes": ["GET /klines"]
                 }
             },
             "documentation": {
@@ -261,26 +283,41 @@ async def websocket_endpoint(websocket: WebSocket):
     - trade_executed: 交易执行
     - system_status: 系统状态
     - ping: 心跳检测
+
+    客户端可发送订阅消息只接收指定主题:
+    {"action": "subscribe", "topics": ["orderbook_update:KOGE/USDT", "system_status"]}
+
+    二进制编码: ws://localhost:8000/ws?encoding=msgpack
+    批量推送:   ws://localhost:8000/ws?batch=30 （30ms 内的消息合并为一个数组帧）
     """
     # 获取客户端信息
-    client_host = websocket.client.host if websocket.client else "unknown"
-    client_id = f"client_{client_host}"
+    if websocket.client:
+        client_id = f"client_{websocket.client.host}:{websocket.client.port}"
+    else:
+        client_id = "client_unknown"
+    encoding = websocket.query_params.get("encoding")
+    batch_window_ms = websocket.query_params.get("batch")
 
-    await manager.connect(websocket, client_id)
+    conn_id = await manager.connect(websocket, client_id, encoding=encoding, batch_window_ms=batch_window_ms)
 
     try:
         while True:
             # 接收客户端消息
             data = await websocket.receive_text()
             logger.debug(f"收到客户端消息: {data}")
+            # 任意消息都说明连接存活
+            manager.record_pong(websocket)
 
             # 处理pong响应
             if data == "pong":
                 logger.debug("收到心跳pong响应")
                 continue
 
-            # 这里可以根据需要处理其他客户端消息
-            # 暂时只回显消息
+            # 订阅/取消订阅等控制消息
+            if await manager.handle_client_message(websocket, data):
+                continue
+
+            # 其他消息回显
             await manager.send_personal_message({
                 "type": "echo",
                 "data": {"message": f"服务器收到: {data}"},
@@ -289,7 +326,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
-        logger.info(f"WebSocket客户端断开: {client_id}")
+        logger.info(f"WebSocket客户端断开: {client_id} ({conn_id})")
     except Exception as e:
         logger.error(f"WebSocket错误: {e}", exc_info=True)
         manager.disconnect(websocket)
@@ -298,7 +335,10 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.get("/ws/connections", tags=["WebSocket"])
 async def get_connections() -> Dict[str, Any]:
     """
-    获取当前WebSocket连接数
+    获取当前WebSocket连接数及每个连接的统计
+
+    每个连接包含唯一连接ID、连接时间、订阅主题、已发送字节数/消息数、
+    发送队列深度和最近一次心跳响应，按已发送字节数降序排列
 
     Returns:
         连接统计信息
@@ -307,6 +347,9 @@ async def get_connections() -> Dict[str, Any]:
         message="WebSocket连接统计",
         data={
             "active_connections": manager.get_connection_count(),
+            "overflow_policy": manager.overflow_policy,
+            "broadcast": manager.backend.stats(),
+            "clients": manager.get_connection_stats(),
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
     )
@@ -337,7 +380,8 @@ async def broadcast_test_message() -> Dict[str, Any]:
     # 广播盘口更新
     orderbook_msg = create_orderbook_update(
         bids=[[round(0.005 - i * 0.00001, 6), random.randint(500, 2000)] for i in range(5)],
-        asks=[[round(0.005 + i * 0.00001, 6), random.randint(500, 2000)] for i in range(5)]
+        asks=[[round(0.005 + i * 0.00001, 6), random.randint(500, 2000)] for i in range(5)],
+        symbol="KOGE/USDT"
     )
     await manager.broadcast(orderbook_msg)
 
@@ -372,9 +416,25 @@ async def startup_event():
     logger.info("  - /api/config/*  (Configuration)")
     logger.info("  - /api/logs/*    (Logs)")
     logger.info("  - /api/trades/*  (Trading)")
+    logger.info("  - /api/market/*  (Market)")
     logger.info("  - /ws            (WebSocket)")
     logger.info("=" * 60)
 
+    # 启动WebSocket后台任务
+    manager.start()
+
+    # 启动数据库单写入者队列
+    db_writer.start()
+
+    # 启动行情数据批量写入
+    market_writer.start()
+
+    # 启动K线到期收盘任务
+    candle_aggregator.start()
+
+    # 启动历史行情数据清理任务
+    retention_service.start()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -383,6 +443,15 @@ async def shutdown_event():
     logger.info("Alpha-Score Backend API is shutting down...")
     logger.info("=" * 60)
 
+    await manager.stop()
+    await retention_service.stop()
+
+    # 先停止K线聚合，再写出缓冲中剩余的行情数据
+    await candle_aggregator.stop()
+    await market_writer.stop()
+    await db_writer.stop()
+    await partition_router.close()
+
 
 # ============ 启动服务 ============
 
@@ -2,13 +2,15 @@
 Database models package
 Export all models for external use
 """
-from .database import Base, engine, AsyncSessionLocal, get_db, init_db, drop_db
+from .database import Base, engine, read_engine, AsyncSessionLocal, ReadSessionLocal, get_db, get_read_db, init_db, drop_db
+from .writer import SQLiteWriter, db_writer
 from .base import BaseModel, TimestampMixin
 from .user import User
 from .config import Config
 from .trade import Trade, TradeSide, TradeStatus
 from .market_data import MarketData
 from .orderbook import OrderbookSnapshot
+from .orderbook_minute import OrderbookMinute
 from .points_history import PointsHistory
 from .grid_trade import GridTrade, GridTradeSide, GridTradeStatus
 from .system_log import SystemLog, LogLevel
@@ -17,8 +19,13 @@ __all__ = [
     # Database related
     "Base",
     "engine",
+    "read_engine",
     "AsyncSessionLocal",
+    "ReadSessionLocal",
     "get_db",
+    "get_read_db",
+    "SQLiteWriter",
+    "db_writer",
     "init_db",
     "drop_db",
     # Base classes
@@ -32,6 +39,7 @@ __all__ = [
     "TradeStatus",
     "MarketData",
     "OrderbookSnapshot",
+    "OrderbookMinute",
     "PointsHistory",
     "GridTrade",
     "GridTradeSide",
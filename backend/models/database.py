@@ -2,20 +2,138 @@
 数据库连接配置
 使用 SQLAlchemy 2.0+ 异步 API + aiosqlite
 """
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Tuple, Union
+from sqlalchemy import Table, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from pathlib import Path
 
-# 数据库文件路径
-DB_PATH = Path(__file__).parent.parent.parent / "data" / "alpha-score.db"
-DB_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+from utils.app_config import SQLitePragmaConfig, get_config
+from utils.config import settings
+from utils.logger import logger
+
+# 项目根目录
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# PRAGMA 执行顺序：busy_timeout 先于可能等待锁的设置；auto_vacuum 必须在
+# journal_mode 之前，切换 WAL 会写入新库的文件头，之后再改 auto_vacuum 不再生效
+PRAGMA_ORDER = ("busy_timeout", "auto_vacuum", "journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store")
+
+
+# 可以直接换成 aiosqlite 的同步 SQLite 驱动
+SYNC_SQLITE_DRIVERS = ("sqlite", "sqlite+pysqlite")
+
+
+def normalize_database_url(url: str) -> str:
+    """
+    规范化 SQLite 连接地址
+
+    - 同步驱动（sqlite://、sqlite+pysqlite://）换成 sqlite+aiosqlite://
+    - 相对路径按项目根目录解析，与启动时的工作目录无关
+
+    Raises:
+        ValueError: 不是 SQLite 地址或驱动不受支持
+    """
+    parsed = make_url(url)
+    if parsed.drivername in SYNC_SQLITE_DRIVERS:
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    elif parsed.drivername != "sqlite+aiosqlite":
+        raise ValueError(
+            f"Unsupported DATABASE_URL driver '{parsed.drivername}', "
+            "expected sqlite+aiosqlite:///path/to/alpha-score.db"
+        )
+    database = parsed.database
+    if database and database != ":memory:" and not database.startswith("file:"):
+        path = Path(database)
+        if not path.is_absolute():
+            parsed = parsed.set(database=str(PROJECT_ROOT / path))
+    return parsed.render_as_string(hide_password=False)
+
+
+def resolve_database_url() -> str:
+    """
+    数据库连接地址
+
+    显式设置了环境变量（或 .env）DATABASE_URL 时使用它（规范化后），否则使用 database.path 配置
+    """
+    if "DATABASE_URL" in settings.model_fields_set:
+        return normalize_database_url(settings.DATABASE_URL)
+    path = Path(get_config().database.path)
+    if not path.is_absolute():
+        path = PROJECT_ROOT / path
+    return f"sqlite+aiosqlite:///{path}"
+
+
+def apply_sqlite_pragmas(engine: AsyncEngine, pragmas: SQLitePragmaConfig, read_only: bool = False):
+    """
+    为引擎的每个新连接注册 PRAGMA 设置（未配置的项保持 SQLite 默认值）
+
+    read_only 时跳过会改写数据库文件的 auto_vacuum/journal_mode，并开启 query_only
+    """
+    skipped = ("auto_vacuum", "journal_mode") if read_only else ()
+    statements = [
+        f"PRAGMA {name} = {value}"
+        for name, value in ((name, getattr(pragmas, name)) for name in PRAGMA_ORDER)
+        if value is not None and name not in skipped
+    ]
+    if read_only:
+        statements.append("PRAGMA query_only = ON")
+    if not statements:
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def create_sqlite_engine(
+    path: Union[Path, str],
+    echo: bool = False,
+    pragmas: Optional[SQLitePragmaConfig] = None,
+    read_only: bool = False,
+    **engine_options,
+) -> AsyncEngine:
+    """
+    创建 SQLite 异步引擎（主库、只读连接池、写入者和时序分区共用）
+
+    Args:
+        path: 数据库文件路径，或完整的连接地址（sqlite+aiosqlite:///...）
+        echo: 是否输出 SQL 日志
+        pragmas: 连接参数，默认使用 database.sqlite 配置
+        read_only: 连接只允许查询（PRAGMA query_only）
+        engine_options: 传给 create_async_engine 的其他参数（如 pool_size、poolclass）
+    """
+    url = normalize_database_url(str(path)) if "://" in str(path) else f"sqlite+aiosqlite:///{path}"
+    engine = create_async_engine(
+        url,
+        echo=echo,  # 设置为 True 可以看到 SQL 日志
+        future=True,
+        **engine_options,
+    )
+    apply_sqlite_pragmas(engine, pragmas or get_config().database.sqlite, read_only=read_only)
+    return engine
+
+
+# 数据库连接地址与文件路径
+DB_URL = resolve_database_url()
+DB_PATH = Path(make_url(DB_URL).database or "")
 
 # 创建异步引擎
-engine = create_async_engine(
+engine = create_sqlite_engine(DB_URL, echo=get_config().database.echo)
+
+# 只读连接池（接口查询使用，写入统一交给 models.writer.db_writer）
+# 内存数据库无法在引擎之间共享，直接使用主引擎
+read_engine = engine if str(DB_PATH) in ("", ":memory:") else create_sqlite_engine(
     DB_URL,
-    echo=False,  # 设置为 True 可以看到 SQL 日志
-    future=True,
+    echo=get_config().database.echo,
+    read_only=True,
+    pool_size=get_config().database.read_pool_size,
 )
 
 # 创建异步会话工厂
@@ -25,6 +143,13 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False,
 )
 
+# 只读会话工厂
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
 
 class Base(DeclarativeBase):
     """所有模型的基类"""
@@ -48,18 +173,103 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    获取只读数据库会话的依赖项（写操作会被拒绝，请使用 db_writer）
+
+    使用示例:
+        @app.get("/users")
+        async def get_users(db: AsyncSession = Depends(get_read_db)):
+            ...
+    """
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def group_by_columns(rows: Iterable[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """按列名集合分组数据行（同一次 executemany 的各行需要相同的列）"""
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    return list(groups.values())
+
+
+def _rebuild_table(sync_conn, table: Table, columns: List[str]) -> None:
+    """
+    按当前模型重建表并复制数据（SQLite 不支持 ALTER COLUMN）
+
+    整个过程在一个 SAVEPOINT 中执行，失败时回滚，原表保持不变。
+    """
+    old = f"{table.name}_old"
+    shared = ", ".join(f'"{name}"' for name in columns if name in table.c)
+    sync_conn.exec_driver_sql("SAVEPOINT rebuild_table")
+    try:
+        sync_conn.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old}"')
+        # 索引随表改名，先删除以免与新表的同名索引冲突
+        for index in sync_conn.exec_driver_sql(f'PRAGMA index_list("{old}")').all():
+            if index[3] == "c":
+                sync_conn.exec_driver_sql(f'DROP INDEX "{index[1]}"')
+        table.create(sync_conn)
+        sync_conn.exec_driver_sql(f'INSERT INTO "{table.name}" ({shared}) SELECT {shared} FROM "{old}"')
+        sync_conn.exec_driver_sql(f'DROP TABLE "{old}"')
+    except Exception:
+        sync_conn.exec_driver_sql("ROLLBACK TO rebuild_table")
+        sync_conn.exec_driver_sql("RELEASE rebuild_table")
+        raise
+    sync_conn.exec_driver_sql("RELEASE rebuild_table")
+
+
+def upgrade_schema(sync_conn, tables: Optional[Iterable[Table]] = None) -> None:
+    """
+    把已存在的表升级到当前模型（create_all 不会修改已存在的表，可重复执行）
+
+    - 模型新增的可空列：ALTER TABLE ADD COLUMN
+    - 模型中已改为可空、库中仍为 NOT NULL 的列：按当前模型重建表
+    """
+    for table in tables or Base.metadata.sorted_tables:
+        info = sync_conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")').all()
+        if not info:
+            continue
+        existing = [row[1] for row in info]
+
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                logger.warning(f"无法自动添加非空列 {table.name}.{column.name}，请手动迁移")
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+            logger.info(f"数据库升级: {table.name} 新增列 {column.name}")
+
+        not_null = {row[1] for row in info if row[3]}
+        relaxed = [
+            column.name for column in table.columns
+            if column.nullable and not column.primary_key and column.name in not_null
+        ]
+        if relaxed:
+            _rebuild_table(sync_conn, table, existing)
+            logger.info(f"数据库升级: 重建 {table.name}，以下列改为可空: {', '.join(relaxed)}")
+
+
 async def init_db() -> None:
-    """初始化数据库，创建所有表"""
+    """初始化数据库，创建所有表并升级已有表结构"""
     # 确保 data 目录存在
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     async with engine.begin() as conn:
         # 导入所有模型以确保它们被注册
-        from . import user, config, trade, market_data, orderbook, points_history, grid_trade, system_log
+        from . import user, config, trade, market_data, orderbook, orderbook_minute, points_history, grid_trade, system_log
 
         # 创建所有表
         await conn.run_sync(Base.metadata.create_all)
 
+        # 旧版本创建的表补齐新增列（如 orderbook_snapshots 的二进制盘口列）
+        await conn.run_sync(upgrade_schema)
+
 
 async def drop_db() -> None:
     """删除所有表（仅用于测试）"""
@@ -1,13 +1,72 @@
 """
 盘口快照模型
 存储订单簿快照数据
+
+支持两种存储格式：
+- JSON：bids/asks 文本列，[{"price": ..., "quantity": ...}, ...]
+- 二进制：levels 列存放定点 int64 (price, quantity) 数组（先买盘后卖盘，
+  单位：聪），bid_levels/ask_levels 记录档数；解码直接得到 NumPy 数组
 """
-from sqlalchemy import String, Text, DateTime, Index
+from typing import Any, Callable, Dict, Iterable, Sequence, Tuple
+from sqlalchemy import String, Text, DateTime, Index, Integer, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 import json
+
+import numpy as np
+
 from .database import Base
 
+# 定点数缩放系数（与其他模型一致，1 = 100,000,000 聪）
+PRICE_SCALE = 100_000_000
+
+# 二进制格式的数据类型：小端 int64
+LEVEL_DTYPE = np.dtype("<i8")
+
+
+def _levels_to_array(levels: Sequence) -> np.ndarray:
+    """将 [[price, qty], ...] 或 [{"price", "quantity"}, ...] 转为 (n, 2) float64 数组"""
+    if isinstance(levels, np.ndarray):
+        return levels.reshape(-1, 2).astype(np.float64, copy=False)
+    if levels and isinstance(levels[0], dict):
+        levels = [(level.get("price"), level.get("quantity")) for level in levels]
+    return np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+
+
+def pack_levels(bids: Sequence, asks: Sequence) -> Tuple[bytes, int, int]:
+    """
+    将买卖盘打包为定点 int64 二进制
+
+    Args:
+        bids: 买盘 [[price, qty], ...] 或 [{"price", "quantity"}, ...]
+        asks: 卖盘，格式同上
+
+    Returns:
+        (二进制数据, 买盘档数, 卖盘档数)
+    """
+    bid_array = _levels_to_array(bids)
+    ask_array = _levels_to_array(asks)
+    combined = np.concatenate((bid_array, ask_array)) * PRICE_SCALE
+    packed = np.rint(combined).astype(LEVEL_DTYPE)
+    return packed.tobytes(), len(bid_array), len(ask_array)
+
+
+def unpack_levels(blob: bytes, bid_levels: int, ask_levels: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    解码定点二进制盘口（零拷贝，返回只读 int64 视图，单位：聪）
+
+    Args:
+        blob: pack_levels 生成的二进制数据
+        bid_levels: 买盘档数
+        ask_levels: 卖盘档数
+
+    Returns:
+        (买盘 (n, 2) 数组, 卖盘 (m, 2) 数组)
+    """
+    raw = np.frombuffer(blob, dtype=LEVEL_DTYPE, count=(bid_levels + ask_levels) * 2)
+    raw = raw.reshape(-1, 2)
+    return raw[:bid_levels], raw[bid_levels:]
+
 
 class OrderbookSnapshot(Base):
     """
@@ -26,13 +85,22 @@ class OrderbookSnapshot(Base):
     # 时间戳
     timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
 
-    # 买单列表（JSON 格式存储）
+    # 买单列表（JSON 格式存储，二进制格式时为空）
     # 格式：[{"price": 50000.5, "quantity": 0.1}, ...]
-    bids: Mapped[str] = mapped_column(Text, nullable=False)
+    bids: Mapped[str | None] = mapped_column(Text, nullable=True)
 
-    # 卖单列表（JSON 格式存储）
+    # 卖单列表（JSON 格式存储，二进制格式时为空）
     # 格式：[{"price": 50100.5, "quantity": 0.1}, ...]
-    asks: Mapped[str] = mapped_column(Text, nullable=False)
+    asks: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    # 二进制盘口：定点 int64 (price, quantity) 数组，先买盘后卖盘（单位：聪）
+    levels: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+
+    # 二进制盘口的买盘档数
+    bid_levels: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # 二进制盘口的卖盘档数
+    ask_levels: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     # 索引
     __table_args__ = (
@@ -47,27 +115,117 @@ class OrderbookSnapshot(Base):
             f"timestamp={self.timestamp})"
         )
 
-    def get_bids(self) -> list[dict]:
-        """获取解析后的买单列表"""
+    @property
+    def is_binary(self) -> bool:
+        """是否为二进制存储格式"""
+        return self.levels is not None
+
+    def set_levels_binary(self, bids: Sequence, asks: Sequence) -> None:
+        """以二进制格式设置买卖盘（清空 JSON 列）"""
+        self.levels, self.bid_levels, self.ask_levels = pack_levels(bids, asks)
+        self.bids = None
+        self.asks = None
+
+    def _cached(self, key: str, source, decode: Callable[[], Any]) -> Any:
+        """
+        按原始数据缓存解码结果（只解析一次）
+
+        以原始字符串/二进制对象的身份作为缓存键，列被重新赋值后自动失效。
+        ORM 加载的实例不经过 __init__，因此缓存字典按需创建。
+        """
+        cache = getattr(self, "_decode_cache", None)
+        if cache is None:
+            cache = self._decode_cache = {}
+        entry = cache.get(key)
+        if entry is not None and entry[0] is source:
+            return entry[1]
+        value = decode()
+        cache[key] = (source, value)
+        return value
+
+    def _invalidate_cache(self) -> None:
+        """清空解码缓存"""
+        self._decode_cache = {}
+
+    def get_levels_raw(self) -> Tuple[np.ndarray, np.ndarray]:
+        """获取定点 int64 买卖盘数组（单位：聪），二进制格式为零拷贝视图"""
+        if self.is_binary:
+            return self._cached(
+                "raw", self.levels,
+                lambda: unpack_levels(self.levels, self.bid_levels or 0, self.ask_levels or 0),
+            )
+        bids = np.rint(_levels_to_array(self.get_bids()) * PRICE_SCALE).astype(LEVEL_DTYPE)
+        asks = np.rint(_levels_to_array(self.get_asks()) * PRICE_SCALE).astype(LEVEL_DTYPE)
+        return bids, asks
+
+    def get_bids_array(self) -> np.ndarray:
+        """获取买盘 (n, 2) float64 数组 [price, quantity]，不构造逐档字典"""
+        if self.is_binary:
+            return self._cached("bids_array", self.levels, lambda: self.get_levels_raw()[0] / PRICE_SCALE)
+        return _levels_to_array(self.get_bids())
+
+    def get_asks_array(self) -> np.ndarray:
+        """获取卖盘 (n, 2) float64 数组 [price, quantity]，不构造逐档字典"""
+        if self.is_binary:
+            return self._cached("asks_array", self.levels, lambda: self.get_levels_raw()[1] / PRICE_SCALE)
+        return _levels_to_array(self.get_asks())
+
+    @staticmethod
+    def _array_to_dicts(array: np.ndarray) -> list[dict]:
+        """数组转为 JSON 格式的逐档字典列表（兼容旧接口）"""
+        return [{"price": price, "quantity": quantity} for price, quantity in array.tolist()]
+
+    @staticmethod
+    def _loads(raw: str) -> list[dict]:
+        """解析 JSON 盘口，格式错误时返回空列表"""
         try:
-            return json.loads(self.bids)
+            return json.loads(raw)
         except json.JSONDecodeError:
             return []
 
+    def get_bids(self) -> list[dict]:
+        """
+        获取解析后的买单列表
+
+        结果会缓存在实例上，多次调用只解析一次；返回的列表请勿原地修改。
+        """
+        if self.bids is None:
+            if not self.is_binary:
+                return []
+            return self._cached("bids", self.levels, lambda: self._array_to_dicts(self.get_bids_array()))
+        return self._cached("bids", self.bids, lambda: self._loads(self.bids))
+
+    def _binary_to_json(self) -> None:
+        """二进制格式转回 JSON 格式（单独设置一侧盘口前调用）"""
+        if self.is_binary:
+            bids, asks = self.get_bids(), self.get_asks()
+            self.bids = json.dumps(bids, ensure_ascii=False)
+            self.asks = json.dumps(asks, ensure_ascii=False)
+            self.levels = self.bid_levels = self.ask_levels = None
+
     def set_bids(self, bids: list[dict]) -> None:
         """设置买单列表"""
+        self._binary_to_json()
         self.bids = json.dumps(bids, ensure_ascii=False)
+        self._invalidate_cache()
 
     def get_asks(self) -> list[dict]:
-        """获取解析后的卖单列表"""
-        try:
-            return json.loads(self.asks)
-        except json.JSONDecodeError:
-            return []
+        """
+        获取解析后的卖单列表
+
+        结果会缓存在实例上，多次调用只解析一次；返回的列表请勿原地修改。
+        """
+        if self.asks is None:
+            if not self.is_binary:
+                return []
+            return self._cached("asks", self.levels, lambda: self._array_to_dicts(self.get_asks_array()))
+        return self._cached("asks", self.asks, lambda: self._loads(self.asks))
 
     def set_asks(self, asks: list[dict]) -> None:
         """设置卖单列表"""
+        self._binary_to_json()
         self.asks = json.dumps(asks, ensure_ascii=False)
+        self._invalidate_cache()
 
     def to_dict(self) -> dict:
         """转换为字典"""
@@ -79,21 +237,25 @@ class OrderbookSnapshot(Base):
             "asks": self.get_asks(),
         }
 
+    def _top_price(self, side: int) -> float | None:
+        """获取一侧的最优价（side: 0 买盘，1 卖盘）"""
+        if self.is_binary:
+            levels = self.get_levels_raw()[side]
+            return float(levels[0, 0]) / PRICE_SCALE if len(levels) else None
+        levels = self.get_bids() if side == 0 else self.get_asks()
+        if levels:
+            return levels[0].get("price")
+        return None
+
     @property
     def best_bid(self) -> float | None:
         """获取最高买价"""
-        bids = self.get_bids()
-        if bids and len(bids) > 0:
-            return bids[0].get("price")
-        return None
+        return self._top_price(0)
 
     @property
     def best_ask(self) -> float | None:
         """获取最低卖价"""
-        asks = self.get_asks()
-        if asks and len(asks) > 0:
-            return asks[0].get("price")
-        return None
+        return self._top_price(1)
 
     @property
     def spread(self) -> float | None:
@@ -103,3 +265,47 @@ class OrderbookSnapshot(Base):
         if best_bid is not None and best_ask is not None:
             return best_ask - best_bid
         return None
+
+    @classmethod
+    def top_of_book(cls, snapshots: Iterable["OrderbookSnapshot"]) -> Dict[str, np.ndarray]:
+        """
+        批量计算一组快照的最优买卖价（单次遍历，每侧最多解析一次）
+
+        Args:
+            snapshots: 快照列表（如查询结果）
+
+        Returns:
+            {"best_bid", "best_ask", "spread", "mid"}，各为 (n,) float64 数组，
+            缺失的一侧为 NaN
+        """
+        snapshots = list(snapshots)
+        count = len(snapshots)
+        best_bid = np.full(count, np.nan, dtype=np.float64)
+        best_ask = np.full(count, np.nan, dtype=np.float64)
+        for index, snapshot in enumerate(snapshots):
+            if snapshot.is_binary:
+                # 直接读取第一档，不解码整个盘口
+                bid_levels = snapshot.bid_levels or 0
+                ask_levels = snapshot.ask_levels or 0
+                if bid_levels:
+                    best_bid[index] = np.frombuffer(snapshot.levels, dtype=LEVEL_DTYPE, count=1)[0]
+                if ask_levels:
+                    best_ask[index] = np.frombuffer(
+                        snapshot.levels, dtype=LEVEL_DTYPE, count=1,
+                        offset=bid_levels * 2 * LEVEL_DTYPE.itemsize,
+                    )[0]
+                best_bid[index] /= PRICE_SCALE
+                best_ask[index] /= PRICE_SCALE
+                continue
+            bid = snapshot.best_bid
+            ask = snapshot.best_ask
+            if bid is not None:
+                best_bid[index] = bid
+            if ask is not None:
+                best_ask[index] = ask
+        return {
+            "best_bid": best_bid,
+            "best_ask": best_ask,
+            "spread": best_ask - best_bid,
+            "mid": (best_bid + best_ask) / 2,
+        }
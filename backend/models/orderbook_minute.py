@@ -0,0 +1,75 @@
+"""
+盘口分钟聚合模型
+原始盘口快照过期删除前降采样为每分钟一行，长期保留
+"""
+from sqlalchemy import String, Integer, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from .database import Base
+
+
+class OrderbookMinute(Base):
+    """
+    盘口分钟聚合表
+    中间价 OHLC、平均/最大价差、平均盘口深度（整数存储，单位：聪）
+    """
+
+    __tablename__ = "orderbook_minutes"
+
+    # 主键
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    # 交易对
+    symbol: Mapped[str] = mapped_column(String(20), nullable=False)
+
+    # 分钟开始时间
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    # 中间价 OHLC
+    mid_open: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    mid_high: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    mid_low: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    mid_close: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # 平均价差 / 最大价差
+    spread_avg: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    spread_max: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # 平均买盘/卖盘深度（各档数量之和）
+    bid_depth_avg: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    ask_depth_avg: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # 聚合的快照条数
+    samples: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # 索引
+    __table_args__ = (
+        Index("idx_orderbook_minute_symbol_timestamp", "symbol", "timestamp"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"OrderbookMinute(id={self.id}, symbol={self.symbol!r}, "
+            f"timestamp={self.timestamp}, samples={self.samples})"
+        )
+
+    @staticmethod
+    def _to_float(value: int | None) -> float | None:
+        return value / 100_000_000 if value is not None else None
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "symbol": self.symbol,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+            "mid_open": self._to_float(self.mid_open),
+            "mid_high": self._to_float(self.mid_high),
+            "mid_low": self._to_float(self.mid_low),
+            "mid_close": self._to_float(self.mid_close),
+            "spread_avg": self._to_float(self.spread_avg),
+            "spread_max": self._to_float(self.spread_max),
+            "bid_depth_avg": self._to_float(self.bid_depth_avg),
+            "ask_depth_avg": self._to_float(self.ask_depth_avg),
+            "samples": self.samples,
+        }
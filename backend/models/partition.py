@@ -0,0 +1,305 @@
+"""
+时序数据分区存储
+按天（或周）把 market_data、orderbook_snapshots 写入独立的 SQLite 文件，
+主库只保留用户、配置等业务表
+
+- 写入：按行的 timestamp 路由到对应分区文件，分区首次写入时建表
+- 读取：只查询与时间范围重叠的分区，结果按分区时间顺序拼接
+- 清理：删除整个分区文件即可丢弃过期数据，无需 DELETE + VACUUM
+
+每个分区使用独立的引擎（连接池），而不是在主库连接上 ATTACH：
+SQLite 默认最多 ATTACH 10 个库，且连接池中的每个连接都需要各自 ATTACH，
+按天分区几周后就会超过上限。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+import asyncio
+import os
+
+from sqlalchemy import Table
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.logger import logger
+from utils.app_config import get_config
+
+# 分区周期 → 天数
+PERIOD_DAYS = {"day": 1, "week": 7}
+
+
+class PartitionRouter:
+    """
+    时序表分区路由
+
+    使用示例:
+        if partition_router.handles(MarketData.__table__):
+            await partition_router.insert(MarketData.__table__, rows)
+            rows = await partition_router.fetch(stmt, start, end)
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        period: str = "day",
+        tables: Iterable[str] = ("market_data", "orderbook_snapshots"),
+        enabled: bool = True,
+        echo: bool = False,
+        max_open_engines: int = 32,
+    ):
+        if period not in PERIOD_DAYS:
+            raise ValueError("period must be 'day' or 'week'")
+        self.directory = Path(directory)
+        self.period = period
+        self.tables = set(tables)
+        self.enabled = enabled
+        self.echo = echo
+        # 同时打开的分区引擎上限，超出时释放最久未使用的
+        self.max_open_engines = max_open_engines
+        self._engines: "OrderedDict[date, AsyncEngine]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_config(cls) -> "PartitionRouter":
+        """根据 database.partitioning 配置创建"""
+        config = get_config().database.partitioning
+        directory = Path(config.directory)
+        if not directory.is_absolute():
+            directory = Path(__file__).parent.parent.parent / directory
+        return cls(
+            directory,
+            period=config.period,
+            tables=config.tables,
+            enabled=config.enabled,
+            echo=get_config().database.echo,
+            max_open_engines=config.max_open_engines,
+        )
+
+    def handles(self, table: Any) -> bool:
+        """该表是否分区存储"""
+        table = getattr(table, "__table__", table)
+        return self.enabled and table.name in self.tables
+
+    # ============ 分区定位 ============
+
+    def partition_start(self, value: datetime) -> date:
+        """时间所在分区的起始日期（周分区以周一为起点）"""
+        day = value.date() if isinstance(value, datetime) else value
+        if self.period == "week":
+            day -= timedelta(days=day.weekday())
+        return day
+
+    def partition_end(self, start: date) -> date:
+        """分区的结束日期（不包含）"""
+        return start + timedelta(days=PERIOD_DAYS[self.period])
+
+    def path_for(self, start: date) -> Path:
+        """分区文件路径"""
+        return self.directory / f"{self.period}-{start:%Y%m%d}.db"
+
+    def partitions(self) -> List[date]:
+        """已存在的分区（按时间升序）"""
+        if not self.directory.exists():
+            return []
+        prefix = f"{self.period}-"
+        result = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(".db"):
+                try:
+                    result.append(datetime.strptime(name[len(prefix):-3], "%Y%m%d").date())
+                except ValueError:
+                    continue
+        return sorted(result)
+
+    def partitions_for_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[date]:
+        """
+        与时间范围 [start, end) 重叠的已存在分区
+
+        Args:
+            start: 起始时间（None 表示不限）
+            end: 结束时间（None 表示不限）
+        """
+        result = []
+        for partition in self.partitions():
+            partition_begin = datetime.combine(partition, time.min)
+            partition_finish = datetime.combine(self.partition_end(partition), time.min)
+            if start is not None and partition_finish <= start:
+                continue
+            if end is not None and partition_begin >= end:
+                continue
+            result.append(partition)
+        return result
+
+    # ============ 引擎 ============
+
+    async def engine_for(self, partition: date, create: bool = False) -> Optional[AsyncEngine]:
+        """
+        获取分区引擎
+
+        Args:
+            partition: 分区起始日期
+            create: 分区不存在时是否创建（并建表）
+
+        Returns:
+            引擎，分区不存在且 create=False 时返回 None
+        """
+        engine = self._engines.get(partition)
+        if engine is not None:
+            self._engines.move_to_end(partition)
+            return engine
+
+        async with self._lock:
+            engine = self._engines.get(partition)
+            if engine is not None:
+                return engine
+            while len(self._engines) >= self.max_open_engines:
+                _, idle = self._engines.popitem(last=False)
+                await idle.dispose()
+            path = self.path_for(partition)
+            exists = path.exists()
+            if not exists and not create:
+                return None
+
+            from .database import create_sqlite_engine
+            self.directory.mkdir(parents=True, exist_ok=True)
+            engine = create_sqlite_engine(path, echo=self.echo)
+            if not exists:
+                await self._create_tables(engine)
+                logger.info(f"创建数据分区: {path.name}")
+            self._engines[partition] = engine
+            return engine
+
+    async def _create_tables(self, engine: AsyncEngine):
+        """在新分区中创建时序表"""
+        from .database import Base
+        from . import market_data, orderbook  # noqa: F401 确保模型已注册
+
+        tables = [Base.metadata.tables[name] for name in self.tables if name in Base.metadata.tables]
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+
+    # ============ 读写 ============
+
+    async def insert(self, table: Table, rows: Sequence[Dict[str, Any]]) -> int:
+        """
+        按 timestamp 把数据行写入对应分区（每个分区一个事务，跨分区不保证原子性）
+
+        Returns:
+            写入的行数
+        """
+        from sqlalchemy import insert
+        from .database import group_by_columns
+
+        table = getattr(table, "__table__", table)
+        groups: Dict[date, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(self.partition_start(row["timestamp"]), []).append(row)
+
+        for partition, partition_rows in sorted(groups.items()):
+            engine = await self.engine_for(partition, create=True)
+            async with engine.begin() as conn:
+                for group in group_by_columns(partition_rows):
+                    await conn.execute(insert(table), group)
+        return len(rows)
+
+    async def fetch(
+        self,
+        stmt,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        newest_first: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        在与时间范围重叠的分区上执行同一查询，按分区顺序拼接结果
+
+        查询本身应包含时间条件和排序（newest_first 时按时间倒序）。
+
+        Args:
+            stmt: Core select 语句
+            start: 起始时间（用于挑选分区）
+            end: 结束时间（用于挑选分区）
+            newest_first: 从最新的分区开始查询
+            limit: 结果行数达到后不再查询更早/更晚的分区
+
+        Returns:
+            结果行列表
+        """
+        partitions = self.partitions_for_range(start, end)
+        if newest_first:
+            partitions.reverse()
+
+        rows: List[Any] = []
+        for partition in partitions:
+            engine = await self.engine_for(partition)
+            if engine is None:
+                continue
+            async with engine.connect() as conn:
+                rows.extend((await conn.execute(stmt)).all())
+            if limit is not None and len(rows) >= limit:
+                return rows[:limit]
+        return rows
+
+    # ============ 清理 ============
+
+    async def drop(self, partition: date) -> int:
+        """
+        删除分区文件
+
+        Returns:
+            释放的字节数
+        """
+        engine = self._engines.pop(partition, None)
+        if engine is not None:
+            await engine.dispose()
+
+        path = self.path_for(partition)
+        freed = 0
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            file = Path(f"{path}{suffix}")
+            try:
+                freed += file.stat().st_size
+                file.unlink()
+            except FileNotFoundError:
+                continue
+        logger.info(f"删除数据分区: {path.name}（{freed} 字节）")
+        return freed
+
+    async def is_empty(self, partition: date) -> bool:
+        """分区中的所有时序表是否都没有数据"""
+        from sqlalchemy import select
+        from .database import Base
+
+        engine = await self.engine_for(partition)
+        if engine is None:
+            return True
+        async with engine.connect() as conn:
+            for name in self.tables:
+                table = Base.metadata.tables.get(name)
+                if table is None:
+                    continue
+                if (await conn.execute(select(table.c.id).limit(1))).first() is not None:
+                    return False
+        return True
+
+    async def close(self):
+        """释放所有分区引擎"""
+        engines, self._engines = self._engines, OrderedDict()
+        for engine in engines.values():
+            await engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        """分区指标"""
+        partitions = self.partitions()
+        return {
+            "enabled": self.enabled,
+            "period": self.period,
+            "partitions": len(partitions),
+            "open_engines": len(self._engines),
+            "oldest": partitions[0].isoformat() if partitions else None,
+            "newest": partitions[-1].isoformat() if partitions else None,
+        }
+
+
+# 全局分区路由实例
+partition_router = PartitionRouter.from_config()
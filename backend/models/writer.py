@@ -0,0 +1,269 @@
+"""
+SQLite 单写入者队列
+所有写入任务经 asyncio 队列交给唯一的写连接顺序执行，避免多个会话争抢写锁
+（"database is locked" 重试和串行等待）
+
+- 写入者独占一个连接，每轮取出队列中已积压的任务，放在同一个事务中提交
+  （组提交：一次 fsync 覆盖多个任务）
+- 每个任务在各自的 SAVEPOINT 中执行，单个任务失败只回滚该任务，不影响同批其他任务
+- 读取使用 models.database.read_engine 的只读连接池，WAL 模式下不会被写事务阻塞
+
+使用示例:
+    await db_writer.execute(update(User).where(User.id == 1).values(last_login=now))
+
+    async def job(conn):
+        await conn.execute(insert(MarketData.__table__), rows)
+    await db_writer.run(job)
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from datetime import datetime
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.pool import NullPool
+
+from utils.logger import logger
+from utils.app_config import get_config
+
+T = TypeVar("T")
+
+# 写入任务：在写连接（已处于事务中）上执行的协程函数
+WriteFunc = Callable[[AsyncConnection], Awaitable[T]]
+
+
+class WriteJob:
+    """队列中的一个写入任务"""
+
+    __slots__ = ("func", "future", "enqueued_at")
+
+    def __init__(self, func: WriteFunc, future: asyncio.Future):
+        self.func = func
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class SQLiteWriter:
+    """
+    单连接写入者
+
+    Args:
+        url: 数据库连接地址，默认与主库相同
+        queue_size: 队列上限，满时提交任务的协程等待（背压）
+        max_batch: 每个事务最多合并的任务数
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        queue_size: Optional[int] = None,
+        max_batch: Optional[int] = None,
+    ):
+        writer_config = get_config().database.writer
+        self._url = url
+        self.queue_size = queue_size or writer_config.queue_size
+        self.max_batch = max_batch or writer_config.max_batch
+        self._engine: Optional[AsyncEngine] = None
+        self._conn: Optional[AsyncConnection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 指标
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.transactions = 0
+        self.errors = 0
+        self.max_batch_jobs = 0
+        self.last_commit_latency = 0.0
+        self.max_queue_wait = 0.0
+        self.last_commit_at: Optional[datetime] = None
+
+    @property
+    def url(self) -> str:
+        """数据库连接地址"""
+        if self._url is None:
+            from .database import DB_URL
+            self._url = DB_URL
+        return self._url
+
+    @property
+    def engine(self) -> AsyncEngine:
+        """写入者专用引擎（不使用连接池，写连接由写入者自己持有）"""
+        if self._engine is None:
+            from .database import create_sqlite_engine
+            self._engine = create_sqlite_engine(
+                self.url, echo=get_config().database.echo, poolclass=NullPool,
+            )
+        return self._engine
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        """写入队列"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    # ============ 提交任务 ============
+
+    async def run(self, func: WriteFunc) -> T:
+        """
+        提交写入任务并等待其所在事务提交
+
+        Args:
+            func: async def func(conn) -> result，在写连接上执行，不要自行提交或回滚
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            func 抛出的异常（该任务已回滚），或事务提交失败的异常
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(WriteJob(func, future))
+        return await future
+
+    async def execute(self, statement, parameters=None) -> int:
+        """
+        提交单条写入语句
+
+        Returns:
+            影响的行数
+        """
+        async def job(conn: AsyncConnection) -> int:
+            result = await conn.execute(statement, parameters)
+            return result.rowcount
+
+        return await self.run(job)
+
+    # ============ 写入循环 ============
+
+    async def _connect(self) -> AsyncConnection:
+        """打开写连接，改由显式 BEGIN IMMEDIATE 控制事务"""
+        conn = await self.engine.connect()
+        # sqlite3 驱动默认会在 DML 前隐式 BEGIN，且首个 SAVEPOINT 的 RELEASE 会直接提交，
+        # 关闭驱动的隐式事务后由 _write_batch 显式开启事务
+        await conn.run_sync(
+            lambda sync_conn: setattr(sync_conn.connection.dbapi_connection, "isolation_level", None)
+        )
+        return conn
+
+    async def _close_connection(self):
+        """关闭写连接（出错后下次重新打开）"""
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception as e:
+                logger.warning(f"关闭写连接失败: {e}")
+            self._conn = None
+
+    def _next_batch(self, first: WriteJob) -> List[WriteJob]:
+        """取出队列中已积压的任务（不等待），与 first 合并为一批"""
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _write_batch(self, batch: List[WriteJob]):
+        """在一个事务中执行一批任务，每个任务一个 SAVEPOINT"""
+        now = time.perf_counter()
+        self.max_queue_wait = max(self.max_queue_wait, now - min(job.enqueued_at for job in batch))
+
+        results: Dict[int, Any] = {}
+        failures: Dict[int, BaseException] = {}
+        try:
+            if self._conn is None:
+                self._conn = await self._connect()
+            conn = self._conn
+            async with conn.begin():
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+                for index, job in enumerate(batch):
+                    if job.future.cancelled():
+                        continue
+                    try:
+                        async with conn.begin_nested():
+                            results[index] = await job.func(conn)
+                    except Exception as e:
+                        failures[index] = e
+        except Exception as e:
+            # 事务本身失败（提交失败、连接断开等），整批任务都失败
+            self.errors += 1
+            logger.error(f"写入事务失败({len(batch)} 个任务): {e}")
+            await self._close_connection()
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        self.transactions += 1
+        self.jobs += len(batch)
+        self.failed_jobs += len(failures)
+        self.max_batch_jobs = max(self.max_batch_jobs, len(batch))
+        self.last_commit_latency = time.perf_counter() - now
+        self.last_commit_at = datetime.utcnow()
+        for index, job in enumerate(batch):
+            if job.future.done():
+                continue
+            if index in failures:
+                job.future.set_exception(failures[index])
+            else:
+                job.future.set_result(results.get(index))
+
+    async def _run_loop(self):
+        """从队列取任务并分批写入"""
+        queue = self.queue
+        try:
+            while True:
+                batch = self._next_batch(await queue.get())
+                try:
+                    await self._write_batch(batch)
+                finally:
+                    for _ in batch:
+                        queue.task_done()
+        except asyncio.CancelledError:
+            logger.debug("数据库写入任务已取消")
+
+    # ============ 生命周期 ============
+
+    def start(self):
+        """启动写入任务（可重复调用，首次提交任务时自动启动）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        """等待队列中的任务写完后停止，并关闭写连接"""
+        if self._task is not None:
+            if not self._task.done():
+                await self.queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close_connection()
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    def stats(self) -> Dict[str, Any]:
+        """写入指标"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": self.jobs,
+            "failed_jobs": self.failed_jobs,
+            "transactions": self.transactions,
+            "errors": self.errors,
+            "avg_batch_jobs": round(self.jobs / self.transactions, 2) if self.transactions else 0,
+            "max_batch_jobs": self.max_batch_jobs,
+            "last_commit_latency_ms": round(self.last_commit_latency * 1000, 3),
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+            "last_commit_at": self.last_commit_at.isoformat() + "Z" if self.last_commit_at else None,
+        }
+
+
+# 全局数据库写入者实例
+db_writer = SQLiteWriter()
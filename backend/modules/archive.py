@@ -0,0 +1,347 @@
+"""
+列式归档导出
+将 market_data、orderbook_snapshots、trades 按时间范围导出为 NumPy .npy 目录，
+读取时内存映射，回测和分析不需要逐行经过 SQLite，也不需要把全部数据读入内存
+
+目录结构:
+    <archive>/manifest.json
+    <archive>/<table>/<column>.npy
+
+- 整数列（价格、数量等，单位：聪）导出为 int64，空值为 INT_NULL
+- 时间列导出为 datetime64[us]，空值为 NaT
+- 字符串/枚举列导出为定长 Unicode
+- 盘口快照展开为 (n, depth) 的 bid_price/bid_qty/ask_price/ask_qty 定点 int64 数组
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from datetime import datetime
+from pathlib import Path
+import json
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sqlalchemy import Boolean, DateTime, Enum, Float, Integer, String, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.logger import logger
+
+# 归档格式版本
+ARCHIVE_VERSION = 1
+
+# 整数列的空值标记
+INT_NULL = np.iinfo(np.int64).min
+
+# 支持导出的表及其时间列
+ARCHIVE_TABLES = {
+    "market_data": "timestamp",
+    "orderbook_snapshots": "timestamp",
+    "trades": "created_at",
+}
+
+# 盘口快照中被展开为定长数组的列
+_ORDERBOOK_LEVEL_COLUMNS = ("bids", "asks", "levels", "bid_levels", "ask_levels")
+
+# 每次从数据库读取的行数
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _model_for(table_name: str):
+    """表名 → ORM 模型"""
+    from models.market_data import MarketData
+    from models.orderbook import OrderbookSnapshot
+    from models.trade import Trade
+    return {
+        "market_data": MarketData,
+        "orderbook_snapshots": OrderbookSnapshot,
+        "trades": Trade,
+    }[table_name]
+
+
+def _column_dtype(column) -> Optional[np.dtype]:
+    """SQLAlchemy 列类型 → NumPy dtype（不支持的类型返回 None）"""
+    column_type = column.type
+    if isinstance(column_type, Enum):
+        return np.dtype(f"U{max((len(value) for value in column_type.enums), default=1)}")
+    if isinstance(column_type, String) and column_type.length:
+        return np.dtype(f"U{column_type.length}")
+    if isinstance(column_type, Boolean):
+        return np.dtype(bool)
+    if isinstance(column_type, Integer):
+        return np.dtype(np.int64)
+    if isinstance(column_type, Float):
+        return np.dtype(np.float64)
+    if isinstance(column_type, DateTime):
+        return np.dtype("datetime64[us]")
+    return None
+
+
+def _convert(values: List[Any], dtype: np.dtype) -> np.ndarray:
+    """将一块列值转换为数组，空值替换为该类型的空值标记"""
+    if dtype.kind == "i":
+        return np.array([INT_NULL if value is None else value for value in values], dtype=dtype)
+    if dtype.kind == "U":
+        return np.array(["" if value is None else getattr(value, "value", value) for value in values], dtype=dtype)
+    if dtype.kind == "M":
+        return np.array(["NaT" if value is None else value for value in values], dtype=dtype)
+    if dtype.kind == "f":
+        return np.array([np.nan if value is None else value for value in values], dtype=dtype)
+    return np.array([bool(value) for value in values], dtype=dtype)
+
+
+def _null_marker(dtype: np.dtype) -> Any:
+    """manifest 中记录的空值标记"""
+    return {"i": int(INT_NULL), "M": "NaT", "f": "NaN", "U": ""}.get(dtype.kind)
+
+
+class _ColumnWriter:
+    """预分配 .npy 文件并按块写入"""
+
+    def __init__(self, path: Path, dtype: np.dtype, shape: tuple):
+        self.path = path
+        self.dtype = dtype
+        self.shape = shape
+        self.array = open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        self.position = 0
+
+    def write(self, values: np.ndarray):
+        end = self.position + len(values)
+        self.array[self.position:end] = values
+        self.position = end
+
+    def close(self):
+        self.array.flush()
+        del self.array
+
+
+def _orderbook_levels(rows: Sequence, depth: int) -> Dict[str, np.ndarray]:
+    """将一块盘口快照行展开为定长定点数组（单位：聪，缺档为 0）"""
+    from models.orderbook import OrderbookSnapshot
+
+    count = len(rows)
+    arrays = {
+        "bid_price": np.zeros((count, depth), dtype=np.int64),
+        "bid_qty": np.zeros((count, depth), dtype=np.int64),
+        "ask_price": np.zeros((count, depth), dtype=np.int64),
+        "ask_qty": np.zeros((count, depth), dtype=np.int64),
+        "bid_count": np.zeros(count, dtype=np.int32),
+        "ask_count": np.zeros(count, dtype=np.int32),
+    }
+    for index, row in enumerate(rows):
+        snapshot = OrderbookSnapshot(
+            bids=row.bids, asks=row.asks,
+            levels=row.levels, bid_levels=row.bid_levels, ask_levels=row.ask_levels,
+        )
+        bids, asks = snapshot.get_levels_raw()
+        for side, levels in (("bid", bids), ("ask", asks)):
+            n = min(len(levels), depth)
+            arrays[f"{side}_price"][index, :n] = levels[:n, 0]
+            arrays[f"{side}_qty"][index, :n] = levels[:n, 1]
+            arrays[f"{side}_count"][index] = n
+    return arrays
+
+
+async def export_table(
+    table_name: str,
+    out_dir: Path,
+    start: datetime,
+    end: datetime,
+    symbol: Optional[str] = None,
+    depth: int = 20,
+    engine: Optional[AsyncEngine] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    router=None,
+) -> Dict[str, Any]:
+    """
+    导出单个表的 [start, end) 数据为 .npy 列文件
+
+    Returns:
+        manifest 中该表的描述
+    """
+    if engine is None:
+        # 导出是长时间的只读扫描，使用只读连接池，不占用写连接
+        from models.database import read_engine as engine
+    if router is None:
+        from models.partition import partition_router as router
+
+    model = _model_for(table_name)
+    table = model.__table__
+    time_column = table.c[ARCHIVE_TABLES[table_name]]
+    orderbook = table_name == "orderbook_snapshots"
+
+    columns = []
+    dtypes: Dict[str, np.dtype] = {}
+    skipped = []
+    for column in table.columns:
+        if orderbook and column.name in _ORDERBOOK_LEVEL_COLUMNS:
+            columns.append(column)
+            continue
+        dtype = _column_dtype(column)
+        if dtype is None:
+            skipped.append(column.name)
+            continue
+        columns.append(column)
+        dtypes[column.name] = dtype
+
+    conditions = [time_column >= start, time_column < end]
+    if symbol is not None and "symbol" in table.c:
+        conditions.append(table.c.symbol == symbol)
+
+    table_dir = Path(out_dir) / table_name
+    table_dir.mkdir(parents=True, exist_ok=True)
+
+    # 分区存储时依次读取范围内的各分区（按时间顺序）
+    sources = [engine]
+    if router.handles(table):
+        sources = []
+        for partition in router.partitions_for_range(start, end):
+            partition_engine = await router.engine_for(partition)
+            if partition_engine is not None:
+                sources.append(partition_engine)
+
+    counts = []
+    for source in sources:
+        async with source.connect() as conn:
+            counts.append((await conn.execute(select(func.count()).select_from(table).where(*conditions))).scalar())
+    total = sum(counts)
+
+    writers = {
+        name: _ColumnWriter(table_dir / f"{name}.npy", dtype, (total,))
+        for name, dtype in dtypes.items()
+    }
+    if orderbook:
+        for name in ("bid_price", "bid_qty", "ask_price", "ask_qty"):
+            writers[name] = _ColumnWriter(table_dir / f"{name}.npy", np.dtype(np.int64), (total, depth))
+        for name in ("bid_count", "ask_count"):
+            writers[name] = _ColumnWriter(table_dir / f"{name}.npy", np.dtype(np.int32), (total,))
+
+    written = 0
+    stmt = select(*columns).where(*conditions).order_by(time_column)
+    for source, count in zip(sources, counts):
+        source_written = 0
+        async with source.connect() as conn:
+            result = await conn.stream(stmt)
+            # 统计之后新写入的行不导出，文件大小以 count 为准
+            async for rows in result.partitions(chunk_size):
+                rows = rows[:count - source_written]
+                if not rows:
+                    break
+                source_written += len(rows)
+                for name, dtype in dtypes.items():
+                    writers[name].write(_convert([getattr(row, name) for row in rows], dtype))
+                if orderbook:
+                    for name, values in _orderbook_levels(rows, depth).items():
+                        writers[name].write(values)
+                written += len(rows)
+            await result.close()
+
+    for writer in writers.values():
+        writer.close()
+
+    column_info = {
+        name: {
+            "dtype": writer.dtype.str,
+            "shape": [written, *writer.shape[1:]],
+            "null": _null_marker(writer.dtype) if name in dtypes else None,
+        }
+        for name, writer in writers.items()
+    }
+    logger.info(f"归档导出 {table_name}: {written} 行 → {table_dir}")
+    return {
+        "rows": written,
+        "time_column": time_column.name,
+        "columns": column_info,
+        "skipped_columns": skipped,
+    }
+
+
+async def export_archive(
+    out_dir: Path,
+    start: datetime,
+    end: datetime,
+    tables: Iterable[str] = tuple(ARCHIVE_TABLES),
+    symbol: Optional[str] = None,
+    depth: int = 20,
+    engine: Optional[AsyncEngine] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """
+    导出时间范围 [start, end) 的数据为 .npy 归档目录
+
+    Args:
+        out_dir: 归档目录
+        start: 起始时间（包含）
+        end: 结束时间（不包含）
+        tables: 导出的表（market_data / orderbook_snapshots / trades）
+        symbol: 只导出该交易对（按 symbol 列过滤）
+        depth: 盘口快照导出的档数
+        engine: 数据库引擎，默认全局只读连接池（read_engine）
+        chunk_size: 每次读取的行数
+
+    Returns:
+        manifest 内容（同时写入 manifest.json）
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "format": "npy-dir",
+        "version": ARCHIVE_VERSION,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "symbol": symbol,
+        "price_scale": 100_000_000,
+        "tables": {},
+    }
+    for table_name in tables:
+        if table_name not in ARCHIVE_TABLES:
+            raise ValueError(f"Unsupported archive table: {table_name}")
+        manifest["tables"][table_name] = await export_table(
+            table_name, out_dir, start, end,
+            symbol=symbol, depth=depth, engine=engine, chunk_size=chunk_size,
+        )
+
+    with open(out_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+class ArchiveReader:
+    """
+    归档读取器（内存映射，按需分页加载）
+
+    使用示例:
+        archive = ArchiveReader("data/archive/2026-01")
+        close = archive.column("market_data", "close")   # np.memmap，int64（单位：聪）
+        book = archive.table("orderbook_snapshots")
+        spread = book["ask_price"][:, 0] - book["bid_price"][:, 0]
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "manifest.json", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != "npy-dir":
+            raise ValueError(f"Unsupported archive format: {self.manifest.get('format')}")
+
+    @property
+    def tables(self) -> List[str]:
+        """归档中的表"""
+        return list(self.manifest["tables"])
+
+    def columns(self, table_name: str) -> List[str]:
+        """表中的列"""
+        return list(self.manifest["tables"][table_name]["columns"])
+
+    def rows(self, table_name: str) -> int:
+        """表的行数"""
+        return self.manifest["tables"][table_name]["rows"]
+
+    def column(self, table_name: str, column: str) -> np.ndarray:
+        """以只读内存映射方式打开一列"""
+        if column not in self.manifest["tables"][table_name]["columns"]:
+            raise KeyError(f"{table_name}.{column}")
+        array = np.load(self.path / table_name / f"{column}.npy", mmap_mode="r")
+        return array[:self.rows(table_name)]
+
+    def table(self, table_name: str) -> Dict[str, np.ndarray]:
+        """以只读内存映射方式打开表的所有列"""
+        return {column: self.column(table_name, column) for column in self.columns(table_name)}
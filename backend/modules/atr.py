@@ -0,0 +1,209 @@
+"""
+ATR（平均真实波幅）增量计算
+按 (交易对, 周期) 保存 Wilder 平滑状态，每根新 K 线 O(1) 更新
+
+    TR  = max(high - low, |high - prev_close|, |low - prev_close|)
+    ATR = 前 period 根 TR 的简单平均，之后 ATR = (ATR * (period - 1) + TR) / period
+
+价格均为整数（单位：聪），内部状态用浮点数保存以避免逐根取整误差累积，
+写入数据库时四舍五入为整数。
+"""
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.logger import logger
+from utils.app_config import get_config
+
+
+class ATRState:
+    """单个 (交易对, 周期) 的 ATR 状态"""
+
+    __slots__ = ("period", "atr", "prev_close", "warmup_count", "warmup_sum")
+
+    def __init__(self, period: int):
+        self.period = period
+        # 当前 ATR（未完成预热时为 None）
+        self.atr: Optional[float] = None
+        # 上一根 K 线的收盘价
+        self.prev_close: Optional[int] = None
+        # 预热阶段已累计的 TR 数量与总和
+        self.warmup_count = 0
+        self.warmup_sum = 0.0
+
+    def seed(self, atr: float, close: int):
+        """用已持久化的 ATR 和收盘价恢复状态，跳过预热"""
+        self.atr = float(atr)
+        self.prev_close = close
+        self.warmup_count = self.period
+        self.warmup_sum = 0.0
+
+    def update(self, high: int, low: int, close: int) -> Optional[float]:
+        """
+        用一根新 K 线更新 ATR（O(1)）
+
+        Returns:
+            更新后的 ATR，预热未完成时返回 None
+        """
+        true_range = high - low
+        if self.prev_close is not None:
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+
+        if self.atr is None:
+            self.warmup_sum += true_range
+            self.warmup_count += 1
+            if self.warmup_count >= self.period:
+                self.atr = self.warmup_sum / self.period
+        else:
+            self.atr = (self.atr * (self.period - 1) + true_range) / self.period
+        return self.atr
+
+
+class ATREngine:
+    """
+    流式 ATR 计算引擎
+
+    使用示例:
+        row = market_data_row("KOGE/USDT", ts, "1m", open, high, low, close, volume)
+        await atr_engine.record(row)  # 计算 ATR 并与 K 线一起批量写入
+    """
+
+    def __init__(self, period: Optional[int] = None, engine: Optional[AsyncEngine] = None, router=None):
+        self.period = period or get_config().risk_control.atr.period
+        self._engine = engine
+        self._router = router
+        self._states: Dict[Tuple[str, str], ATRState] = {}
+        self._warm_lock = asyncio.Lock()
+
+    @property
+    def engine(self) -> AsyncEngine:
+        """数据库引擎（默认使用全局只读连接池）"""
+        if self._engine is None:
+            from models.database import read_engine
+            self._engine = read_engine
+        return self._engine
+
+    @property
+    def router(self):
+        """时序表分区路由（默认使用全局实例）"""
+        if self._router is None:
+            from models.partition import partition_router
+            self._router = partition_router
+        return self._router
+
+    def get_state(self, symbol: str, interval: str) -> Optional[ATRState]:
+        """获取 ATR 状态（不存在时返回 None）"""
+        return self._states.get((symbol, interval))
+
+    def current(self, symbol: str, interval: str) -> Optional[int]:
+        """当前 ATR（单位：聪），未完成预热时返回 None"""
+        state = self._states.get((symbol, interval))
+        if state is None or state.atr is None:
+            return None
+        return round(state.atr)
+
+    def update(self, symbol: str, interval: str, high: int, low: int, close: int) -> Optional[int]:
+        """
+        用一根新 K 线更新 ATR（不访问数据库）
+
+        Returns:
+            ATR（单位：聪），未完成预热时返回 None
+        """
+        key = (symbol, interval)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = ATRState(self.period)
+        atr = state.update(high, low, close)
+        return round(atr) if atr is not None else None
+
+    async def warm_start(self, symbol: str, interval: str) -> ATRState:
+        """
+        从数据库中最近一条带 ATR 的 K 线恢复状态（每个 key 只查询一次）
+
+        Returns:
+            ATR 状态
+        """
+        key = (symbol, interval)
+        state = self._states.get(key)
+        if state is not None:
+            return state
+
+        async with self._warm_lock:
+            state = self._states.get(key)
+            if state is not None:
+                return state
+
+            from models.market_data import MarketData
+            state = ATRState(self.period)
+            stmt = (
+                select(MarketData.atr, MarketData.close)
+                .where(
+                    MarketData.symbol == symbol,
+                    MarketData.interval == interval,
+                    MarketData.atr.is_not(None),
+                )
+                .order_by(MarketData.timestamp.desc())
+                .limit(1)
+            )
+            try:
+                if self.router.handles(MarketData):
+                    rows = await self.router.fetch(stmt, newest_first=True, limit=1)
+                    row = rows[0] if rows else None
+                else:
+                    async with self.engine.connect() as conn:
+                        row = (await conn.execute(stmt)).first()
+            except Exception as e:
+                logger.warning(f"ATR 状态恢复失败 {symbol} {interval}，从头预热: {e}")
+                row = None
+
+            if row is not None:
+                state.seed(row.atr, row.close)
+                logger.debug(f"ATR 状态已恢复 {symbol} {interval}: atr={row.atr}")
+            self._states[key] = state
+            return state
+
+    async def apply(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        为 K 线数据行计算 ATR 并写入 row["atr"]（首次遇到的 key 先从数据库恢复）
+
+        Args:
+            row: market_data_row() 构造的数据行
+
+        Returns:
+            同一数据行
+        """
+        symbol, interval = row["symbol"], row["interval"]
+        if (symbol, interval) not in self._states:
+            await self.warm_start(symbol, interval)
+        row["atr"] = self.update(symbol, interval, row["high"], row["low"], row["close"])
+        return row
+
+    async def record(self, row: Dict[str, Any], writer=None) -> Dict[str, Any]:
+        """
+        计算 ATR 后把 K 线加入批量写入缓冲，ATR 与 K 线在同一次批量插入中写入
+
+        Args:
+            row: market_data_row() 构造的数据行
+            writer: 批量写入器，默认全局 market_writer
+        """
+        from models.market_data import MarketData
+        if writer is None:
+            from modules.batch_writer import market_writer as writer
+        await self.apply(row)
+        writer.add(MarketData, row)
+        return row
+
+    def reset(self, symbol: Optional[str] = None, interval: Optional[str] = None):
+        """清除状态（不指定参数时清除全部）"""
+        if symbol is None:
+            self._states.clear()
+            return
+        for key in [k for k in self._states if k[0] == symbol and (interval is None or k[1] == interval)]:
+            del self._states[key]
+
+
+# 全局 ATR 计算引擎实例
+atr_engine = ATREngine()
@@ -0,0 +1,311 @@
+"""
+批量写入缓冲（write-behind）
+收集行情/盘口数据行，达到条数或时间阈值时用一次 executemany 插入数据库
+（主库的表经单写入者队列 db_writer 写入，与其他业务写入合并提交）
+
+设计文档要求每 10 秒或 100 条批量写入一次，避免 500ms 采集频率下
+每条数据一个 SQLite 写事务。
+"""
+from typing import Any, Dict, List, Optional, Union
+from datetime import datetime
+import asyncio
+import json
+import time
+
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from models.database import group_by_columns
+from models.orderbook import pack_levels
+from utils.logger import logger
+from utils.app_config import get_config
+
+
+class BatchWriter:
+    """
+    异步批量写入器
+
+    使用示例:
+        writer = BatchWriter()
+        writer.start()
+        writer.add(OrderbookSnapshot, orderbook_row("KOGE/USDT", datetime.utcnow(), bids, asks))
+        ...
+        await writer.stop()  # 关闭时写出剩余数据
+    """
+
+    def __init__(
+        self,
+        engine: Optional[AsyncEngine] = None,
+        flush_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_backlog: Optional[int] = None,
+        router=None,
+        writer=None,
+    ):
+        market_config = get_config().market_data
+        self._engine = engine
+        self._router = router
+        self._writer = writer
+        self._owns_writer = False
+        # 缓冲条数达到该值时立即写入
+        self.flush_size = flush_size or market_config.flush_size
+        # 距上次写入超过该时间（秒）时写入
+        self.flush_interval = flush_interval or market_config.flush_interval
+        # 写入失败时最多保留的积压条数，超出丢弃最旧数据
+        self.max_backlog = max_backlog or market_config.max_backlog
+
+        # 表 → 待写入的数据行
+        self._buffers: Dict[Table, List[Dict[str, Any]]] = {}
+        self._backlog = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._timer_task: Optional[asyncio.Task] = None
+
+        # 指标
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.errors = 0
+        self.last_flush_rows = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.last_flush_at: Optional[datetime] = None
+
+    @property
+    def writer(self):
+        """主库写入者（默认全局 db_writer；指定了 engine 时为该库单独创建）"""
+        if self._writer is None:
+            if self._engine is not None:
+                from models.writer import SQLiteWriter
+                self._writer = SQLiteWriter(self._engine.url.render_as_string(hide_password=False))
+                self._owns_writer = True
+            else:
+                from models.writer import db_writer
+                self._writer = db_writer
+        return self._writer
+
+    @property
+    def router(self):
+        """时序表分区路由（默认使用全局实例）"""
+        if self._router is None:
+            from models.partition import partition_router
+            self._router = partition_router
+        return self._router
+
+    @property
+    def backlog(self) -> int:
+        """待写入的数据行数"""
+        return self._backlog
+
+    def add(self, target: Union[Table, Any], row: Dict[str, Any]):
+        """
+        添加一行待写入数据（非阻塞）
+
+        Args:
+            target: 目标表或 ORM 模型类
+            row: 列名 → 值
+        """
+        table = getattr(target, "__table__", target)
+        self._buffers.setdefault(table, []).append(row)
+        self._backlog += 1
+        if self._backlog >= self.flush_size:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """在后台触发一次写入（已有写入进行中时不重复触发）"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """
+        写入当前缓冲的所有数据，每个表一次 executemany，主库的表作为一个写入任务
+        交给 db_writer（同一事务），分区存储的表每个分区一个事务
+
+        Returns:
+            写入的行数
+        """
+        async with self._flush_lock:
+            if not self._backlog:
+                return 0
+
+            buffers, self._buffers = self._buffers, {}
+            count, self._backlog = self._backlog, 0
+
+            start = time.perf_counter()
+            # 启用分区存储时，时序表按时间写入各自的分区文件
+            local = {table: rows for table, rows in buffers.items() if not self.router.handles(table)}
+            routed = {table: rows for table, rows in buffers.items() if self.router.handles(table)}
+
+            failed: Dict[Table, List[Dict[str, Any]]] = {}
+            if local:
+                async def write_local(conn):
+                    for table, rows in local.items():
+                        # JSON 与二进制盘口行的列不同，分开 executemany
+                        for group in group_by_columns(rows):
+                            await conn.execute(insert(table), group)
+
+                try:
+                    await self.writer.run(write_local)
+                except Exception as e:
+                    logger.error(f"批量写入失败({sum(map(len, local.values()))} 行)，数据放回缓冲: {e}")
+                    failed.update(local)
+            for table, rows in routed.items():
+                try:
+                    await self.router.insert(table, rows)
+                except Exception as e:
+                    logger.error(f"分区写入失败 {table.name}({len(rows)} 行)，数据放回缓冲: {e}")
+                    failed[table] = rows
+
+            if failed:
+                self.errors += 1
+                failed_count = sum(map(len, failed.values()))
+                self._requeue(failed, failed_count)
+                count -= failed_count
+                if not count:
+                    return 0
+
+            latency = time.perf_counter() - start
+            self.flushes += 1
+            self.rows_written += count
+            self.last_flush_rows = count
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            self.last_flush_at = datetime.utcnow()
+            logger.debug(f"批量写入 {count} 行，耗时 {latency * 1000:.1f}ms")
+            return count
+
+    def _requeue(self, buffers: Dict[Table, List[Dict[str, Any]]], count: int):
+        """写入失败时把数据放回缓冲头部，超出积压上限时丢弃最旧的数据"""
+        for table, rows in buffers.items():
+            self._buffers[table] = rows + self._buffers.get(table, [])
+        self._backlog += count
+
+        overflow = self._backlog - self.max_backlog
+        if overflow <= 0:
+            return
+        for table, rows in self._buffers.items():
+            if overflow <= 0:
+                break
+            removed = min(overflow, len(rows))
+            del rows[:removed]
+            overflow -= removed
+            self._backlog -= removed
+            self.rows_dropped += removed
+        logger.warning(f"批量写入积压超过上限 {self.max_backlog}，累计丢弃 {self.rows_dropped} 行")
+
+    async def _timer_loop(self):
+        """按时间阈值定期写入"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                if self._backlog:
+                    await self.flush()
+        except asyncio.CancelledError:
+            logger.debug("批量写入定时任务已取消")
+
+    def start(self):
+        """启动定时写入任务（可重复调用）"""
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._timer_loop())
+
+    async def stop(self):
+        """停止定时任务并写出剩余数据"""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        written = await self.flush()
+        if written:
+            logger.info(f"关闭前写出剩余 {written} 行行情数据")
+        if self._owns_writer:
+            await self._writer.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """写入指标"""
+        return {
+            "backlog": self._backlog,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "errors": self.errors,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_latency_ms": round(self.last_flush_latency * 1000, 3),
+            "max_flush_latency_ms": round(self.max_flush_latency * 1000, 3),
+            "last_flush_at": self.last_flush_at.isoformat() + "Z" if self.last_flush_at else None,
+        }
+
+
+# ============ 辅助函数：构造数据行 ============
+
+def orderbook_row(
+    symbol: str,
+    timestamp: datetime,
+    bids: List[List[float]],
+    asks: List[List[float]],
+    binary: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    构造盘口快照数据行（orderbook_snapshots）
+
+    Args:
+        symbol: 交易对
+        timestamp: 时间戳
+        bids: 买盘 [[price, qty], ...]
+        asks: 卖盘 [[price, qty], ...]
+        binary: 是否使用二进制格式，默认取 market_data.orderbook_storage 配置
+    """
+    if binary is None:
+        binary = get_config().market_data.orderbook_storage == "binary"
+    if binary:
+        levels, bid_levels, ask_levels = pack_levels(bids, asks)
+        return {
+            "symbol": symbol,
+            "timestamp": timestamp,
+            "bids": None,
+            "asks": None,
+            "levels": levels,
+            "bid_levels": bid_levels,
+            "ask_levels": ask_levels,
+        }
+    return {
+        "symbol": symbol,
+        "timestamp": timestamp,
+        "bids": json.dumps([{"price": p, "quantity": q} for p, q in bids], ensure_ascii=False),
+        "asks": json.dumps([{"price": p, "quantity": q} for p, q in asks], ensure_ascii=False),
+    }
+
+
+def market_data_row(
+    symbol: str,
+    timestamp: datetime,
+    interval: str,
+    open: int,
+    high: int,
+    low: int,
+    close: int,
+    volume: int,
+    atr: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    构造 K 线数据行（market_data），价格和成交量为整数（单位：聪）
+    """
+    return {
+        "symbol": symbol,
+        "timestamp": timestamp,
+        "interval": interval,
+        "open": open,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+        "atr": atr,
+    }
+
+
+# 全局行情写入器实例
+market_writer = BatchWriter()
@@ -0,0 +1,301 @@
+"""
+K 线聚合器
+从逐笔价格流维护当前 1m K 线，收盘时增量合并到 5m/15m/1h/4h/1d，
+收盘的 K 线经 ATR 计算后交给批量写入器
+
+高周期 K 线只由低一级周期的已收盘 K 线合并而来，不会回到原始 tick 重新计算：
+
+    tick → 1m → 5m → 15m → 1h → 4h → 1d
+
+价格和成交量均为整数（单位：聪），时间桶按 UTC 对齐。
+"""
+from typing import Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timezone
+import asyncio
+import time
+
+from utils.logger import logger
+
+# 周期 → 秒数（按从低到高排列，每一级都能整除下一级）
+INTERVALS: Dict[str, int] = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "4h": 14400,
+    "1d": 86400,
+}
+
+# 周期 → 上一级周期
+_PARENT: Dict[str, Optional[str]] = dict(zip(INTERVALS, list(INTERVALS)[1:] + [None]))
+
+
+class Candle:
+    """单根 K 线"""
+
+    __slots__ = ("interval", "start", "open", "high", "low", "close", "volume")
+
+    def __init__(self, interval: str, start: int, open: int, high: int, low: int, close: int, volume: int):
+        self.interval = interval
+        # 开始时间（Unix 秒，已按周期对齐）
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @property
+    def end(self) -> int:
+        """结束时间（Unix 秒，不包含）"""
+        return self.start + INTERVALS[self.interval]
+
+    @property
+    def timestamp(self) -> datetime:
+        """开始时间（UTC，不带时区，与其他表一致）"""
+        return datetime.fromtimestamp(self.start, timezone.utc).replace(tzinfo=None)
+
+    def merge(self, other: "Candle"):
+        """合并一根更晚的低周期 K 线"""
+        if other.high > self.high:
+            self.high = other.high
+        if other.low < self.low:
+            self.low = other.low
+        self.close = other.close
+        self.volume += other.volume
+
+    def to_row(self, symbol: str) -> dict:
+        """转换为 market_data 数据行"""
+        from modules.batch_writer import market_data_row
+        return market_data_row(
+            symbol, self.timestamp, self.interval,
+            self.open, self.high, self.low, self.close, self.volume,
+        )
+
+    def to_dict(self) -> dict:
+        """转换为字典（价格单位：BTC）"""
+        return {
+            "interval": self.interval,
+            "timestamp": self.timestamp.isoformat(),
+            "open": self.open / 100_000_000,
+            "high": self.high / 100_000_000,
+            "low": self.low / 100_000_000,
+            "close": self.close / 100_000_000,
+            "volume": self.volume / 100_000_000,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"Candle({self.interval}, start={self.start}, o={self.open}, h={self.high}, "
+            f"l={self.low}, c={self.close}, v={self.volume})"
+        )
+
+
+def bucket_start(timestamp: float, interval: str) -> int:
+    """时间戳所在周期桶的开始时间"""
+    seconds = INTERVALS[interval]
+    return int(timestamp // seconds) * seconds
+
+
+# 收盘回调：(交易对, 已收盘 K 线)
+OnClose = Callable[[str, Candle], Awaitable[None]]
+
+
+async def persist_candle(symbol: str, candle: Candle):
+    """默认收盘回调：计算 ATR 并加入批量写入缓冲，同时更新实时行情状态中的 ATR"""
+    from modules.atr import atr_engine
+    from modules.market_state import market_state
+    row = await atr_engine.record(candle.to_row(symbol))
+    if row["atr"] is not None and candle.interval == market_state.atr_interval:
+        market_state.update(symbol, atr=row["atr"] / 100_000_000, timestamp=candle.end)
+
+
+class CandleAggregator:
+    """
+    多周期 K 线聚合器
+
+    使用示例:
+        candle_aggregator.start()
+        await candle_aggregator.add_tick("KOGE/USDT", price=500000, volume=1200_0000_0000)
+        candle_aggregator.current("KOGE/USDT", "5m")  # 当前未收盘的 5m K 线
+    """
+
+    # 检查无新 tick 时到期 K 线的间隔（秒）
+    CLOSE_CHECK_INTERVAL = 1.0
+
+    def __init__(self, on_close: Optional[OnClose] = None):
+        self.on_close = on_close or persist_candle
+        # 交易对 → 周期 → 未收盘 K 线
+        self._open: Dict[str, Dict[str, Candle]] = {}
+        # 交易对 → 最后一根已收盘 1m K 线的开始时间（不早于它的 tick 都是迟到数据）
+        self._last_closed: Dict[str, int] = {}
+        self._timer_task: Optional[asyncio.Task] = None
+        # 指标
+        self.ticks = 0
+        self.late_ticks = 0
+        self.closed_candles = 0
+
+    def current(self, symbol: str, interval: str) -> Optional[Candle]:
+        """
+        当前未收盘的 K 线（高周期已合并截至上一根 1m 收盘的数据）
+
+        Returns:
+            K 线，不存在时返回 None
+        """
+        return self._open.get(symbol, {}).get(interval)
+
+    def update(self, symbol: str, price: int, volume: int = 0, timestamp: Optional[float] = None) -> List[Candle]:
+        """
+        处理一笔 tick（不做 I/O）
+
+        Args:
+            symbol: 交易对
+            price: 成交价（单位：聪）
+            volume: 成交量（单位：聪）
+            timestamp: Unix 时间戳（秒），默认当前时间
+
+        Returns:
+            因本次 tick 收盘的 K 线（按周期从低到高）
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self.ticks += 1
+        candles = self._open.setdefault(symbol, {})
+        start = bucket_start(timestamp, "1m")
+
+        closed: List[Candle] = []
+        last_closed = self._last_closed.get(symbol)
+        if last_closed is not None and start <= last_closed:
+            # 迟到数据，所在 K 线已收盘（可能已由 close_expired 收盘并写入）
+            self.late_ticks += 1
+            return closed
+
+        minute = candles.get("1m")
+        if minute is not None:
+            if start < minute.start:
+                # 早于当前 K 线的迟到数据
+                self.late_ticks += 1
+                return closed
+            if start > minute.start:
+                self._close(symbol, candles, minute, closed)
+                minute = None
+
+        if minute is None:
+            candles["1m"] = Candle("1m", start, price, price, price, price, volume)
+        else:
+            if price > minute.high:
+                minute.high = price
+            if price < minute.low:
+                minute.low = price
+            minute.close = price
+            minute.volume += volume
+        return closed
+
+    def close_expired(self, now: Optional[float] = None) -> Dict[str, List[Candle]]:
+        """
+        收盘所有已到期但没有新 tick 触发的 K 线（从低周期到高周期）
+
+        Returns:
+            交易对 → 收盘的 K 线
+        """
+        if now is None:
+            now = time.time()
+        result: Dict[str, List[Candle]] = {}
+        for symbol, candles in self._open.items():
+            closed: List[Candle] = []
+            for interval in INTERVALS:
+                candle = candles.get(interval)
+                if candle is not None and candle.end <= now:
+                    self._close(symbol, candles, candle, closed)
+            if closed:
+                result[symbol] = closed
+        return result
+
+    def _close(self, symbol: str, candles: Dict[str, Candle], candle: Candle, closed: List[Candle]):
+        """收盘一根 K 线，并增量合并到上一级周期（可能级联收盘）"""
+        del candles[candle.interval]
+        closed.append(candle)
+        self.closed_candles += 1
+        if candle.interval == "1m":
+            self._last_closed[symbol] = max(self._last_closed.get(symbol, candle.start), candle.start)
+
+        parent_interval = _PARENT[candle.interval]
+        if parent_interval is None:
+            return
+
+        parent_start = bucket_start(candle.start, parent_interval)
+        parent = candles.get(parent_interval)
+        if parent is not None and parent.start != parent_start:
+            # 上一级 K 线所在的桶已经过去（中间无数据），先收盘
+            self._close(symbol, candles, parent, closed)
+            parent = None
+
+        if parent is None:
+            parent = candles[parent_interval] = Candle(
+                parent_interval, parent_start,
+                candle.open, candle.high, candle.low, candle.close, candle.volume,
+            )
+        else:
+            parent.merge(candle)
+
+        # 本根是上一级桶的最后一根时，上一级同时收盘
+        if candle.end >= parent.end:
+            self._close(symbol, candles, parent, closed)
+
+    async def _emit(self, symbol: str, closed: List[Candle]):
+        """调用收盘回调"""
+        for candle in closed:
+            try:
+                await self.on_close(symbol, candle)
+            except Exception as e:
+                logger.error(f"K线收盘处理失败 {symbol} {candle.interval}: {e}")
+
+    async def add_tick(self, symbol: str, price: int, volume: int = 0, timestamp: Optional[float] = None) -> List[Candle]:
+        """
+        处理一笔 tick，收盘的 K 线交给收盘回调（默认计算 ATR 并批量写入）
+
+        Returns:
+            因本次 tick 收盘的 K 线
+        """
+        closed = self.update(symbol, price, volume, timestamp)
+        if closed:
+            await self._emit(symbol, closed)
+        return closed
+
+    async def _timer_loop(self):
+        """定期收盘没有新 tick 的到期 K 线"""
+        try:
+            while True:
+                await asyncio.sleep(self.CLOSE_CHECK_INTERVAL)
+                for symbol, closed in self.close_expired().items():
+                    await self._emit(symbol, closed)
+        except asyncio.CancelledError:
+            logger.debug("K线收盘定时任务已取消")
+
+    def start(self):
+        """启动到期收盘任务（可重复调用）"""
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._timer_loop())
+
+    async def stop(self):
+        """停止到期收盘任务（未收盘的 K 线不写入）"""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+
+    def stats(self) -> dict:
+        """聚合器指标"""
+        return {
+            "symbols": len(self._open),
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "closed_candles": self.closed_candles,
+        }
+
+
+# 全局 K 线聚合器实例
+candle_aggregator = CandleAggregator()
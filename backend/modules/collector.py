@@ -0,0 +1,69 @@
+"""
+行情采集流水线入口
+采集到的盘口和成交依次进入：内存缓冲 → 实时行情状态 → K 线聚合 → 批量写入
+
+使用示例:
+    await on_orderbook("KOGE/USDT", bids=[[0.005, 1200], ...], asks=[[0.00501, 900], ...])
+    await on_trade("KOGE/USDT", price=0.005, quantity=1200)
+"""
+from typing import Optional, Sequence
+from datetime import datetime, timezone
+import time
+
+from models.orderbook import OrderbookSnapshot
+from modules.batch_writer import market_writer, orderbook_row
+from modules.candles import candle_aggregator
+from modules.market_buffer import market_buffers
+from modules.market_state import market_state, PRICE_SCALE
+
+
+async def on_orderbook(
+    symbol: str,
+    bids: Sequence,
+    asks: Sequence,
+    timestamp: Optional[float] = None,
+    persist: bool = True,
+):
+    """
+    处理一次盘口采集
+
+    Args:
+        symbol: 交易对
+        bids: 买盘 [[price, qty], ...]，价格降序
+        asks: 卖盘 [[price, qty], ...]，价格升序
+        timestamp: Unix 时间戳（秒），默认当前时间
+        persist: 是否写入盘口快照表
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    market_buffers.get(symbol).append(timestamp, bids, asks)
+    market_state.update(
+        symbol,
+        best_bid=bids[0][0] if bids else None,
+        best_ask=asks[0][0] if asks else None,
+        timestamp=timestamp,
+    )
+    if persist:
+        moment = datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+        market_writer.add(OrderbookSnapshot, orderbook_row(symbol, moment, bids, asks))
+
+
+async def on_trade(symbol: str, price: float, quantity: float = 0.0, timestamp: Optional[float] = None):
+    """
+    处理一笔成交（更新最新价并驱动 K 线聚合）
+
+    Args:
+        symbol: 交易对
+        price: 成交价（BTC）
+        quantity: 成交量（BTC）
+        timestamp: Unix 时间戳（秒），默认当前时间
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    market_state.update(symbol, last_price=price, timestamp=timestamp)
+    await candle_aggregator.add_tick(
+        symbol,
+        int(round(price * PRICE_SCALE)),
+        int(round(quantity * PRICE_SCALE)),
+        timestamp,
+    )
@@ -0,0 +1,147 @@
+"""
+图表数据降采样
+把 K 线列压缩到指定点数以内，同时保留价格曲线的形状
+
+- ohlc：相邻 K 线按桶合并（开盘取首根、最高/最低取极值、收盘取末根、成交量求和），
+  结果仍是合法的 K 线，不会丢失区间内的最高价和最低价
+- lttb：Largest-Triangle-Three-Buckets，按收盘价曲线挑选视觉上最重要的原始点，
+  适合折线图
+"""
+from typing import Optional
+
+import numpy as np
+
+from modules.indicators import OHLCV
+
+# 支持的降采样方法
+METHODS = ("ohlc", "lttb")
+
+
+def bucket_bounds(length: int, buckets: int) -> np.ndarray:
+    """
+    把 [0, length) 均分为 buckets 个连续桶
+
+    Returns:
+        每个桶的起始下标（升序，长度 buckets）
+    """
+    return np.unique(np.linspace(0, length, buckets, endpoint=False).astype(np.int64))
+
+
+def ohlc_buckets(data: OHLCV, max_points: int) -> OHLCV:
+    """
+    按桶合并 K 线（min/max 分桶）
+
+    Args:
+        data: 按时间升序的 K 线列
+        max_points: 最多保留的 K 线数
+
+    Returns:
+        合并后的 K 线列，时间取每桶第一根 K 线的开始时间；ATR 取每桶最后一根
+    """
+    length = len(data)
+    if length <= max_points:
+        return data
+
+    starts = bucket_bounds(length, max_points)
+    ends = np.append(starts[1:], length) - 1
+    return OHLCV(
+        data.timestamp[starts],
+        data.open[starts],
+        np.maximum.reduceat(data.high, starts),
+        np.minimum.reduceat(data.low, starts),
+        data.close[ends],
+        np.add.reduceat(data.volume, starts),
+        data.atr[ends],
+    )
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 选点
+
+    首尾两点固定保留，其余点均分为 threshold - 2 个桶，每个桶选出与
+    「上一个选中点」和「下一个桶的均值点」构成三角形面积最大的点。
+
+    Args:
+        x: 横坐标（升序）
+        y: 纵坐标
+        threshold: 保留点数
+
+    Returns:
+        选中点的下标（升序）
+    """
+    length = len(x)
+    if threshold >= length:
+        return np.arange(length)
+    if threshold < 3:
+        # 不足以分桶时只保留首尾
+        return np.array([0, length - 1][:threshold], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # 中间点的桶边界：桶 i 为 [edges[i], edges[i + 1])
+    edges = np.linspace(1, length - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+    previous = 0
+    for i in range(threshold - 2):
+        begin, end = edges[i], edges[i + 1]
+        # 下一个桶的均值点（最后一个桶用末点）
+        if i + 2 < len(edges):
+            next_begin, next_end = edges[i + 1], edges[i + 2]
+            next_x = x[next_begin:next_end].mean()
+            next_y = y[next_begin:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # 三角形面积的两倍（常数因子不影响 argmax）
+        areas = np.abs(
+            (x[previous] - next_x) * (y[begin:end] - y[previous])
+            - (x[previous] - x[begin:end]) * (next_y - y[previous])
+        )
+        previous = begin + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def lttb(data: OHLCV, max_points: int) -> OHLCV:
+    """
+    按收盘价曲线做 LTTB 降采样，保留选中 K 线的全部列
+
+    Args:
+        data: 按时间升序的 K 线列
+        max_points: 最多保留的点数
+    """
+    if len(data) <= max_points:
+        return data
+    x = data.timestamp.astype("datetime64[us]").astype(np.int64).astype(np.float64)
+    # NaN 收盘价会让面积比较失效，先按前值填充
+    close = data.close
+    if np.isnan(close).any():
+        valid = np.where(np.isnan(close), 0, np.arange(len(close)))
+        close = close[np.maximum.accumulate(valid)]
+    indices = lttb_indices(x, close, max_points)
+    return OHLCV(*(column[indices] for column in data))
+
+
+def downsample(data: OHLCV, max_points: int, method: Optional[str] = "ohlc") -> OHLCV:
+    """
+    把 K 线列降采样到 max_points 以内
+
+    Args:
+        data: 按时间升序的 K 线列
+        max_points: 最多保留的点数
+        method: ohlc | lttb
+
+    Returns:
+        降采样后的 K 线列（点数不超过 max_points 时原样返回）
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if max_points < 1:
+        raise ValueError("max_points must be positive")
+    if method == "lttb":
+        return lttb(data, max_points)
+    return ohlc_buckets(data, max_points)
@@ -0,0 +1,277 @@
+"""
+技术指标计算（向量化）
+从 market_data 批量加载 OHLCV 到 NumPy 列，在整列上计算 ATR、EMA、
+波动率、布林带和收益率，供网格自动定价区间和风控检查使用
+
+加载使用 Core select 直接取列值，不构造 ORM 对象；指数平滑类指标
+（EMA、Wilder ATR）用分块扫描实现，不做逐行 Python 循环。
+"""
+from typing import NamedTuple, Optional, Tuple
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# 定点数缩放系数（1 = 100,000,000 聪）
+PRICE_SCALE = 100_000_000
+
+# 分块扫描时每块内衰减因子的最大累计幅度 e^_MAX_BLOCK_EXPONENT，避免上溢/精度损失
+_MAX_BLOCK_EXPONENT = 50.0
+
+
+class OHLCV(NamedTuple):
+    """按时间升序排列的 K 线列（价格单位：BTC）"""
+    timestamp: np.ndarray  # (n,) datetime64[us]
+    open: np.ndarray       # (n,) float64
+    high: np.ndarray       # (n,) float64
+    low: np.ndarray        # (n,) float64
+    close: np.ndarray      # (n,) float64
+    volume: np.ndarray     # (n,) float64
+    atr: np.ndarray        # (n,) float64，未计算时为 NaN
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+
+async def load_ohlcv(
+    symbol: str,
+    interval: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    engine: Optional[AsyncEngine] = None,
+    router=None,
+) -> OHLCV:
+    """
+    批量加载 K 线数据为 NumPy 列
+
+    Args:
+        symbol: 交易对
+        interval: 时间周期（1m, 5m, 15m, 1h, 4h, 1d）
+        start: 起始时间（包含）
+        end: 结束时间（不包含）
+        engine: 数据库引擎，默认全局只读连接池
+        router: 分区路由，默认全局实例；market_data 分区存储时只查询范围内的分区
+
+    Returns:
+        OHLCV 列数据
+    """
+    from models.market_data import MarketData
+    if engine is None:
+        from models.database import read_engine as engine
+    if router is None:
+        from models.partition import partition_router as router
+
+    stmt = select(
+        MarketData.timestamp,
+        MarketData.open,
+        MarketData.high,
+        MarketData.low,
+        MarketData.close,
+        MarketData.volume,
+        MarketData.atr,
+    ).where(MarketData.symbol == symbol, MarketData.interval == interval)
+    if start is not None:
+        stmt = stmt.where(MarketData.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(MarketData.timestamp < end)
+    stmt = stmt.order_by(MarketData.timestamp)
+
+    if router.handles(MarketData):
+        rows = await router.fetch(stmt, start, end)
+    else:
+        async with engine.connect() as conn:
+            rows = (await conn.execute(stmt)).all()
+    return ohlcv_from_rows(rows)
+
+
+def ohlcv_from_rows(rows) -> OHLCV:
+    """
+    将 (timestamp, open, high, low, close, volume, atr) 行转换为列数组（整数聪 → BTC）
+    """
+    if not rows:
+        empty = np.empty(0, dtype=np.float64)
+        return OHLCV(np.empty(0, dtype="datetime64[us]"), empty, empty, empty, empty, empty, empty)
+
+    timestamps, opens, highs, lows, closes, volumes, atrs = zip(*rows)
+    prices = np.array((opens, highs, lows, closes, volumes), dtype=np.float64) / PRICE_SCALE
+    atr = np.array([np.nan if value is None else value for value in atrs], dtype=np.float64) / PRICE_SCALE
+    return OHLCV(
+        np.array(timestamps, dtype="datetime64[us]"),
+        prices[0], prices[1], prices[2], prices[3], prices[4],
+        atr,
+    )
+
+
+# ============ 基础运算 ============
+
+def _ewm_scan(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """
+    计算 y[t] = (1 - alpha) * y[t-1] + alpha * x[t]，y[-1] = initial
+
+    在长度为 B 的块内用闭式解 y[i] = d^(i+1) * (y0 + alpha * Σ x[j] * d^-(j+1))
+    向量化计算（d = 1 - alpha），块长保证 d^-B 不超过 e^50。
+    """
+    count = len(values)
+    result = np.empty(count, dtype=np.float64)
+    if count == 0:
+        return result
+
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        result[:] = values
+        return result
+    block = max(1, min(count, int(_MAX_BLOCK_EXPONENT / -np.log(decay))))
+    powers = decay ** np.arange(1, block + 1, dtype=np.float64)
+    inverse = 1.0 / powers
+
+    carry = initial
+    for begin in range(0, count, block):
+        chunk = values[begin:begin + block]
+        size = len(chunk)
+        scaled = np.cumsum(chunk * inverse[:size]) * alpha
+        out = powers[:size] * (carry + scaled)
+        result[begin:begin + size] = out
+        carry = out[-1]
+    return result
+
+
+def _seeded_smoothing(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """以前 period 个值的简单平均为初值的指数平滑，之前的位置为 NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan, dtype=np.float64)
+    if period <= 0 or len(values) < period:
+        return result
+    seed = values[:period].mean()
+    result[period - 1] = seed
+    result[period:] = _ewm_scan(values[period:], alpha, seed)
+    return result
+
+
+# ============ 指标 ============
+
+def returns(close: np.ndarray, log: bool = False) -> np.ndarray:
+    """
+    收益率
+
+    Args:
+        close: 收盘价
+        log: 是否计算对数收益率
+
+    Returns:
+        (n,) 数组，第一个值为 NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    result = np.full(len(close), np.nan, dtype=np.float64)
+    if len(close) > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if log:
+                result[1:] = np.diff(np.log(close))
+            else:
+                result[1:] = close[1:] / close[:-1] - 1.0
+    return result
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """真实波幅 TR = max(high - low, |high - prev_close|, |low - prev_close|)，首根为 high - low"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    result = high - low
+    if len(result) > 1:
+        prev_close = close[:-1]
+        np.maximum(result[1:], np.abs(high[1:] - prev_close), out=result[1:])
+        np.maximum(result[1:], np.abs(low[1:] - prev_close), out=result[1:])
+    return result
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    ATR（Wilder 平滑，与 modules.atr 的增量计算结果一致）
+
+    Returns:
+        (n,) 数组，前 period - 1 个值为 NaN
+    """
+    return _seeded_smoothing(true_range(high, low, close), period, 1.0 / period)
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    指数移动平均（alpha = 2 / (period + 1)，以前 period 个值的简单平均为初值）
+
+    Returns:
+        (n,) 数组，前 period - 1 个值为 NaN
+    """
+    return _seeded_smoothing(values, period, 2.0 / (period + 1))
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    简单移动平均
+
+    Returns:
+        (n,) 数组，前 window - 1 个值为 NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan, dtype=np.float64)
+    if window <= 0 or len(values) < window:
+        return result
+    result[window - 1:] = sliding_window_view(values, window).mean(axis=1)
+    return result
+
+
+def rolling_std(values: np.ndarray, window: int, ddof: int = 0) -> np.ndarray:
+    """
+    滑动标准差
+
+    Returns:
+        (n,) 数组，前 window - 1 个值为 NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan, dtype=np.float64)
+    if window <= ddof or len(values) < window:
+        return result
+    result[window - 1:] = sliding_window_view(values, window).std(axis=1, ddof=ddof)
+    return result
+
+
+def rolling_volatility(
+    close: np.ndarray,
+    window: int = 20,
+    periods_per_year: Optional[float] = None,
+) -> np.ndarray:
+    """
+    滚动波动率（对数收益率的样本标准差）
+
+    Args:
+        close: 收盘价
+        window: 窗口长度（收益率个数）
+        periods_per_year: 年化系数（如 1m K 线为 525600），None 表示不年化
+
+    Returns:
+        (n,) 数组，前 window 个值为 NaN
+    """
+    log_returns = returns(close, log=True)
+    result = np.full(len(log_returns), np.nan, dtype=np.float64)
+    if len(log_returns) > window:
+        result[1:] = rolling_std(log_returns[1:], window, ddof=1)
+    if periods_per_year:
+        result *= np.sqrt(periods_per_year)
+    return result
+
+
+def bollinger_bands(
+    close: np.ndarray,
+    window: int = 20,
+    num_std: float = 2.0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    布林带
+
+    Returns:
+        (中轨, 上轨, 下轨)，各为 (n,) 数组，前 window - 1 个值为 NaN
+    """
+    middle = sma(close, window)
+    width = rolling_std(close, window) * num_std
+    return middle, middle + width, middle - width
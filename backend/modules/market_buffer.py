@@ -0,0 +1,190 @@
+"""
+行情内存缓冲区
+按交易对保存最近 N 条盘口/价格数据，供技术指标计算使用
+
+数据存放在预分配的 NumPy 数组中，追加为 O(1) 且不分配 Python 对象；
+数组长度为容量的两倍，每条数据同时写入 i 和 i + capacity 两个位置，
+因此任意"最近 n 条"窗口都是一段连续内存，可以零拷贝返回视图。
+"""
+from typing import Dict, NamedTuple, Optional, Sequence
+import math
+import threading
+
+import numpy as np
+
+from utils.app_config import get_config
+
+
+class TickWindow(NamedTuple):
+    """最近 n 条数据的只读视图（按时间从旧到新）"""
+    timestamp: np.ndarray   # (n,) Unix 时间戳（秒）
+    best_bid: np.ndarray    # (n,) 最高买价
+    best_ask: np.ndarray    # (n,) 最低卖价
+    last_price: np.ndarray  # (n,) 最新成交价，未知时为 NaN
+    bid_price: np.ndarray   # (n, depth) 买盘各档价格，缺档为 NaN
+    bid_qty: np.ndarray     # (n, depth) 买盘各档数量
+    ask_price: np.ndarray   # (n, depth) 卖盘各档价格
+    ask_qty: np.ndarray     # (n, depth) 卖盘各档数量
+
+    @property
+    def mid(self) -> np.ndarray:
+        """中间价（新分配数组）"""
+        return (self.best_bid + self.best_ask) / 2
+
+    @property
+    def spread(self) -> np.ndarray:
+        """买卖价差（新分配数组）"""
+        return self.best_ask - self.best_bid
+
+
+class TickRingBuffer:
+    """
+    单个交易对的固定容量环形缓冲区
+
+    使用示例:
+        buffer = TickRingBuffer(capacity=1000, depth=5)
+        buffer.append(time.time(), bids=[[0.005, 1200], ...], asks=[[0.00501, 900], ...])
+        window = buffer.window(100)
+        atr_input = window.mid
+    """
+
+    def __init__(self, capacity: int = 1000, depth: int = 5):
+        if capacity <= 0 or depth <= 0:
+            raise ValueError("capacity and depth must be positive")
+        self.capacity = capacity
+        self.depth = depth
+        size = capacity * 2
+        self._timestamp = np.zeros(size, dtype=np.float64)
+        self._best_bid = np.full(size, np.nan, dtype=np.float64)
+        self._best_ask = np.full(size, np.nan, dtype=np.float64)
+        self._last_price = np.full(size, np.nan, dtype=np.float64)
+        self._bid_price = np.full((size, depth), np.nan, dtype=np.float64)
+        self._bid_qty = np.zeros((size, depth), dtype=np.float64)
+        self._ask_price = np.full((size, depth), np.nan, dtype=np.float64)
+        self._ask_qty = np.zeros((size, depth), dtype=np.float64)
+        # 下一条数据的写入位置（0 ~ capacity-1）
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _write_levels(self, prices: np.ndarray, qtys: np.ndarray, index: int, levels: Sequence) -> float:
+        """写入一侧盘口的前 depth 档，返回最优价"""
+        price_row = prices[index]
+        qty_row = qtys[index]
+        n = min(len(levels), self.depth)
+        for level in range(n):
+            price_row[level] = levels[level][0]
+            qty_row[level] = levels[level][1]
+        if n < self.depth:
+            price_row[n:] = np.nan
+            qty_row[n:] = 0.0
+        return price_row[0] if n else math.nan
+
+    def append(
+        self,
+        timestamp: float,
+        bids: Sequence,
+        asks: Sequence,
+        last_price: Optional[float] = None,
+    ):
+        """
+        追加一条盘口数据（O(1)）
+
+        Args:
+            timestamp: Unix 时间戳（秒）
+            bids: 买盘 [[price, qty], ...]，价格降序
+            asks: 卖盘 [[price, qty], ...]，价格升序
+            last_price: 最新成交价（可选）
+        """
+        pos = self._pos
+        mirror = pos + self.capacity
+
+        best_bid = self._write_levels(self._bid_price, self._bid_qty, pos, bids)
+        best_ask = self._write_levels(self._ask_price, self._ask_qty, pos, asks)
+        self._bid_price[mirror] = self._bid_price[pos]
+        self._bid_qty[mirror] = self._bid_qty[pos]
+        self._ask_price[mirror] = self._ask_price[pos]
+        self._ask_qty[mirror] = self._ask_qty[pos]
+
+        last = math.nan if last_price is None else last_price
+        for array, value in (
+            (self._timestamp, timestamp),
+            (self._best_bid, best_bid),
+            (self._best_ask, best_ask),
+            (self._last_price, last),
+        ):
+            array[pos] = value
+            array[mirror] = value
+
+        self._pos = pos + 1 if pos + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+
+    def window(self, n: Optional[int] = None) -> TickWindow:
+        """
+        获取最近 n 条数据的零拷贝只读视图
+
+        视图引用缓冲区内存，后续 append 超过 capacity - n 条后内容会被覆盖，
+        需要长期保存时请自行 copy()。
+
+        Args:
+            n: 条数，默认全部已有数据
+
+        Returns:
+            按时间从旧到新排列的视图
+        """
+        n = self._count if n is None else min(n, self._count)
+        end = self._pos + self.capacity
+        start = end - n
+        views = []
+        for array in (
+            self._timestamp, self._best_bid, self._best_ask, self._last_price,
+            self._bid_price, self._bid_qty, self._ask_price, self._ask_qty,
+        ):
+            view = array[start:end]
+            view.flags.writeable = False
+            views.append(view)
+        return TickWindow(*views)
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """最近一条数据的最优价（无数据时返回 None）"""
+        if not self._count:
+            return None
+        index = self._pos - 1 + self.capacity
+        return {
+            "timestamp": float(self._timestamp[index]),
+            "best_bid": float(self._best_bid[index]),
+            "best_ask": float(self._best_ask[index]),
+            "last_price": float(self._last_price[index]),
+        }
+
+
+class MarketBufferRegistry:
+    """按交易对管理环形缓冲区"""
+
+    def __init__(self, capacity: Optional[int] = None, depth: Optional[int] = None):
+        market_config = get_config().market_data
+        self.capacity = capacity or market_config.buffer_size
+        self.depth = depth or market_config.depth_levels
+        self._buffers: Dict[str, TickRingBuffer] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str) -> TickRingBuffer:
+        """获取交易对的缓冲区，不存在时创建"""
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.get(symbol)
+                if buffer is None:
+                    buffer = self._buffers[symbol] = TickRingBuffer(self.capacity, self.depth)
+        return buffer
+
+    def symbols(self) -> list[str]:
+        """已有缓冲区的交易对"""
+        return list(self._buffers)
+
+
+# 全局行情缓冲区实例
+market_buffers = MarketBufferRegistry()
@@ -0,0 +1,257 @@
+"""
+实时行情状态缓存
+按交易对保存最新的买一/卖一、成交价和 ATR，由采集流水线实时更新，
+仪表盘轮询接口直接读取（O(1) 字典查询，不访问数据库或上游）
+
+缓存超过 TTL 未更新时视为过期，回退到数据库中最近一条持久化数据；
+回退查询结果同样缓存 TTL 时间，避免过期期间每次请求都查询数据库。
+"""
+from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+import asyncio
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.logger import logger
+from utils.app_config import get_config
+
+# 定点数缩放系数（1 = 100,000,000 聪）
+PRICE_SCALE = 100_000_000
+
+# 状态来源
+SOURCE_LIVE = "live"
+SOURCE_DATABASE = "database"
+
+
+class MarketState:
+    """单个交易对的行情状态（价格单位：BTC）"""
+
+    __slots__ = ("symbol", "best_bid", "best_ask", "last_price", "atr", "quote_at", "source", "checked_at")
+
+    def __init__(self, symbol: str, source: str = SOURCE_LIVE):
+        self.symbol = symbol
+        self.best_bid: Optional[float] = None
+        self.best_ask: Optional[float] = None
+        self.last_price: Optional[float] = None
+        self.atr: Optional[float] = None
+        # 报价（买一/卖一/成交价）本身的时间（Unix 秒）；ATR 更新不改变报价新鲜度
+        self.quote_at = 0.0
+        self.source = source
+        # 数据库回退结果的查询时间（Unix 秒）
+        self.checked_at = 0.0
+
+    @property
+    def spread(self) -> Optional[float]:
+        """买卖价差"""
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return self.best_ask - self.best_bid
+
+    def age(self, now: Optional[float] = None) -> float:
+        """距最后一次报价的秒数"""
+        return (now or time.time()) - self.quote_at
+
+    def to_dict(self, ttl: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """转换为接口返回格式"""
+        now = now or time.time()
+        age = self.age(now) if self.quote_at else None
+        return {
+            "symbol": self.symbol,
+            "bid_price": self.best_bid,
+            "ask_price": self.best_ask,
+            "spread": self.spread,
+            "last_price": self.last_price,
+            "atr": self.atr,
+            "timestamp": (
+                datetime.fromtimestamp(self.quote_at, timezone.utc).isoformat().replace("+00:00", "Z")
+                if self.quote_at else None
+            ),
+            "age_ms": round(age * 1000) if age is not None else None,
+            "stale": age is None or age > ttl,
+            "source": self.source,
+        }
+
+
+class MarketStateCache:
+    """
+    行情状态缓存
+
+    使用示例:
+        market_state.update("KOGE/USDT", best_bid=0.005, best_ask=0.00501)
+        data = await market_state.snapshot("KOGE/USDT")
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        atr_interval: Optional[str] = None,
+        engine: Optional[AsyncEngine] = None,
+        router=None,
+    ):
+        market_config = get_config().market_data
+        # 实时状态的有效期（秒）
+        self.ttl = ttl or market_config.state_ttl
+        # 状态中 ATR 取自哪个周期的 K 线
+        self.atr_interval = atr_interval or market_config.state_atr_interval
+        self._engine = engine
+        self._router = router
+        self._live: Dict[str, MarketState] = {}
+        self._fallback: Dict[str, MarketState] = {}
+        self._fallback_lock = asyncio.Lock()
+        # 指标
+        self.hits = 0
+        self.fallbacks = 0
+
+    @property
+    def engine(self) -> AsyncEngine:
+        """数据库引擎（默认使用全局只读连接池）"""
+        if self._engine is None:
+            from models.database import read_engine
+            self._engine = read_engine
+        return self._engine
+
+    @property
+    def router(self):
+        """时序表分区路由（默认使用全局实例）"""
+        if self._router is None:
+            from models.partition import partition_router
+            self._router = partition_router
+        return self._router
+
+    def update(
+        self,
+        symbol: str,
+        best_bid: Optional[float] = None,
+        best_ask: Optional[float] = None,
+        last_price: Optional[float] = None,
+        atr: Optional[float] = None,
+        timestamp: Optional[float] = None,
+    ):
+        """
+        更新交易对状态（只更新传入的字段，O(1)）
+
+        只有报价字段（best_bid / best_ask / last_price）刷新报价时间，
+        单独更新 ATR 不会让过期的报价显得新鲜。
+
+        Args:
+            symbol: 交易对
+            best_bid: 最高买价
+            best_ask: 最低卖价
+            last_price: 最新成交价
+            atr: ATR
+            timestamp: 数据时间（Unix 秒），默认当前时间
+        """
+        state = self._live.get(symbol)
+        if state is None:
+            state = self._live[symbol] = MarketState(symbol)
+        if best_bid is not None:
+            state.best_bid = best_bid
+        if best_ask is not None:
+            state.best_ask = best_ask
+        if last_price is not None:
+            state.last_price = last_price
+        if atr is not None:
+            state.atr = atr
+        if best_bid is not None or best_ask is not None or last_price is not None:
+            state.quote_at = max(state.quote_at, timestamp or time.time())
+
+    def get(self, symbol: str) -> Optional[MarketState]:
+        """实时状态（可能已过期，不存在时返回 None）"""
+        return self._live.get(symbol)
+
+    async def snapshot(self, symbol: str) -> Dict[str, Any]:
+        """
+        获取交易对行情
+
+        实时状态在 TTL 内直接返回；否则回退到数据库最近一条数据（回退结果缓存 TTL）。
+
+        Returns:
+            接口返回格式的字典，stale 表示报价超过 TTL 未更新
+        """
+        now = time.time()
+        state = self._live.get(symbol)
+        if state is not None and state.age(now) <= self.ttl:
+            self.hits += 1
+            return state.to_dict(self.ttl, now)
+
+        fallback = self._fallback.get(symbol)
+        if fallback is None or now - fallback.checked_at > self.ttl:
+            async with self._fallback_lock:
+                fallback = self._fallback.get(symbol)
+                if fallback is None or now - fallback.checked_at > self.ttl:
+                    fallback = await self._load_persisted(symbol)
+                    fallback.checked_at = now
+                    self._fallback[symbol] = fallback
+        self.fallbacks += 1
+
+        # 实时状态和持久化数据取报价较新的一个
+        if state is not None and state.quote_at >= fallback.quote_at:
+            return state.to_dict(self.ttl, now)
+        return fallback.to_dict(self.ttl, now)
+
+    async def _fetch_latest(self, model, stmt):
+        """查询最近一行（按分区配置选择主库或分区）"""
+        if self.router.handles(model):
+            rows = await self.router.fetch(stmt, newest_first=True, limit=1)
+            return rows[0] if rows else None
+        async with self.engine.connect() as conn:
+            return (await conn.execute(stmt)).first()
+
+    async def _load_persisted(self, symbol: str) -> MarketState:
+        """从数据库读取最近的盘口快照和 K 线"""
+        from models.market_data import MarketData
+        from models.orderbook import OrderbookSnapshot
+        from modules.candles import INTERVALS
+
+        state = MarketState(symbol, source=SOURCE_DATABASE)
+        snapshot_table = OrderbookSnapshot.__table__
+        try:
+            row = await self._fetch_latest(
+                OrderbookSnapshot,
+                select(
+                    snapshot_table.c.timestamp, snapshot_table.c.bids, snapshot_table.c.asks,
+                    snapshot_table.c.levels, snapshot_table.c.bid_levels, snapshot_table.c.ask_levels,
+                )
+                .where(snapshot_table.c.symbol == symbol)
+                .order_by(snapshot_table.c.timestamp.desc())
+                .limit(1),
+            )
+            if row is not None:
+                snapshot = OrderbookSnapshot(
+                    bids=row.bids, asks=row.asks,
+                    levels=row.levels, bid_levels=row.bid_levels, ask_levels=row.ask_levels,
+                )
+                state.best_bid = snapshot.best_bid
+                state.best_ask = snapshot.best_ask
+                state.quote_at = row.timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+            candle = await self._fetch_latest(
+                MarketData,
+                select(MarketData.timestamp, MarketData.close, MarketData.atr)
+                .where(MarketData.symbol == symbol, MarketData.interval == self.atr_interval)
+                .order_by(MarketData.timestamp.desc())
+                .limit(1),
+            )
+            if candle is not None:
+                state.last_price = candle.close / PRICE_SCALE
+                state.atr = candle.atr / PRICE_SCALE if candle.atr is not None else None
+                # K 线的 timestamp 是开始时间，收盘价对应的是收盘时间
+                closed_at = candle.timestamp.replace(tzinfo=timezone.utc).timestamp() + INTERVALS[self.atr_interval]
+                state.quote_at = max(state.quote_at, closed_at)
+        except Exception as e:
+            logger.warning(f"读取持久化行情失败 {symbol}: {e}")
+        return state
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存指标"""
+        return {
+            "symbols": len(self._live),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+        }
+
+
+# 全局行情状态缓存实例
+market_state = MarketStateCache()
@@ -0,0 +1,420 @@
+"""
+行情数据保留与清理
+定期删除超过保留天数的 market_data 和 orderbook_snapshots 数据
+
+- 过期的盘口快照先按 (交易对, 分钟) 降采样到 orderbook_minutes，再删除
+- 删除分块进行，每块一个短事务，块之间让出事件循环，不长时间阻塞写入
+- 主库的写入（分钟聚合、分块删除、增量 VACUUM）作为任务提交给单写入者 db_writer，
+  不与其他写入争抢写锁；分区文件由各自的引擎直接读写
+- 清理后执行增量 VACUUM（数据库为 auto_vacuum=INCREMENTAL 时）回收文件空间
+- 启用分区存储时，对过期分区执行同样的降采样，整个分区过期后直接删除分区文件
+"""
+from typing import Any, Dict, List, Optional, Sequence
+from datetime import datetime, time as dt_time, timedelta
+import asyncio
+import time
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from utils.logger import logger
+from utils.app_config import get_config
+
+# 定点数缩放系数（1 = 100,000,000 聪）
+PRICE_SCALE = 100_000_000
+
+
+def _floor_minute(value: datetime) -> datetime:
+    """取整到分钟"""
+    return value.replace(second=0, microsecond=0)
+
+
+def _to_int(value: float) -> Optional[int]:
+    """浮点价格转为整数聪（NaN 返回 None）"""
+    return None if np.isnan(value) else int(round(value * PRICE_SCALE))
+
+
+def aggregate_minutes(snapshots: Sequence) -> List[Dict[str, Any]]:
+    """
+    将盘口快照按 (交易对, 分钟) 聚合
+
+    Args:
+        snapshots: 按时间升序的 OrderbookSnapshot 列表
+
+    Returns:
+        orderbook_minutes 数据行
+    """
+    from models.orderbook import OrderbookSnapshot
+
+    groups: Dict[tuple, List] = {}
+    for snapshot in snapshots:
+        groups.setdefault((snapshot.symbol, _floor_minute(snapshot.timestamp)), []).append(snapshot)
+
+    rows = []
+    for (symbol, minute), group in groups.items():
+        top = OrderbookSnapshot.top_of_book(group)
+        mid = top["mid"]
+        spread = top["spread"]
+        valid_mid = mid[~np.isnan(mid)]
+        valid_spread = spread[~np.isnan(spread)]
+        bid_depth = np.array([s.get_bids_array()[:, 1].sum() for s in group], dtype=np.float64)
+        ask_depth = np.array([s.get_asks_array()[:, 1].sum() for s in group], dtype=np.float64)
+        rows.append({
+            "symbol": symbol,
+            "timestamp": minute,
+            "mid_open": _to_int(valid_mid[0]) if len(valid_mid) else None,
+            "mid_high": _to_int(valid_mid.max()) if len(valid_mid) else None,
+            "mid_low": _to_int(valid_mid.min()) if len(valid_mid) else None,
+            "mid_close": _to_int(valid_mid[-1]) if len(valid_mid) else None,
+            "spread_avg": _to_int(valid_spread.mean()) if len(valid_spread) else None,
+            "spread_max": _to_int(valid_spread.max()) if len(valid_spread) else None,
+            "bid_depth_avg": _to_int(bid_depth.mean()),
+            "ask_depth_avg": _to_int(ask_depth.mean()),
+            "samples": len(group),
+        })
+    return rows
+
+
+class RetentionService:
+    """
+    行情数据清理服务
+
+    使用示例:
+        retention_service.start()          # 按 retention_interval 定期执行
+        report = await retention_service.run_once()
+    """
+
+    def __init__(
+        self,
+        engine: Optional[AsyncEngine] = None,
+        retention_days: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        interval: Optional[float] = None,
+        keep_intervals: Optional[List[str]] = None,
+        router=None,
+        writer=None,
+    ):
+        market_config = get_config().market_data
+        self._engine = engine
+        self._router = router
+        self._writer = writer
+        self._owns_writer = False
+        self.retention_days = retention_days or market_config.retention_days
+        self.chunk_size = chunk_size or market_config.retention_chunk_size
+        self.interval = interval or market_config.retention_interval
+        self.keep_intervals = (
+            keep_intervals if keep_intervals is not None else market_config.retention_keep_intervals
+        )
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        """数据库引擎（默认使用全局引擎）"""
+        if self._engine is None:
+            from models.database import engine
+            self._engine = engine
+        return self._engine
+
+    @property
+    def writer(self):
+        """主库写入者（默认全局 db_writer；指定了 engine 时为该库单独创建）"""
+        if self._writer is None:
+            if self._engine is not None:
+                from models.writer import SQLiteWriter
+                self._writer = SQLiteWriter(self._engine.url.render_as_string(hide_password=False))
+                self._owns_writer = True
+            else:
+                from models.writer import db_writer
+                self._writer = db_writer
+        return self._writer
+
+    @property
+    def router(self):
+        """时序表分区路由（默认使用全局实例）"""
+        if self._router is None:
+            from models.partition import partition_router
+            self._router = partition_router
+        return self._router
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """保留期限的起点（按分钟对齐，早于该时间的数据过期）"""
+        now = now or datetime.utcnow()
+        return _floor_minute(now - timedelta(days=self.retention_days))
+
+    async def _read_chunk(self, conn: AsyncConnection, cutoff: datetime) -> Optional[tuple]:
+        """
+        读取一块过期盘口快照并按分钟聚合
+
+        块边界对齐到分钟，保证同一分钟的快照在同一块内聚合。
+
+        Returns:
+            (块的结束时间, 分钟聚合)，没有过期快照时返回 None
+        """
+        from models.orderbook import OrderbookSnapshot
+
+        table = OrderbookSnapshot.__table__
+        columns = (
+            table.c.id, table.c.symbol, table.c.timestamp,
+            table.c.bids, table.c.asks, table.c.levels, table.c.bid_levels, table.c.ask_levels,
+        )
+        rows = (await conn.execute(
+            select(*columns)
+            .where(table.c.timestamp < cutoff)
+            .order_by(table.c.timestamp)
+            .limit(self.chunk_size)
+        )).all()
+        if not rows:
+            return None
+
+        if len(rows) < self.chunk_size:
+            boundary = cutoff
+        else:
+            boundary = _floor_minute(rows[-1].timestamp)
+            if boundary <= rows[0].timestamp:
+                # 整块都在同一分钟内：取完整的这一分钟
+                boundary = min(_floor_minute(rows[0].timestamp) + timedelta(minutes=1), cutoff)
+                rows = (await conn.execute(
+                    select(*columns)
+                    .where(table.c.timestamp < boundary)
+                    .order_by(table.c.timestamp)
+                )).all()
+            else:
+                rows = [row for row in rows if row.timestamp < boundary]
+
+        snapshots = [
+            OrderbookSnapshot(
+                symbol=row.symbol, timestamp=row.timestamp, bids=row.bids, asks=row.asks,
+                levels=row.levels, bid_levels=row.bid_levels, ask_levels=row.ask_levels,
+            )
+            for row in rows
+        ]
+        return boundary, aggregate_minutes(snapshots)
+
+    async def _downsample_chunk(self, cutoff: datetime, source: Optional[AsyncEngine] = None) -> tuple[int, int]:
+        """
+        降采样并删除一块过期盘口快照
+
+        主库的快照在一个写入任务（db_writer 的同一事务）中完成读取、聚合、写入和删除。
+        source 为分区引擎时，分钟聚合先经 db_writer 写入主库，再删除分区中的快照；
+        两个事务之间中断后重跑时，主库已有的 (交易对, 分钟) 不再重复写入。
+
+        Returns:
+            (删除的快照数, 写入的分钟聚合数)
+        """
+        from models.orderbook import OrderbookSnapshot
+
+        table = OrderbookSnapshot.__table__
+
+        if source is None or source is self.engine:
+            async def job(conn: AsyncConnection) -> tuple[int, int]:
+                chunk = await self._read_chunk(conn, cutoff)
+                if chunk is None:
+                    return 0, 0
+                boundary, minutes = chunk
+                if minutes:
+                    minutes = await self._insert_minutes(conn, minutes)
+                result = await conn.execute(delete(table).where(table.c.timestamp < boundary))
+                return result.rowcount, len(minutes)
+
+            return await self.writer.run(job)
+
+        async with source.begin() as conn:
+            chunk = await self._read_chunk(conn, cutoff)
+            if chunk is None:
+                return 0, 0
+            boundary, minutes = chunk
+            if minutes:
+                async def insert_job(main_conn: AsyncConnection) -> List[Dict[str, Any]]:
+                    return await self._insert_minutes(main_conn, minutes)
+
+                minutes = await self.writer.run(insert_job)
+            result = await conn.execute(delete(table).where(table.c.timestamp < boundary))
+            return result.rowcount, len(minutes)
+
+    @staticmethod
+    async def _insert_minutes(conn: AsyncConnection, minutes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        写入分钟聚合，跳过已存在的 (交易对, 分钟)
+
+        Returns:
+            实际写入的分钟聚合
+        """
+        from models.orderbook_minute import OrderbookMinute
+
+        table = OrderbookMinute.__table__
+        timestamps = [row["timestamp"] for row in minutes]
+        existing = set((await conn.execute(
+            select(table.c.symbol, table.c.timestamp).where(
+                table.c.symbol.in_({row["symbol"] for row in minutes}),
+                table.c.timestamp >= min(timestamps),
+                table.c.timestamp <= max(timestamps),
+            )
+        )).all())
+        minutes = [row for row in minutes if (row["symbol"], row["timestamp"]) not in existing]
+        if minutes:
+            await conn.execute(insert(table), minutes)
+        return minutes
+
+    async def _delete_market_data_chunk(self, cutoff: datetime, source: Optional[AsyncEngine] = None) -> int:
+        """删除一块过期 K 线数据（一个事务；主库经 db_writer）"""
+        from models.market_data import MarketData
+
+        table = MarketData.__table__
+        ids = select(table.c.id).where(table.c.timestamp < cutoff)
+        if self.keep_intervals:
+            ids = ids.where(table.c.interval.not_in(self.keep_intervals))
+        ids = ids.limit(self.chunk_size)
+
+        statement = delete(table).where(table.c.id.in_(ids.scalar_subquery()))
+        if source is None or source is self.engine:
+            return await self.writer.execute(statement)
+        async with source.begin() as conn:
+            result = await conn.execute(statement)
+            return result.rowcount
+
+    @staticmethod
+    async def _pragma(conn: AsyncConnection, name: str) -> int:
+        return (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar() or 0
+
+    async def _incremental_vacuum(self) -> Dict[str, Any]:
+        """执行增量 VACUUM（经 db_writer），返回回收的字节数"""
+        async def job(conn: AsyncConnection) -> Dict[str, Any]:
+            page_size = await self._pragma(conn, "page_size")
+            before = await self._pragma(conn, "page_count")
+            free_pages = await self._pragma(conn, "freelist_count")
+            auto_vacuum = await self._pragma(conn, "auto_vacuum")
+            if auto_vacuum != 2:
+                # 非 INCREMENTAL 模式时空闲页只会被复用，文件不会缩小
+                return {"vacuum": "unavailable", "free_bytes": free_pages * page_size, "bytes_reclaimed": 0}
+            if free_pages:
+                # sqlite3 的 execute 对该 PRAGMA 只执行一步（只释放一页）；executescript 会先
+                # 提交写入者的事务，改用 executemany 按空闲页数执行，一次线程往返完成
+                await conn.exec_driver_sql("PRAGMA incremental_vacuum", [()] * free_pages)
+            after = await self._pragma(conn, "page_count")
+            return {"vacuum": "incremental", "free_bytes": 0, "bytes_reclaimed": (before - after) * page_size}
+
+        return await self.writer.run(job)
+
+    async def _sources(self, cutoff: datetime) -> tuple[list, list, list]:
+        """
+        需要清理的数据源
+
+        Returns:
+            (盘口快照所在引擎, K 线所在引擎, 整个已过期的分区)
+        """
+        from models.market_data import MarketData
+        from models.orderbook import OrderbookSnapshot
+
+        snapshot_sources = [self.engine]
+        market_data_sources = [self.engine]
+        expired = []
+        router = self.router
+        if not router.enabled:
+            return snapshot_sources, market_data_sources, expired
+
+        for partition in router.partitions_for_range(None, cutoff):
+            engine = await router.engine_for(partition)
+            if engine is None:
+                continue
+            fully_expired = datetime.combine(router.partition_end(partition), dt_time.min) <= cutoff
+            if router.handles(OrderbookSnapshot):
+                snapshot_sources.append(engine)
+            # 整个分区过期且没有需要保留的周期时，K 线随文件一起删除，无需逐块 DELETE
+            if router.handles(MarketData) and not (fully_expired and not self.keep_intervals):
+                market_data_sources.append(engine)
+            if fully_expired:
+                expired.append(partition)
+        return snapshot_sources, market_data_sources, expired
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        执行一次清理
+
+        Returns:
+            清理报告：删除的行数、写入的分钟聚合数、回收的字节数、耗时
+        """
+        async with self._run_lock:
+            start = time.perf_counter()
+            cutoff = self.cutoff(now)
+            snapshots_removed = minutes_written = market_data_removed = 0
+
+            snapshot_sources, market_data_sources, expired = await self._sources(cutoff)
+
+            for source in snapshot_sources:
+                while True:
+                    removed, minutes = await self._downsample_chunk(cutoff, source)
+                    snapshots_removed += removed
+                    minutes_written += minutes
+                    if not removed:
+                        break
+                    await asyncio.sleep(0)
+
+            for source in market_data_sources:
+                while True:
+                    removed = await self._delete_market_data_chunk(cutoff, source)
+                    market_data_removed += removed
+                    if removed < self.chunk_size:
+                        break
+                    await asyncio.sleep(0)
+
+            vacuum = await self._incremental_vacuum()
+
+            # 整个过期的分区直接删除文件
+            partitions_dropped = 0
+            for partition in expired:
+                if not self.keep_intervals or await self.router.is_empty(partition):
+                    vacuum["bytes_reclaimed"] += await self.router.drop(partition)
+                    partitions_dropped += 1
+
+            report = {
+                "cutoff": cutoff.isoformat() + "Z",
+                "orderbook_snapshots_removed": snapshots_removed,
+                "orderbook_minutes_written": minutes_written,
+                "market_data_removed": market_data_removed,
+                "partitions_dropped": partitions_dropped,
+                **vacuum,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "finished_at": datetime.utcnow().isoformat() + "Z",
+            }
+            self.last_report = report
+            logger.info(
+                f"行情数据清理完成: 盘口 {snapshots_removed} 行（聚合 {minutes_written} 分钟），"
+                f"K线 {market_data_removed} 行，回收 {vacuum['bytes_reclaimed']} 字节"
+            )
+            return report
+
+    async def _loop(self):
+        """定期执行清理（启动后先等待一个间隔，不在服务启动时立即做全量清理）"""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error(f"行情数据清理失败: {e}")
+        except asyncio.CancelledError:
+            logger.debug("行情数据清理任务已取消")
+
+    def start(self):
+        """启动定期清理任务（可重复调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """停止定期清理任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._owns_writer:
+            await self._writer.stop()
+
+
+# 全局清理服务实例
+retention_service = RetentionService()
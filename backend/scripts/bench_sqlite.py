@@ -0,0 +1,172 @@
+"""
+SQLite 连接参数基准测试
+对比 SQLite 默认参数与 database.sqlite 配置下的写入和读取吞吐
+
+- 批量写入：market_data 每事务 --batch 行（批量写入器的写法）
+- 单行提交：每行一个事务（登录时间、配置更新等业务写入的写法）
+- 范围读取：按交易对和时间范围读取 K 线
+- 点查询：按主键逐行读取
+- 写入时读取：另一个引擎持续批量写入时的点查询（回滚日志模式下读会被写事务阻塞）
+
+用法:
+    python scripts/bench_sqlite.py [--rows 50000] [--batch 100] [--commits 500] [--reads 2000]
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import insert, select
+
+from models.database import Base, create_sqlite_engine
+from models.market_data import MarketData
+from modules.batch_writer import market_data_row
+from utils.app_config import SQLitePragmaConfig, get_config
+from utils.logger import logger
+
+# 只保留警告以上日志，避免干扰计时
+logger.remove()
+logger.add(sys.stderr, level="WARNING")
+
+SYMBOLS = ("KOGE/USDT", "ALPHA/USDT", "BETA/USDT", "GAMMA/USDT")
+
+# 对照组：所有 PRAGMA 保持 SQLite 默认值
+DEFAULT_PRAGMAS = SQLitePragmaConfig(
+    auto_vacuum=None, journal_mode=None, synchronous=None,
+    mmap_size=None, cache_size=None, temp_store=None, busy_timeout=None,
+)
+
+
+def make_rows(count: int, offset: int = 0) -> list:
+    """构造 1m K 线数据行（交易对轮换，时间递增）"""
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(offset, offset + count):
+        price = 500_000 + random.randint(-5_000, 5_000)
+        rows.append(market_data_row(
+            SYMBOLS[i % len(SYMBOLS)], start + timedelta(minutes=i // len(SYMBOLS)), "1m",
+            price, price + 100, price - 100, price, random.randint(1, 10) * 100_000_000,
+        ))
+    return rows
+
+
+async def run_case(path: Path, pragmas: SQLitePragmaConfig, args) -> dict:
+    """在新数据库文件上依次执行各项测试，返回每秒操作数"""
+    engine = create_sqlite_engine(path, pragmas=pragmas)
+    table = MarketData.__table__
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[table])
+
+    result = {}
+    rows = make_rows(args.rows)
+    started = time.perf_counter()
+    for i in range(0, len(rows), args.batch):
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), rows[i:i + args.batch])
+    result["batch_insert"] = len(rows) / (time.perf_counter() - started)
+
+    single = make_rows(args.commits, offset=args.rows)
+    started = time.perf_counter()
+    for row in single:
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), [row])
+    result["single_commit"] = len(single) / (time.perf_counter() - started)
+
+    # 重新打开连接，避免写入阶段留下的页缓存影响读取结果
+    await engine.dispose()
+
+    minutes = args.rows // len(SYMBOLS)
+    stmt = select(table.c.timestamp, table.c.open, table.c.high, table.c.low, table.c.close, table.c.volume)
+    started = time.perf_counter()
+    scanned = 0
+    async with engine.connect() as conn:
+        for _ in range(args.reads // 10):
+            begin = datetime(2026, 1, 1) + timedelta(minutes=random.randint(0, max(minutes - 1440, 0)))
+            query = stmt.where(
+                table.c.symbol == random.choice(SYMBOLS),
+                table.c.interval == "1m",
+                table.c.timestamp >= begin,
+                table.c.timestamp < begin + timedelta(days=1),
+            ).order_by(table.c.timestamp)
+            scanned += len((await conn.execute(query)).all())
+    result["range_rows"] = scanned / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        for _ in range(args.reads):
+            await conn.execute(select(table).where(table.c.id == random.randint(1, args.rows)))
+    result["point_read"] = args.reads / (time.perf_counter() - started)
+
+    # 写入与读取使用不同的引擎（连接），模拟采集写入和接口查询并发
+    writer_engine = create_sqlite_engine(path, pragmas=pragmas)
+    writing = make_rows(args.rows // 2, offset=args.rows + args.commits)
+    done = asyncio.Event()
+
+    async def write_loop():
+        for i in range(0, len(writing), args.batch):
+            async with writer_engine.begin() as conn:
+                await conn.execute(insert(table), writing[i:i + args.batch])
+        done.set()
+
+    writer = asyncio.create_task(write_loop())
+    reads = 0
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        while not done.is_set():
+            await conn.execute(select(table).where(table.c.id == random.randint(1, args.rows)))
+            await conn.commit()
+            reads += 1
+    result["read_during_write"] = reads / (time.perf_counter() - started)
+    await writer
+    await writer_engine.dispose()
+
+    await engine.dispose()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SQLite 连接参数基准测试")
+    parser.add_argument("--rows", type=int, default=50_000, help="批量写入的总行数")
+    parser.add_argument("--batch", type=int, default=100, help="每个事务的行数")
+    parser.add_argument("--commits", type=int, default=500, help="单行提交次数")
+    parser.add_argument("--reads", type=int, default=2_000, help="点查询次数（范围查询为其 1/10）")
+    parser.add_argument("--dir", type=str, default=None, help="测试数据库目录（默认系统临时目录）")
+    args = parser.parse_args()
+
+    configured = get_config().database.sqlite
+    cases = [("SQLite 默认", DEFAULT_PRAGMAS), ("database.sqlite", configured)]
+    print(f"配置: {configured.dict()}")
+
+    directory = Path(tempfile.mkdtemp(prefix="bench-sqlite-", dir=args.dir))
+    results = []
+    try:
+        for index, (name, pragmas) in enumerate(cases):
+            random.seed(42)
+            results.append((name, await run_case(directory / f"case{index}.db", pragmas, args)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    columns = (
+        ("batch_insert", "批量写入 行/s"),
+        ("single_commit", "单行提交 次/s"),
+        ("range_rows", "范围读取 行/s"),
+        ("point_read", "点查询 次/s"),
+        ("read_during_write", "写入时读取 次/s"),
+    )
+    print("\n" + f"{'':>16}" + "".join(f"{title:>16}" for _, title in columns))
+    for name, result in results:
+        print(f"{name:>16}" + "".join(f"{result[key]:>16,.0f}" for key, _ in columns))
+    baseline, tuned = results[0][1], results[1][1]
+    print(f"{'提升':>16}" + "".join(f"{tuned[key] / baseline[key]:>15.2f}x" for key, _ in columns))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""
+WebSocket 广播编码开销基准测试
+验证每次广播的编码次数和编码耗时不随连接数增长
+
+用法:
+    python scripts/bench_ws_broadcast.py [--broadcasts 200] [--connections 10,100,1000] [--encoding json]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import api.websocket as ws_module
+from api.websocket import ConnectionManager, create_orderbook_update
+from utils.logger import logger
+
+# 只保留警告以上日志，避免每次连接/广播的日志干扰计时
+logger.remove()
+logger.add(sys.stderr, level="WARNING")
+
+
+class NullWebSocket:
+    """只计数、不做 I/O 的假连接"""
+
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self.frames += 1
+
+    async def send_bytes(self, data: bytes):
+        self.frames += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def sample_orderbook() -> dict:
+    """构造一条5档盘口消息"""
+    return create_orderbook_update(
+        bids=[[round(0.005 - i * 0.00001, 6), random.randint(500, 2000)] for i in range(5)],
+        asks=[[round(0.005 + i * 0.00001, 6), random.randint(500, 2000)] for i in range(5)],
+    )
+
+
+async def run_case(connections: int, broadcasts: int, encoding: str) -> dict:
+    """测量指定连接数下的编码次数与耗时"""
+    encode_calls = 0
+    encode_time = 0.0
+    encoder_name = "encode_msgpack" if encoding == "msgpack" else "encode_json"
+    original_encode = getattr(ws_module, encoder_name)
+
+    def counting_encode(message):
+        nonlocal encode_calls, encode_time
+        start = time.perf_counter()
+        result = original_encode(message)
+        encode_time += time.perf_counter() - start
+        encode_calls += 1
+        return result
+
+    # 关闭合并推送，保证每次广播都真正发送到每个连接
+    manager = ConnectionManager(queue_size=broadcasts + 16, conflate_rates={})
+    sockets = [NullWebSocket() for _ in range(connections)]
+    for sock in sockets:
+        await manager.connect(sock, "bench", encoding=encoding)
+    # 等待欢迎消息发送完毕
+    await asyncio.sleep(0)
+
+    messages = [sample_orderbook() for _ in range(broadcasts)]
+    setattr(ws_module, encoder_name, counting_encode)
+    try:
+        start = time.perf_counter()
+        for message in messages:
+            await manager.broadcast(message)
+        enqueue_time = time.perf_counter() - start
+        # 编码在写协程首次发送时发生，等待所有队列发送完毕
+        while any(client.queue_depth for client in manager.clients.values()):
+            await asyncio.sleep(0)
+    finally:
+        setattr(ws_module, encoder_name, original_encode)
+
+    for sock in sockets:
+        manager.disconnect(sock)
+
+    return {
+        "connections": connections,
+        "encodes_per_broadcast": encode_calls / broadcasts,
+        "encode_us_per_broadcast": encode_time / broadcasts * 1e6,
+        "broadcast_us": enqueue_time / broadcasts * 1e6,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket broadcast encode benchmark")
+    parser.add_argument("--broadcasts", type=int, default=200, help="每种连接数下的广播次数")
+    parser.add_argument("--connections", default="1,10,100,1000", help="逗号分隔的连接数列表")
+    parser.add_argument("--encoding", default="json", choices=["json", "msgpack"], help="连接使用的消息编码")
+    args = parser.parse_args()
+
+    if args.encoding == "msgpack":
+        encoder = "msgpack"
+    else:
+        encoder = "orjson" if ws_module.orjson is not None else "json"
+    print(f"encoder: {encoder}, broadcasts per case: {args.broadcasts}")
+    print(f"{'connections':>12} {'encodes/bcast':>14} {'encode us/bcast':>16} {'broadcast us':>14}")
+    for count in (int(c) for c in args.connections.split(",")):
+        result = await run_case(count, args.broadcasts, args.encoding)
+        print(
+            f"{result['connections']:>12} {result['encodes_per_broadcast']:>14.2f} "
+            f"{result['encode_us_per_broadcast']:>16.2f} {result['broadcast_us']:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""
+列式归档导出脚本
+将指定时间范围的行情、盘口和成交数据导出为 .npy 目录（可内存映射读取）
+
+用法:
+    python scripts/export_archive.py --start 2026-01-01 --end 2026-02-01 --out ../data/archive/2026-01
+    python scripts/export_archive.py --start 2026-01-01 --end 2026-01-02 --out /tmp/koge --tables orderbook_snapshots --symbol KOGE/USDT --depth 10
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from modules.archive import ARCHIVE_TABLES, DEFAULT_CHUNK_SIZE, export_archive
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="导出列式归档（.npy 目录）")
+    parser.add_argument("--start", required=True, type=datetime.fromisoformat, help="起始时间（UTC，包含），如 2026-01-01")
+    parser.add_argument("--end", required=True, type=datetime.fromisoformat, help="结束时间（UTC，不包含）")
+    parser.add_argument("--out", required=True, type=Path, help="归档目录")
+    parser.add_argument(
+        "--tables",
+        default=",".join(ARCHIVE_TABLES),
+        help=f"导出的表，逗号分隔（默认: {','.join(ARCHIVE_TABLES)}）",
+    )
+    parser.add_argument("--symbol", default=None, help="只导出该交易对")
+    parser.add_argument("--depth", type=int, default=20, help="盘口快照导出的档数（默认 20）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每次读取的行数")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    tables = [name.strip() for name in args.tables.split(",") if name.strip()]
+    manifest = await export_archive(
+        args.out, args.start, args.end,
+        tables=tables, symbol=args.symbol, depth=args.depth, chunk_size=args.chunk_size,
+    )
+    print(f"✓ 归档已导出到 {args.out}")
+    for name, info in manifest["tables"].items():
+        print(f"  - {name}: {info['rows']} 行，{len(info['columns'])} 列")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
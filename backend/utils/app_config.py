@@ -102,11 +102,134 @@ class NotificationsConfig(BaseModel):
     email: NotificationServiceConfig = Field(default_factory=NotificationServiceConfig)
 
 
+class PartitioningConfig(BaseModel):
+    """时序表分区存储配置"""
+    enabled: bool = False
+    period: str = "day"                  # day | week
+    directory: str = "data/partitions"   # 分区文件目录（相对项目根目录）
+    tables: List[str] = Field(default_factory=lambda: ["market_data", "orderbook_snapshots"])
+    max_open_engines: int = 32           # 同时打开的分区引擎上限
+
+    @validator("period")
+    def validate_period(cls, v):
+        if v not in ("day", "week"):
+            raise ValueError("period must be 'day' or 'week'")
+        return v
+
+
+class SQLitePragmaConfig(BaseModel):
+    """SQLite 连接参数（每个新连接建立时执行 PRAGMA，设为 null 则保持 SQLite 默认值）"""
+    auto_vacuum: Optional[str] = "INCREMENTAL"  # 只对新建的数据库文件生效，便于清理后回收空间
+    journal_mode: Optional[str] = "WAL"      # WAL：读写互不阻塞
+    synchronous: Optional[str] = "NORMAL"    # WAL 下 NORMAL 只在检查点时 fsync
+    mmap_size: Optional[int] = 268435456     # 内存映射读取上限（字节）
+    cache_size: Optional[int] = -65536       # 页缓存，负数表示 KiB
+    temp_store: Optional[str] = "MEMORY"     # 临时表和排序使用内存
+    busy_timeout: Optional[int] = 5000       # 锁等待超时（毫秒）
+
+    @validator("auto_vacuum")
+    def validate_auto_vacuum(cls, v):
+        if v is not None and v.upper() not in ("NONE", "FULL", "INCREMENTAL"):
+            raise ValueError("auto_vacuum must be NONE, FULL or INCREMENTAL")
+        return v
+
+    @validator("journal_mode")
+    def validate_journal_mode(cls, v):
+        if v is not None and v.upper() not in ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"):
+            raise ValueError("journal_mode must be DELETE, TRUNCATE, PERSIST, MEMORY, WAL or OFF")
+        return v
+
+    @validator("synchronous")
+    def validate_synchronous(cls, v):
+        if v is not None and v.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError("synchronous must be OFF, NORMAL, FULL or EXTRA")
+        return v
+
+    @validator("temp_store")
+    def validate_temp_store(cls, v):
+        if v is not None and v.upper() not in ("DEFAULT", "FILE", "MEMORY"):
+            raise ValueError("temp_store must be DEFAULT, FILE or MEMORY")
+        return v
+
+
+class WriterConfig(BaseModel):
+    """单写入者队列配置"""
+    queue_size: int = 10000              # 写入队列上限，满时提交方等待
+    max_batch: int = 100                 # 每个事务最多合并的写入任务数
+
+
 class DatabaseConfig(BaseModel):
     """数据库配置"""
     type: str = "sqlite"
-    path: str = "data/alpha-score.db"
+    path: str = "data/alpha-score.db"    # 数据库文件（相对项目根目录），环境变量 DATABASE_URL 优先
     echo: bool = False
+    sqlite: SQLitePragmaConfig = Field(default_factory=SQLitePragmaConfig)
+    read_pool_size: int = 5              # 只读连接池大小
+    writer: WriterConfig = Field(default_factory=WriterConfig)
+    partitioning: PartitioningConfig = Field(default_factory=PartitioningConfig)
+
+    @validator("type")
+    def validate_type(cls, v):
+        if v != "sqlite":
+            raise ValueError("only sqlite is supported")
+        return v
+
+
+class MarketDataConfig(BaseModel):
+    """行情数据配置"""
+    buffer_size: int = 1000              # 每个交易对内存缓冲的数据条数
+    depth_levels: int = 5                # 缓冲保存的盘口档数
+    flush_size: int = 100                # 批量写入：缓冲条数阈值
+    flush_interval: float = 10.0         # 批量写入：时间阈值（秒）
+    max_backlog: int = 10000             # 写入失败时最多积压的条数
+    orderbook_storage: str = "json"      # 盘口快照存储格式：json | binary
+    retention_days: int = 30             # 原始行情/盘口数据保留天数
+    retention_interval: float = 3600.0   # 清理任务执行间隔（秒）
+    retention_chunk_size: int = 1000     # 每个删除事务的最大行数
+    # 不受保留天数限制的 K 线周期（如 ["1h", "4h", "1d"]）
+    retention_keep_intervals: List[str] = Field(default_factory=list)
+    state_ttl: float = 5.0               # 实时行情状态有效期（秒），过期后回退到数据库
+    state_atr_interval: str = "1m"       # 实时行情状态中的 ATR 取自该周期 K 线
+
+    @validator("orderbook_storage")
+    def validate_orderbook_storage(cls, v):
+        if v not in ("json", "binary"):
+            raise ValueError("orderbook_storage must be 'json' or 'binary'")
+        return v
+
+
+class WebSocketConfig(BaseModel):
+    """WebSocket推送配置"""
+    queue_size: int = 256                # 每个连接的发送队列上限
+    overflow_policy: str = "drop_oldest"  # drop_oldest | disconnect
+    # 合并推送：消息类型 → 每个客户端每个主题的最大发送频率（次/秒）
+    conflate_rates: Dict[str, float] = Field(
+        default_factory=lambda: {"price_update": 4.0, "orderbook_update": 2.0}
+    )
+    conflation_tick_ms: int = 50         # 合并队列的刷新周期（毫秒）
+    heartbeat_interval: int = 30         # 心跳间隔（秒）
+    heartbeat_timeout: int = 90          # 超过该时间未收到pong则断开（秒）
+    max_batch_window_ms: int = 100       # 客户端可请求的最大批量推送时间窗（毫秒）
+    max_batch_size: int = 64             # 单个批量帧最多包含的消息数
+    broadcast_backend: str = "local"     # local: 进程内 | unix: 多 worker 本机总线
+    broadcast_socket_dir: str = "data/ws-bus"  # unix 后端的套接字目录
+    # 断线恢复：带序列号并缓存以便回放的消息类型
+    replay_types: List[str] = Field(
+        default_factory=lambda: ["trade_executed", "system_status", "risk_alert"]
+    )
+    replay_buffer_size: int = 500        # 每个主题缓存的事件数
+
+    @validator("broadcast_backend")
+    def validate_broadcast_backend(cls, v):
+        if v not in ("local", "unix"):
+            raise ValueError("broadcast_backend must be 'local' or 'unix'")
+        return v
+
+    @validator("overflow_policy")
+    def validate_overflow_policy(cls, v):
+        if v not in ("drop_oldest", "disconnect"):
+            raise ValueError("overflow_policy must be 'drop_oldest' or 'disconnect'")
+        return v
 
 
 class LoggingConfig(BaseModel):
@@ -146,6 +269,8 @@ class AppConfig(BaseModel):
     behavior: BehaviorConfig = Field(default_factory=BehaviorConfig)
     notifications: NotificationsConfig = Field(default_factory=NotificationsConfig)
     database: DatabaseConfig = Field(default_factory=DatabaseConfig)
+    websocket: WebSocketConfig = Field(default_factory=WebSocketConfig)
+    market_data: MarketDataConfig = Field(default_factory=MarketDataConfig)
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
     ladders: LaddersConfig = Field(default_factory=LaddersConfig)
     secrets: SecretsConfig = Field(default_factory=SecretsConfig)
@@ -0,0 +1,40 @@
+"""
+K 线聚合器测试
+"""
+import pytest
+
+from modules.candles import CandleAggregator
+
+# 2026-01-01 00:00:00 UTC
+T0 = 1767225600
+
+
+@pytest.mark.unit
+def test_late_tick_after_close_expired_is_dropped():
+    """close_expired 收盘后，同一分钟的迟到 tick 不再生成第二根 1m K 线"""
+    aggregator = CandleAggregator()
+    aggregator.update("KOGE/USDT", price=100, volume=10, timestamp=T0 + 5)
+
+    closed = aggregator.close_expired(now=T0 + 61)
+    assert [candle.interval for candle in closed["KOGE/USDT"]] == ["1m"]
+
+    # 已收盘分钟内的迟到 tick
+    assert aggregator.update("KOGE/USDT", price=120, volume=7, timestamp=T0 + 30) == []
+    assert aggregator.late_ticks == 1
+    assert aggregator.current("KOGE/USDT", "1m") is None
+
+    # 5m K 线只合并了一次该分钟的成交量
+    assert aggregator.current("KOGE/USDT", "5m").volume == 10
+
+
+@pytest.mark.unit
+def test_tick_in_next_minute_after_close_expired_opens_new_candle():
+    """close_expired 之后的下一分钟 tick 正常开新 K 线"""
+    aggregator = CandleAggregator()
+    aggregator.update("KOGE/USDT", price=100, volume=10, timestamp=T0 + 5)
+    aggregator.close_expired(now=T0 + 61)
+
+    assert aggregator.update("KOGE/USDT", price=110, volume=3, timestamp=T0 + 65) == []
+    assert aggregator.late_ticks == 0
+    minute = aggregator.current("KOGE/USDT", "1m")
+    assert minute.start == T0 + 60 and minute.volume == 3
@@ -0,0 +1,49 @@
+"""
+数据库表结构升级测试
+"""
+import pytest
+from sqlalchemy import create_engine
+
+from models.database import group_by_columns, upgrade_schema
+from models.orderbook import OrderbookSnapshot
+
+# 二进制盘口之前的 orderbook_snapshots 表结构
+LEGACY_ORDERBOOK_DDL = (
+    "CREATE TABLE orderbook_snapshots (id INTEGER NOT NULL, symbol VARCHAR(20) NOT NULL, "
+    "timestamp DATETIME NOT NULL, bids TEXT NOT NULL, asks TEXT NOT NULL, PRIMARY KEY (id))",
+    "CREATE INDEX idx_orderbook_symbol_timestamp ON orderbook_snapshots (symbol, timestamp)",
+    "INSERT INTO orderbook_snapshots (symbol, timestamp, bids, asks) "
+    "VALUES ('KOGE/USDT', '2026-01-01 00:00:00.000000', '[]', '[]')",
+)
+
+
+@pytest.mark.unit
+def test_upgrade_legacy_orderbook_table(tmp_path):
+    """旧库补齐二进制盘口列、bids/asks 改为可空，数据保留，重复执行无副作用"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    table = OrderbookSnapshot.__table__
+    with engine.begin() as conn:
+        for statement in LEGACY_ORDERBOOK_DDL:
+            conn.exec_driver_sql(statement)
+
+    for _ in range(2):
+        with engine.begin() as conn:
+            upgrade_schema(conn, [table])
+
+    with engine.begin() as conn:
+        info = {row[1]: row for row in conn.exec_driver_sql("PRAGMA table_info(orderbook_snapshots)")}
+        assert {"levels", "bid_levels", "ask_levels"} <= set(info)
+        assert info["bids"][3] == 0 and info["asks"][3] == 0
+        assert conn.exec_driver_sql("SELECT count(*) FROM orderbook_snapshots").scalar() == 1
+
+        conn.exec_driver_sql(
+            "INSERT INTO orderbook_snapshots (symbol, timestamp, levels, bid_levels, ask_levels) "
+            "VALUES ('KOGE/USDT', '2026-01-01 00:00:01.000000', x'00', 0, 0)"
+        )
+
+
+@pytest.mark.unit
+def test_group_by_columns():
+    """不同列集合的数据行分到不同组"""
+    rows = [{"a": 1, "b": 2}, {"a": 3}, {"a": 4, "b": 5}]
+    assert group_by_columns(rows) == [[rows[0], rows[2]], [rows[1]]]
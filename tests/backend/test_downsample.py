@@ -0,0 +1,95 @@
+"""
+K 线周期选择与图表降采样测试
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from api.routes.market import candidate_intervals
+from modules.downsample import downsample, lttb_indices, ohlc_buckets
+from modules.indicators import OHLCV
+
+
+def _ohlcv(length):
+    """构造 length 根 1m K 线：收盘价为正弦曲线，最高/最低价为收盘价 ±1"""
+    timestamp = np.datetime64("2026-01-01T00:00") + np.arange(length) * np.timedelta64(1, "m")
+    close = np.sin(np.arange(length) / 10) * 10 + 100
+    return OHLCV(
+        timestamp.astype("datetime64[us]"),
+        np.roll(close, 1),
+        close + 1,
+        close - 1,
+        close,
+        np.ones(length),
+        np.arange(length, dtype=np.float64),
+    )
+
+
+@pytest.mark.unit
+def test_candidate_intervals_start_at_finest_fitting_interval():
+    """从 K 线数不超过 max_points 的最细周期开始候选，都超过时只剩最粗周期"""
+    start = datetime(2026, 1, 1)
+    assert candidate_intervals(start, start + timedelta(hours=10), 1000) == ["1m", "5m", "15m", "1h", "4h", "1d"]
+    assert candidate_intervals(start, start + timedelta(days=1), 1000) == ["5m", "15m", "1h", "4h", "1d"]
+    assert candidate_intervals(start, start + timedelta(days=30), 1000) == ["1h", "4h", "1d"]
+    assert candidate_intervals(start, start + timedelta(days=5000), 1000) == ["1d"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("method", ["ohlc", "lttb"])
+@pytest.mark.parametrize("length,max_points", [(1000, 100), (1001, 37), (250, 249)])
+def test_downsample_point_count(method, length, max_points):
+    """降采样后点数不超过 max_points，且时间升序"""
+    result = downsample(_ohlcv(length), max_points, method)
+    assert 0 < len(result) <= max_points
+    assert all(len(column) == len(result) for column in result)
+    assert (np.diff(result.timestamp.astype(np.int64)) > 0).all()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("method", ["ohlc", "lttb"])
+def test_downsample_keeps_small_input(method):
+    """点数不超过 max_points 时原样返回"""
+    data = _ohlcv(50)
+    assert downsample(data, 50, method) is data
+
+
+@pytest.mark.unit
+def test_ohlc_buckets_preserve_range_and_endpoints():
+    """ohlc 合并保留首根开盘、末根收盘、区间极值和总成交量"""
+    data = _ohlcv(1000)
+    result = ohlc_buckets(data, 100)
+
+    assert len(result) == 100
+    assert result.timestamp[0] == data.timestamp[0]
+    assert result.open[0] == data.open[0]
+    assert result.close[-1] == data.close[-1]
+    assert result.atr[-1] == data.atr[-1]
+    assert result.high.max() == data.high.max()
+    assert result.low.min() == data.low.min()
+    assert result.volume.sum() == data.volume.sum()
+
+
+@pytest.mark.unit
+def test_lttb_keeps_endpoints_and_extremes():
+    """LTTB 固定保留首尾点，并选中曲线的峰谷"""
+    data = _ohlcv(1000)
+    result = downsample(data, 100, "lttb")
+
+    assert result.timestamp[0] == data.timestamp[0]
+    assert result.timestamp[-1] == data.timestamp[-1]
+    assert result.close.max() >= data.close.max() - 0.1
+    assert result.close.min() <= data.close.min() + 0.1
+
+    indices = lttb_indices(np.arange(10.0), np.arange(10.0), 2)
+    assert indices.tolist() == [0, 9]
+
+
+@pytest.mark.unit
+def test_downsample_rejects_invalid_arguments():
+    """未知方法或非正点数报错"""
+    with pytest.raises(ValueError):
+        downsample(_ohlcv(10), 5, "median")
+    with pytest.raises(ValueError):
+        downsample(_ohlcv(10), 0, "ohlc")
@@ -0,0 +1,80 @@
+"""
+行情内存缓冲区测试
+"""
+import numpy as np
+import pytest
+
+from modules.market_buffer import MarketBufferRegistry, TickRingBuffer
+
+
+def _fill(buffer, count):
+    """追加 count 条数据，第 i 条的时间戳为 i、买一价为 100 + i"""
+    for i in range(count):
+        buffer.append(float(i), bids=[[100.0 + i, 1.0], [99.0 + i, 2.0]], asks=[[101.0 + i, 3.0]], last_price=100.5 + i)
+
+
+@pytest.mark.unit
+def test_window_before_wraparound():
+    """未写满时窗口只包含已有数据"""
+    buffer = TickRingBuffer(capacity=5, depth=2)
+    _fill(buffer, 3)
+
+    window = buffer.window()
+    assert len(buffer) == 3
+    np.testing.assert_array_equal(window.timestamp, [0, 1, 2])
+    np.testing.assert_array_equal(window.best_bid, [100, 101, 102])
+    np.testing.assert_array_equal(buffer.window(10).timestamp, [0, 1, 2])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("count", [5, 7, 10, 13])
+def test_window_across_wraparound_is_contiguous_and_ordered(count):
+    """写入位置回绕后，任意窗口仍按时间从旧到新且为连续视图"""
+    buffer = TickRingBuffer(capacity=5, depth=2)
+    _fill(buffer, count)
+
+    assert len(buffer) == 5
+    for n in range(1, 6):
+        window = buffer.window(n)
+        expected = np.arange(count - n, count, dtype=np.float64)
+        np.testing.assert_array_equal(window.timestamp, expected)
+        np.testing.assert_array_equal(window.best_bid, 100 + expected)
+        np.testing.assert_array_equal(window.best_ask, 101 + expected)
+        np.testing.assert_array_equal(window.last_price, 100.5 + expected)
+        np.testing.assert_array_equal(window.bid_price, np.column_stack([100 + expected, 99 + expected]))
+        np.testing.assert_array_equal(window.ask_qty[:, 0], np.full(n, 3.0))
+        assert window.timestamp.flags.c_contiguous
+        assert not window.timestamp.flags.writeable
+
+    assert buffer.latest() == {
+        "timestamp": count - 1.0,
+        "best_bid": 100.0 + count - 1,
+        "best_ask": 101.0 + count - 1,
+        "last_price": 100.5 + count - 1,
+    }
+
+
+@pytest.mark.unit
+def test_missing_levels_are_nan():
+    """档数不足时价格为 NaN、数量为 0；回绕覆盖旧数据时不残留旧档位"""
+    buffer = TickRingBuffer(capacity=2, depth=3)
+    buffer.append(0.0, bids=[[1.0, 1.0], [0.9, 1.0], [0.8, 1.0]], asks=[[1.1, 1.0]])
+    buffer.append(1.0, bids=[[1.0, 1.0]], asks=[])
+    buffer.append(2.0, bids=[[1.0, 2.0]], asks=[])
+
+    window = buffer.window()
+    np.testing.assert_array_equal(window.timestamp, [1.0, 2.0])
+    assert np.isnan(window.bid_price[:, 1:]).all()
+    np.testing.assert_array_equal(window.bid_qty[:, 1:], 0.0)
+    assert np.isnan(window.best_ask).all()
+    assert np.isnan(window.last_price).all()
+
+
+@pytest.mark.unit
+def test_registry_returns_one_buffer_per_symbol():
+    """同一交易对总是返回同一个缓冲区"""
+    registry = MarketBufferRegistry(capacity=4, depth=2)
+    buffer = registry.get("KOGE/USDT")
+    assert registry.get("KOGE/USDT") is buffer
+    assert buffer.capacity == 4 and buffer.depth == 2
+    assert registry.symbols() == ["KOGE/USDT"]
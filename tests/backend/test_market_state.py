@@ -0,0 +1,58 @@
+"""
+实时行情状态缓存测试
+"""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import insert
+
+from models.database import Base, create_sqlite_engine
+from models.market_data import MarketData
+from models.orderbook import OrderbookSnapshot
+from modules.batch_writer import market_data_row
+from modules.market_state import MarketStateCache
+
+NOW = 1767225600.0
+
+
+@pytest.mark.unit
+def test_atr_update_does_not_refresh_quote():
+    """ATR 更新不改变报价时间，过期报价仍标记为 stale"""
+    cache = MarketStateCache(ttl=5)
+    cache.update("KOGE/USDT", best_bid=0.005, best_ask=0.00501, timestamp=NOW - 60)
+    cache.update("KOGE/USDT", atr=0.0001, timestamp=NOW)
+
+    state = cache.get("KOGE/USDT")
+    data = state.to_dict(cache.ttl, NOW)
+    assert data["atr"] == 0.0001
+    assert data["stale"] is True
+    assert data["age_ms"] == 60_000
+
+    cache.update("KOGE/USDT", last_price=0.005, timestamp=NOW - 1)
+    assert state.to_dict(cache.ttl, NOW)["stale"] is False
+
+
+@pytest.mark.unit
+def test_database_fallback_uses_candle_close_time(tmp_path):
+    """回退到持久化 K 线时，报价时间取 K 线收盘时间而不是开始时间"""
+
+    async def scenario():
+        engine = create_sqlite_engine(tmp_path / "state.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[MarketData.__table__, OrderbookSnapshot.__table__])
+            start = datetime.fromtimestamp(NOW - 60, timezone.utc).replace(tzinfo=None)
+            await conn.execute(insert(MarketData.__table__), [
+                market_data_row("KOGE/USDT", start, "1m", 100, 110, 90, 105, 1),
+            ])
+
+        cache = MarketStateCache(ttl=5, atr_interval="1m", engine=engine)
+        state = await cache._load_persisted("KOGE/USDT")
+        await engine.dispose()
+        return state
+
+    state = asyncio.run(scenario())
+    assert state.quote_at == NOW
+    data = state.to_dict(5, NOW + 1)
+    assert data["last_price"] == 105 / 100_000_000
+    assert data["stale"] is False
@@ -0,0 +1,67 @@
+"""
+盘口增量流测试
+"""
+import pytest
+
+from api.orderbook_stream import OrderbookStream
+
+
+@pytest.mark.unit
+def test_first_apply_sends_all_levels():
+    """首次应用盘口时全部价位都是增量，序列号从 1 开始"""
+    stream = OrderbookStream("KOGE/USDT")
+    delta = stream.apply([[1.0, 5.0], [0.9, 3.0]], [[1.1, 2.0]])
+    assert delta == {
+        "symbol": "KOGE/USDT",
+        "seq": 1,
+        "bids": [[1.0, 5.0], [0.9, 3.0]],
+        "asks": [[1.1, 2.0]],
+    }
+
+
+@pytest.mark.unit
+def test_delta_contains_only_changed_and_removed_levels():
+    """增量只包含数量变化和新增的价位，消失的价位数量为 0"""
+    stream = OrderbookStream("KOGE/USDT")
+    stream.apply([[1.0, 5.0], [0.9, 3.0]], [[1.1, 2.0]])
+
+    delta = stream.apply([[1.0, 4.0], [0.8, 1.0]], [[1.1, 2.0]])
+    assert delta["seq"] == 2
+    assert sorted(delta["bids"]) == [[0.8, 1.0], [0.9, 0.0], [1.0, 4.0]]
+    assert delta["asks"] == []
+
+
+@pytest.mark.unit
+def test_unchanged_book_does_not_advance_seq():
+    """盘口无变化时不产生增量，序列号保持连续"""
+    stream = OrderbookStream("KOGE/USDT")
+    stream.apply([[1.0, 5.0]], [[1.1, 2.0]])
+    assert stream.apply([[1.0, 5.0]], [[1.1, 2.0]]) is None
+    assert stream.apply([[1.0, 6.0]], [[1.1, 2.0]])["seq"] == 2
+
+
+@pytest.mark.unit
+def test_snapshot_matches_applied_deltas():
+    """快照携带当前序列号，按增量重建的盘口与快照一致"""
+    stream = OrderbookStream("KOGE/USDT")
+    book = {"bids": {}, "asks": {}}
+    updates = [
+        ([[1.0, 5.0], [0.9, 3.0]], [[1.1, 2.0], [1.2, 1.0]]),
+        ([[1.0, 4.0]], [[1.1, 2.0], [1.3, 7.0]]),
+        ([[1.0, 4.0], [0.95, 2.0]], [[1.3, 6.0]]),
+    ]
+    for bids, asks in updates:
+        delta = stream.apply(bids, asks)
+        for side in ("bids", "asks"):
+            for price, qty in delta[side]:
+                if qty:
+                    book[side][price] = qty
+                else:
+                    book[side].pop(price, None)
+
+    snapshot = stream.snapshot()
+    assert snapshot["seq"] == 3
+    assert snapshot["bids"] == [[1.0, 4.0], [0.95, 2.0]]
+    assert snapshot["asks"] == [[1.3, 6.0]]
+    assert snapshot["bids"] == [[p, q] for p, q in sorted(book["bids"].items(), reverse=True)]
+    assert snapshot["asks"] == [[p, q] for p, q in sorted(book["asks"].items())]
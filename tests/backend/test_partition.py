@@ -0,0 +1,91 @@
+"""
+时序数据分区存储测试
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from models.market_data import MarketData
+from models.partition import PartitionRouter
+from modules.batch_writer import market_data_row
+
+
+@pytest.mark.unit
+def test_day_and_week_partition_bounds(tmp_path):
+    """按天分区以当天为起点；按周分区以周一为起点，跨 7 天"""
+    day = PartitionRouter(tmp_path, period="day")
+    week = PartitionRouter(tmp_path, period="week")
+    # 2026-01-01 是周四
+    value = datetime(2026, 1, 1, 23, 59)
+
+    assert day.partition_start(value) == date(2026, 1, 1)
+    assert day.partition_end(date(2026, 1, 1)) == date(2026, 1, 2)
+    assert day.path_for(date(2026, 1, 1)).name == "day-20260101.db"
+
+    assert week.partition_start(value) == date(2025, 12, 29)
+    assert week.partition_start(datetime(2026, 1, 4, 23, 59)) == date(2025, 12, 29)
+    assert week.partition_start(datetime(2026, 1, 5)) == date(2026, 1, 5)
+    assert week.partition_end(date(2025, 12, 29)) == date(2026, 1, 5)
+
+
+@pytest.mark.unit
+def test_handles_only_configured_tables(tmp_path):
+    """只有配置的表且分区启用时才走分区"""
+    router = PartitionRouter(tmp_path, tables=["market_data"])
+    assert router.handles(MarketData)
+    assert router.handles(MarketData.__table__)
+    assert not PartitionRouter(tmp_path, tables=["orderbook_snapshots"]).handles(MarketData)
+    assert not PartitionRouter(tmp_path, enabled=False).handles(MarketData)
+
+
+@pytest.mark.unit
+def test_range_selects_overlapping_partitions(tmp_path):
+    """范围查询只选择与 [start, end) 重叠的已存在分区"""
+    router = PartitionRouter(tmp_path, period="day")
+    for day in (1, 2, 3, 5):
+        router.path_for(date(2026, 1, day)).touch()
+    (tmp_path / "week-20260105.db").touch()
+    (tmp_path / "day-invalid.db").touch()
+
+    assert router.partitions() == [date(2026, 1, d) for d in (1, 2, 3, 5)]
+    assert router.partitions_for_range(datetime(2026, 1, 2), datetime(2026, 1, 3)) == [date(2026, 1, 2)]
+    assert router.partitions_for_range(datetime(2026, 1, 1, 12), datetime(2026, 1, 3, 0, 1)) == [
+        date(2026, 1, 1), date(2026, 1, 2), date(2026, 1, 3),
+    ]
+    assert router.partitions_for_range(None, datetime(2026, 1, 2)) == [date(2026, 1, 1)]
+    assert router.partitions_for_range(datetime(2026, 1, 4), None) == [date(2026, 1, 5)]
+    assert router.partitions_for_range(datetime(2026, 1, 4), datetime(2026, 1, 5)) == []
+
+
+@pytest.mark.unit
+def test_insert_routes_rows_and_fetch_reads_range(tmp_path):
+    """写入按行时间分到各自分区；读取按分区顺序拼接，newest_first + limit 只读最近的分区"""
+
+    async def scenario():
+        router = PartitionRouter(tmp_path, period="day")
+        table = MarketData.__table__
+        start = datetime(2026, 1, 1, 22)
+        rows = [
+            market_data_row("KOGE/USDT", start + timedelta(hours=i), "1h", 100 + i, 100 + i, 100 + i, 100 + i, 1)
+            for i in range(30)
+        ]
+        assert await router.insert(table, rows) == 30
+        assert router.partitions() == [date(2026, 1, 1), date(2026, 1, 2), date(2026, 1, 3)]
+
+        stmt = select(table.c.timestamp).order_by(table.c.timestamp)
+        fetched = await router.fetch(stmt, datetime(2026, 1, 2), datetime(2026, 1, 3))
+        assert [row.timestamp for row in fetched] == [datetime(2026, 1, 2, hour) for hour in range(24)]
+
+        latest = await router.fetch(
+            select(table.c.timestamp).order_by(table.c.timestamp.desc()).limit(1),
+            newest_first=True, limit=1,
+        )
+        assert latest[0].timestamp == start + timedelta(hours=29)
+
+        assert await router.drop(date(2026, 1, 1)) > 0
+        assert router.partitions() == [date(2026, 1, 2), date(2026, 1, 3)]
+        await router.close()
+
+    asyncio.run(scenario())
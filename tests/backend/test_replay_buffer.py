@@ -0,0 +1,53 @@
+"""
+WebSocket 事件回放缓冲测试
+"""
+import pytest
+
+from api.replay_buffer import ReplayLog, TopicReplayBuffer
+
+
+@pytest.mark.unit
+def test_topic_buffer_tracks_evicted_events():
+    """超出容量淘汰最旧事件，起点早于已淘汰事件时存在缺口"""
+    buffer = TopicReplayBuffer(capacity=3)
+    for seq in range(1, 6):
+        buffer.append(seq, f"event-{seq}")
+
+    assert [seq for seq, _ in buffer.events] == [3, 4, 5]
+    assert buffer.evicted_upto == 2
+    assert buffer.has_gap(1)
+    assert not buffer.has_gap(2)
+    assert buffer.since(3) == [(4, "event-4"), (5, "event-5")]
+    assert buffer.since(5) == []
+
+
+@pytest.mark.unit
+def test_collect_merges_topics_in_seq_order():
+    """多个主题的事件按全局序列号合并"""
+    log = ReplayLog(capacity=10, epoch="e1")
+    for topic in ("trade_executed", "system_status", "trade_executed", "system_status"):
+        seq = log.next_seq()
+        log.append(topic, seq, (topic, seq))
+
+    events, gap = log.collect(["trade_executed", "system_status"], from_seq=1)
+    assert events == [("system_status", 2), ("trade_executed", 3), ("system_status", 4)]
+    assert gap is False
+    # 未订阅的主题不回放
+    events, _ = log.collect(["trade_executed"], from_seq=0)
+    assert events == [("trade_executed", 1), ("trade_executed", 3)]
+
+
+@pytest.mark.unit
+def test_collect_reports_gap_and_latest_snapshot():
+    """缺口超出缓冲时报告 gap，latest 返回每个主题的最新事件"""
+    log = ReplayLog(capacity=2, epoch="e1")
+    for topic in ("trade_executed",) * 4 + ("system_status",):
+        seq = log.next_seq()
+        log.append(topic, seq, (topic, seq))
+
+    events, gap = log.collect(["trade_executed", "system_status"], from_seq=1)
+    assert gap is True
+    assert events == [("trade_executed", 3), ("trade_executed", 4), ("system_status", 5)]
+    assert log.latest(["trade_executed", "system_status", "price_update"]) == [
+        ("trade_executed", 4), ("system_status", 5),
+    ]
@@ -0,0 +1,98 @@
+"""
+行情数据清理测试
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from models.database import Base, create_sqlite_engine
+from models.market_data import MarketData
+from models.orderbook import OrderbookSnapshot
+from models.orderbook_minute import OrderbookMinute
+from modules.batch_writer import market_data_row, orderbook_row
+from modules.retention import RetentionService
+
+NOW = datetime(2026, 3, 1)
+
+
+@pytest.mark.unit
+def test_partition_downsample_rerun_does_not_duplicate_minutes(tmp_path):
+    """分钟聚合已写入主库、分区快照未删除时重跑，不重复写入同一分钟"""
+
+    async def scenario():
+        main = create_sqlite_engine(tmp_path / "main.db")
+        partition = create_sqlite_engine(tmp_path / "partition.db")
+        for engine, table in ((main, OrderbookMinute.__table__), (partition, OrderbookSnapshot.__table__)):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, tables=[table])
+
+        service = RetentionService(engine=main, retention_days=1)
+        cutoff = service.cutoff(NOW)
+        rows = [
+            orderbook_row("KOGE/USDT", cutoff - timedelta(minutes=3, seconds=-i * 10),
+                          [[1.0, 1.0]], [[1.1, 1.0]], binary=False)
+            for i in range(12)
+        ]
+
+        async def load():
+            async with partition.begin() as conn:
+                await conn.execute(insert(OrderbookSnapshot.__table__), rows)
+
+        await load()
+        assert await service._downsample_chunk(cutoff, partition) == (12, 2)
+        # 模拟上次运行在删除分区快照前中断
+        await load()
+        assert await service._downsample_chunk(cutoff, partition) == (12, 0)
+
+        async with main.connect() as conn:
+            count = (await conn.execute(select(func.count()).select_from(OrderbookMinute.__table__))).scalar()
+        assert count == 2
+
+        await service.stop()
+        await main.dispose()
+        await partition.dispose()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_run_once_writes_main_database_through_writer(tmp_path):
+    """主库的降采样、分块删除和增量 VACUUM 都经写入者执行"""
+
+    async def scenario():
+        main = create_sqlite_engine(tmp_path / "main.db")
+        async with main.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[
+                MarketData.__table__, OrderbookSnapshot.__table__, OrderbookMinute.__table__,
+            ])
+
+        service = RetentionService(engine=main, retention_days=1, chunk_size=50, keep_intervals=[])
+        cutoff = service.cutoff(NOW)
+        candles = [
+            market_data_row("KOGE/USDT", cutoff - timedelta(minutes=i), "1m", 100, 110, 90, 105, 1)
+            for i in range(1, 301)
+        ]
+        snapshots = [
+            orderbook_row("KOGE/USDT", cutoff - timedelta(seconds=i * 10), [[1.0, 1.0]], [[1.1, 1.0]], binary=False)
+            for i in range(1, 121)
+        ]
+        async with main.begin() as conn:
+            await conn.execute(insert(MarketData.__table__), candles)
+            await conn.execute(insert(OrderbookSnapshot.__table__), snapshots)
+
+        report = await service.run_once(NOW)
+        assert report["market_data_removed"] == 300
+        assert report["orderbook_snapshots_removed"] == 120
+        assert report["orderbook_minutes_written"] == 20
+        assert service.writer.transactions > 0
+        assert report["vacuum"] == "incremental"
+        assert report["bytes_reclaimed"] > 0
+        async with main.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar() == 0
+
+        await service.stop()
+        await main.dispose()
+
+    asyncio.run(scenario())
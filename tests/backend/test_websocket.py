@@ -0,0 +1,334 @@
+"""
+WebSocket 连接管理器测试
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from api.broadcast import LocalBroadcastBackend
+from api.replay_buffer import ReplayLog
+from api.websocket import ConnectionManager, Frame, create_message, create_price_update, msgpack
+
+
+class FakeWebSocket:
+    """记录发送内容的 WebSocket 替身"""
+
+    def __init__(self):
+        self.texts = []
+        self.binaries = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.texts.append(text)
+
+    async def send_bytes(self, data):
+        self.binaries.append(data)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+    def messages(self):
+        """已发送的 JSON 消息（数组帧展开）"""
+        result = []
+        for text in self.texts:
+            payload = json.loads(text)
+            result.extend(payload if isinstance(payload, list) else [payload])
+        return result
+
+
+@pytest.mark.unit
+def test_ping_bypasses_batching_encoding_and_queue():
+    """心跳ping始终是单独的 JSON 文本帧，不受批量推送、编码和满队列丢弃影响"""
+
+    async def scenario():
+        manager = ConnectionManager(queue_size=2, overflow_policy="drop_oldest", backend=LocalBroadcastBackend())
+        websocket = FakeWebSocket()
+        encoding = "msgpack" if msgpack is not None else None
+        await manager.connect(websocket, "test", encoding=encoding, batch_window_ms=50)
+        client = manager.clients[websocket]
+        # 写协程停在批量时间窗中，队列保持满
+        for i in range(5):
+            manager._enqueue(client, Frame(create_message("system_status", {"index": i})))
+
+        assert manager._sweep_heartbeats(time.monotonic()) == 0
+        await client.ping_task
+        # 批量推送的数组帧之外，ping 是顶层 type 为 ping 的独立对象
+        pings = [json.loads(text) for text in websocket.texts]
+        pings = [message for message in pings if isinstance(message, dict) and message.get("type") == "ping"]
+        assert len(pings) == 1
+        assert client.dropped_messages > 0
+
+        await manager.stop()
+        manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_any_client_message_keeps_connection_alive():
+    """超时判断以最近一次收到客户端消息为准"""
+
+    async def scenario():
+        manager = ConnectionManager(backend=LocalBroadcastBackend())
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "test")
+        client = manager.clients[websocket]
+
+        now = time.monotonic()
+        client.last_pong = now - manager.heartbeat_timeout - 1
+        manager.record_pong(websocket)
+        assert manager._sweep_heartbeats(now) == 0
+        assert websocket in manager.clients
+
+        client.last_pong = now - manager.heartbeat_timeout - 1
+        assert manager._sweep_heartbeats(now) == 1
+        assert websocket not in manager.clients
+
+        await manager.stop()
+
+    asyncio.run(scenario())
+
+
+
+@pytest.mark.unit
+def test_orderbook_delta_subscription_and_resync():
+    """订阅增量主题先收到快照，之后收到连续序列号的增量；resync 返回当前快照"""
+
+    async def scenario():
+        manager = ConnectionManager(conflate_rates={}, backend=LocalBroadcastBackend())
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "test")
+        client = manager.clients[websocket]
+        topic = "orderbook_delta:KOGE/USDT"
+
+        def publish(bids, asks):
+            manager._deliver(create_message("orderbook_update", {"symbol": "KOGE/USDT", "bids": bids, "asks": asks}))
+
+        publish([[1.0, 5.0]], [[1.1, 2.0]])
+        assert await manager.handle_client_message(websocket, json.dumps({"action": "subscribe", "topics": [topic]}))
+        publish([[1.0, 4.0]], [[1.1, 2.0]])
+        publish([[1.0, 4.0]], [[1.2, 1.0]])
+        await client.queue.join()
+
+        messages = [m for m in websocket.messages() if m["type"] in ("orderbook_snapshot", "orderbook_delta")]
+        assert [(m["type"], m["data"]["seq"]) for m in messages] == [
+            ("orderbook_snapshot", 1), ("orderbook_delta", 2), ("orderbook_delta", 3),
+        ]
+        assert messages[0]["data"]["bids"] == [[1.0, 5.0]]
+        assert sorted(messages[2]["data"]["asks"]) == [[1.1, 0.0], [1.2, 1.0]]
+
+        websocket.texts.clear()
+        assert await manager.handle_client_message(websocket, json.dumps({"action": "resync", "topics": [topic]}))
+        await client.queue.join()
+        [snapshot] = websocket.messages()
+        assert snapshot["type"] == "orderbook_snapshot"
+        assert snapshot["data"] == {"symbol": "KOGE/USDT", "seq": 3, "bids": [[1.0, 4.0]], "asks": [[1.2, 1.0]]}
+
+        await manager.stop()
+        manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_max_rate_conflates_to_latest_value_per_interval():
+    """max_rate 限速后每个主题每个间隔最多一帧，发送的是最新值"""
+
+    async def scenario():
+        manager = ConnectionManager(conflate_rates={"price_update": 10}, backend=LocalBroadcastBackend())
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "test")
+        client = manager.clients[websocket]
+        assert await manager.handle_client_message(websocket, json.dumps({
+            "action": "subscribe", "topics": ["price_update:KOGE/USDT", "price_update:ALPHA/USDT"], "max_rate": 2,
+        }))
+        await client.queue.join()
+        websocket.texts.clear()
+
+        def prices():
+            return [(m["data"]["symbol"], m["data"]["price"]) for m in websocket.messages() if m["type"] == "price_update"]
+
+        t0 = 1000.0
+        for offset, price in ((0.0, 1.0), (0.1, 2.0), (0.2, 3.0), (0.3, 4.0)):
+            manager._conflate(client, Frame(create_price_update("KOGE/USDT", price, 0)), t0 + offset)
+        manager._conflate(client, Frame(create_price_update("ALPHA/USDT", 9.0, 0)), t0 + 0.3)
+        await client.queue.join()
+        # 第一个值立即发送，其余等待下一个间隔（1 / max_rate = 0.5 秒）
+        assert prices() == [("KOGE/USDT", 1.0), ("ALPHA/USDT", 9.0)]
+        assert client.conflated_messages == 2
+
+        manager._flush_conflated(t0 + 0.4)
+        await client.queue.join()
+        assert len(prices()) == 2
+
+        manager._flush_conflated(t0 + 0.5)
+        await client.queue.join()
+        assert prices()[2:] == [("KOGE/USDT", 4.0)]
+
+        manager._flush_conflated(t0 + 2.0)
+        await client.queue.join()
+        assert len(prices()) == 3
+
+        await manager.stop()
+        manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_batching_sends_array_frames_capped_at_max_batch_size():
+    """批量推送把时间窗内的消息合并为数组帧，每帧不超过 max_batch_size 条"""
+
+    async def scenario():
+        manager = ConnectionManager(backend=LocalBroadcastBackend())
+        manager.max_batch_size = 3
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "test")
+        client = manager.clients[websocket]
+        await client.queue.join()
+        websocket.texts.clear()
+        sent_frames, sent_messages = client.sent_frames, client.sent_messages
+
+        client.batch_window = 0.02
+        for i in range(5):
+            manager._enqueue(client, Frame(create_message("system_status", {"index": i})))
+        await client.queue.join()
+
+        frames = [json.loads(text) for text in websocket.texts]
+        assert [len(frame) for frame in frames] == [3, 2]
+        assert [message["data"]["index"] for frame in frames for message in frame] == [0, 1, 2, 3, 4]
+        assert client.sent_frames - sent_frames == 2
+        assert client.sent_messages - sent_messages == 5
+
+        await manager.stop()
+        manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+async def _stalled_client(manager):
+    """建立连接并停止其写协程，模拟发送卡住的慢客户端"""
+    websocket = FakeWebSocket()
+    await manager.connect(websocket, "slow")
+    client = manager.clients[websocket]
+    await client.queue.join()
+    client.writer_task.cancel()
+    await asyncio.sleep(0)
+    return websocket, client
+
+
+@pytest.mark.unit
+def test_full_queue_drops_oldest_frame():
+    """drop_oldest：队列满时丢弃最旧的消息，连接保持"""
+
+    async def scenario():
+        manager = ConnectionManager(queue_size=3, overflow_policy="drop_oldest", backend=LocalBroadcastBackend())
+        websocket, client = await _stalled_client(manager)
+        for i in range(5):
+            assert manager._enqueue(client, Frame(create_message("system_status", {"index": i})))
+
+        queued = [client.queue.get_nowait().message["data"]["index"] for _ in range(client.queue.qsize())]
+        assert queued == [2, 3, 4]
+        assert client.dropped_messages == 2
+        assert websocket in manager.clients
+
+        await manager.stop()
+        manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_full_queue_disconnects_slow_client():
+    """disconnect：队列满时断开慢客户端（1013）"""
+
+    async def scenario():
+        manager = ConnectionManager(queue_size=2, overflow_policy="disconnect", backend=LocalBroadcastBackend())
+        websocket, client = await _stalled_client(manager)
+        assert manager._enqueue(client, Frame(create_message("system_status", {"index": 0})))
+        assert manager._enqueue(client, Frame(create_message("system_status", {"index": 1})))
+        assert not manager._enqueue(client, Frame(create_message("system_status", {"index": 2})))
+        await asyncio.sleep(0)
+
+        assert websocket not in manager.clients
+        assert manager.get_connection_count() == 0
+        assert websocket.close_code == 1013
+
+        await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def _replay_manager(capacity):
+    """只回放 trade_executed / system_status 的连接管理器"""
+    manager = ConnectionManager(conflate_rates={}, backend=LocalBroadcastBackend())
+    manager.replay_types = {"trade_executed", "system_status"}
+    manager.replay_log = ReplayLog(capacity, epoch="e1")
+    return manager
+
+
+@pytest.mark.unit
+def test_resume_from_replays_missed_events():
+    """resume from=<seq> 按序补发之后的事件"""
+
+    async def scenario():
+        manager = _replay_manager(capacity=10)
+        for i in range(4):
+            manager._deliver(create_message("trade_executed", {"index": i}))
+
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "test")
+        client = manager.clients[websocket]
+        assert await manager.handle_client_message(websocket, "resume from=2 epoch=e1")
+        await client.queue.join()
+
+        messages = websocket.messages()
+        assert messages[0]["data"]["epoch"] == "e1"
+        assert messages[0]["data"]["last_seq"] == 4
+        assert [(m["seq"], m["data"]["index"]) for m in messages if m["type"] == "trade_executed"] == [(3, 2), (4, 3)]
+        complete = messages[-1]
+        assert complete["type"] == "resume_complete"
+        assert complete["data"]["replayed"] == 2
+        assert complete["data"]["gap"] is False
+
+        await manager.stop()
+        manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("request_text", ["resume from=1 epoch=e1", "resume from=5 epoch=old"])
+def test_resume_gap_sends_latest_state(request_text):
+    """起点已被淘汰或 epoch 变化（服务重启）时标记 gap，只发送每个主题的最新事件"""
+
+    async def scenario():
+        manager = _replay_manager(capacity=2)
+        for i in range(5):
+            manager._deliver(create_message("trade_executed", {"index": i}))
+        manager._deliver(create_message("system_status", {"mode": "normal"}))
+
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "test")
+        client = manager.clients[websocket]
+        assert await manager.handle_client_message(websocket, request_text)
+        await client.queue.join()
+
+        messages = websocket.messages()
+        assert [(m["type"], m["seq"]) for m in messages if "seq" in m] == [
+            ("trade_executed", 5), ("system_status", 6),
+        ]
+        complete = messages[-1]
+        assert complete["type"] == "resume_complete"
+        assert complete["data"]["gap"] is True
+        assert complete["data"]["epoch"] == "e1"
+
+        await manager.stop()
+        manager.disconnect(websocket)
+
+    asyncio.run(scenario())
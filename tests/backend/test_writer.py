@@ -0,0 +1,88 @@
+"""
+SQLite 单写入者队列测试
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from models.database import create_sqlite_engine
+from models.writer import SQLiteWriter
+
+
+@pytest.mark.unit
+def test_failing_job_does_not_roll_back_batch(tmp_path):
+    """同一批次中失败的任务只回滚自己，其他任务照常提交"""
+
+    async def scenario():
+        writer = SQLiteWriter(f"sqlite+aiosqlite:///{tmp_path / 'writer.db'}")
+        await writer.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)"))
+
+        async def insert(conn, name):
+            await conn.execute(text("INSERT INTO items (name) VALUES (:name)"), {"name": name})
+            return name
+
+        async def failing(conn):
+            await conn.execute(text("INSERT INTO items (name) VALUES ('partial')"))
+            raise RuntimeError("job failed")
+
+        # 先占住写入循环，让后面的任务积压到同一批次
+        gate = asyncio.Event()
+
+        async def blocker(conn):
+            await gate.wait()
+
+        blocked = asyncio.create_task(writer.run(blocker))
+        await asyncio.sleep(0.05)
+        tasks = [
+            asyncio.create_task(writer.run(lambda conn: insert(conn, "a"))),
+            asyncio.create_task(writer.run(failing)),
+            asyncio.create_task(writer.run(lambda conn: insert(conn, "b"))),
+        ]
+        await asyncio.sleep(0.05)
+        transactions = writer.transactions
+        gate.set()
+        await blocked
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert results[0] == "a" and results[2] == "b"
+        assert isinstance(results[1], RuntimeError)
+        # 三个任务在同一个事务中提交
+        assert writer.transactions == transactions + 2
+        assert writer.max_batch_jobs == 3
+        assert writer.failed_jobs == 1
+
+        async with writer.engine.connect() as conn:
+            names = (await conn.execute(text("SELECT name FROM items ORDER BY id"))).scalars().all()
+        assert names == ["a", "b"]
+
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.unit
+def test_execute_returns_rowcount_and_stop_drains_queue(tmp_path):
+    """execute 返回影响行数；stop 等待队列中的任务写完"""
+
+    async def scenario():
+        writer = SQLiteWriter(f"sqlite+aiosqlite:///{tmp_path / 'writer.db'}")
+        await writer.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)"))
+        assert await writer.execute(text("INSERT INTO items (name) VALUES ('x')")) == 1
+        assert await writer.execute(text("UPDATE items SET name = 'y'")) == 1
+
+        pending = [
+            asyncio.create_task(writer.execute(text("INSERT INTO items (name) VALUES ('z')")))
+            for _ in range(10)
+        ]
+        await asyncio.sleep(0)
+        await writer.stop()
+        assert all(task.done() for task in pending)
+        assert writer.stats()["jobs"] == 13
+
+        reader = create_sqlite_engine(tmp_path / "writer.db", read_only=True)
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM items"))).scalar() == 11
+        await reader.dispose()
+
+    asyncio.run(scenario())